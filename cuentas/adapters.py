@@ -31,25 +31,17 @@ class ControlledAccountAdapter(DefaultAccountAdapter):
 
         # At this point, invite may be set (from above) or None
 
-        # First check DB-backed InviteCode model (preferred)
+        # First check DB-backed InviteCode model (preferred). The reservation
+        # is one conditional UPDATE: it succeeds only if the code exists and
+        # still has a free slot, so concurrent signups cannot over-consume it.
         if invite:
             try:
                 from .models import InviteCode
-                code_qs = InviteCode.objects.filter(code=invite)
-                if code_qs.exists():
-                    code_obj = code_qs.first()
-                    if not code_obj.is_valid():
-                        return False
-                    # Reserve a use slot immediately to avoid races and mark session so downstream can consume it when creating user
-                    try:
-                        code_obj.reserve()
-                        request.session['account_invited'] = True
-                        request.session['account_invite_code'] = invite
-                        request.session['account_invite_reserved'] = True
-                        return True
-                    except Exception:
-                        # if reserve fails, fallback to not accepting
-                        return False
+                if InviteCode.reservar(invite):
+                    request.session['account_invited'] = True
+                    request.session['account_invite_code'] = invite
+                    request.session['account_invite_reserved'] = True
+                    return True
             except Exception:
                 # If anything goes wrong (e.g., migrations not applied), fallback to settings
                 pass
@@ -80,28 +72,25 @@ class ControlledAccountAdapter(DefaultAccountAdapter):
         if invite_code:
             try:
                 from .models import InviteCode
-                code_qs = InviteCode.objects.filter(code=invite_code)
-                if code_qs.exists():
-                    code = code_qs.first()
-                    # If we reserved earlier (on GET), finalize consumption without double-counting
-                    if request.session.get('account_invite_reserved'):
-                        code.consume(user=user)
-                        try:
-                            del request.session['account_invite_reserved']
-                        except KeyError:
-                            pass
-                    else:
-                        # Only mark if single_use or used flag not set
-                        code.mark_used(user=user)
-                    # remove session keys
-                    try:
-                        del request.session['account_invite_code']
-                    except KeyError:
-                        pass
+                # If we reserved earlier (on GET), finalize consumption without double-counting
+                if request.session.get('account_invite_reserved'):
+                    InviteCode.consumir(invite_code, user=user)
                     try:
-                        del request.session['account_invited']
+                        del request.session['account_invite_reserved']
                     except KeyError:
                         pass
+                else:
+                    # Reserve and consume in the same UPDATE (no-op for settings codes)
+                    InviteCode.reservar(invite_code, user=user)
+                # remove session keys
+                try:
+                    del request.session['account_invite_code']
+                except KeyError:
+                    pass
+                try:
+                    del request.session['account_invited']
+                except KeyError:
+                    pass
             except Exception:
                 # if migrations not applied or model missing, ignore
                 pass
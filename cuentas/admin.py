@@ -5,6 +5,7 @@ from .models import InviteCode
 @admin.register(Usuario)
 class UsuarioAdmin(admin.ModelAdmin):
     list_display = ("username", "rol", "is_active", "is_staff")
+    list_select_related = ("rol",)
 
 admin.site.register(Rol)
 
@@ -0,0 +1,50 @@
+"""Backend de autenticación y chequeo de roles sin consultas extra.
+
+``UsuarioBackend.get_user`` carga el ``Usuario`` de la sesión junto con su
+``Rol`` en una sola consulta (``select_related('rol')``), así que
+``request.user.rol.nombre`` ya no dispara una segunda consulta en cada
+petición protegida.
+
+``nombre_rol`` guarda en un LRU por proceso el nombre de cada rol por id, para
+usuarios cargados sin ``select_related`` (p. ej. ``created_by`` de un
+registro). Las señales de ``cuentas.signals`` vacían el LRU cuando se crea,
+modifica o elimina un ``Rol``; en otros procesos el nombre antiguo puede
+persistir hasta su reinicio, lo que es aceptable porque los roles casi nunca
+se renombran.
+"""
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class UsuarioBackend(ModelBackend):
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('rol').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+@lru_cache(maxsize=64)
+def nombre_rol(rol_id):
+    """Nombre del rol con id ``rol_id`` (None si no existe)."""
+    from .models import Rol
+    return Rol.objects.filter(pk=rol_id).values_list('nombre', flat=True).first()
+
+
+def rol_de(user):
+    """Nombre del rol del usuario sin consultar la BD en el caso común."""
+    if user is None or not user.is_authenticated or user.rol_id is None:
+        return None
+    rol_field = get_user_model()._meta.get_field('rol')
+    if rol_field.is_cached(user):
+        return user.rol.nombre
+    return nombre_rol(user.rol_id)
+
+
+def tiene_rol(user, *nombres):
+    """True si el usuario tiene alguno de los roles ``nombres``."""
+    return rol_de(user) in nombres
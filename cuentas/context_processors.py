@@ -14,3 +14,14 @@ def signup_settings(request):
         'ACCOUNT_ALLOW_PUBLIC_SIGNUP': getattr(settings, 'ACCOUNT_ALLOW_PUBLIC_SIGNUP', True),
         'ACCOUNT_INVITE_CODES_PRESENT': bool(getattr(settings, 'ACCOUNT_INVITE_CODES', [])),
     }
+
+
+def static_bundle(request):
+    """Expose whether the self-hosted static bundle has been built.
+
+    Returns:
+        dict: {'STATIC_BUNDLE': bool}
+    """
+    from .estaticos import bundle_disponible
+
+    return {'STATIC_BUNDLE': bundle_disponible()}
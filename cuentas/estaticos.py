@@ -0,0 +1,353 @@
+"""Bundle de archivos estáticos propio, sin depender de CDNs.
+
+``base.html`` usaba Google Fonts, Font Awesome, Bootstrap (CSS/JS), Bootstrap
+Icons y animate.css desde cinco CDNs distintos; en la red del hospital (con
+internet restringido o sin él) esas peticiones bloquean o rompen la carga.
+
+El flujo es:
+
+1. ``python manage.py construir_estaticos --descargar`` (en un equipo con
+   internet, una sola vez por versión): baja las versiones fijadas en
+   ``FUENTES`` a ``static/vendor/``, junto con las fuentes que referencian
+   (de Roboto solo el subconjunto latino). Estos archivos se versionan en el
+   repositorio.
+2. ``python manage.py construir_estaticos``: concatena y minifica el CSS en
+   ``static/bundle/app.css`` (eliminando los glifos de Font Awesome y Bootstrap
+   Icons que ninguna plantilla usa) y el JS en ``static/bundle/app.js``.
+3. ``python manage.py collectstatic``: con ``DEBUG = False`` se usa
+   ``ManifestGzipStorage``, que agrega un hash del contenido a cada nombre y
+   deja junto a cada archivo de texto una copia ``.gz`` precomprimida.
+
+``servir`` entrega STATIC_ROOT eligiendo la copia ``.gz`` cuando el navegador
+acepta gzip, con caché de un año (``immutable``) para los nombres hasheados:
+una carga con caché caliente no hace peticiones externas ni revalidaciones.
+Mientras no exista el bundle, ``base.html`` sigue usando los CDNs.
+"""
+import gzip
+import os
+import posixpath
+import re
+import urllib.parse
+import urllib.request
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils._os import safe_join
+from django.views.static import serve
+
+# (destino dentro de static/, URL fijada) en el orden en que se cargaban
+FUENTES = [
+    ('vendor/roboto/roboto.css',
+     'https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700;900&display=swap'),
+    ('vendor/fontawesome/css/all.min.css',
+     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.1/css/all.min.css'),
+    ('vendor/bootstrap/bootstrap.min.css',
+     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css'),
+    ('vendor/bootstrap-icons/bootstrap-icons.css',
+     'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css'),
+    ('vendor/animate/animate.min.css',
+     'https://cdnjs.cloudflare.com/ajax/libs/animate.css/4.1.1/animate.min.css'),
+    ('vendor/bootstrap/bootstrap.bundle.min.js',
+     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js'),
+    # Solo el dashboard la usa: se sirve aparte, no en app.js
+    ('vendor/chartjs/chart.umd.min.js',
+     'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js'),
+]
+
+BUNDLE_CSS = 'bundle/app.css'
+BUNDLE_JS = 'bundle/app.js'
+CSS_BUNDLE = [
+    'vendor/roboto/roboto.css',
+    'vendor/fontawesome/css/all.min.css',
+    'vendor/bootstrap/bootstrap.min.css',
+    'vendor/bootstrap-icons/bootstrap-icons.css',
+    'vendor/animate/animate.min.css',
+    'css/styles.css',
+]
+JS_BUNDLE = ['vendor/bootstrap/bootstrap.bundle.min.js']
+
+# Roboto: solo el subconjunto latino (cubre tildes, ñ, ¿ y ¡)
+RANGO_LATINO = 'U+0000-00FF'
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+UN_ANIO = 365 * 24 * 60 * 60
+
+_COMENTARIO = re.compile(r'/\*.*?\*/', re.S)
+_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_GLIFO = re.compile(r'^\.((?:fa|bi)-[\w-]+)::?before$')
+_CLASE_ICONO = re.compile(r'\b(?:fa|bi)-[a-z0-9]+(?:-[a-z0-9]+)*')
+# Nombres de ManifestStaticFilesStorage: archivo.<12 hex>.ext
+_HASHEADO = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+
+def _fin_string(css, i):
+    """Índice siguiente al cierre del string que empieza en ``css[i]``."""
+    comilla, j, n = css[i], i + 1, len(css)
+    while j < n and css[j] != comilla:
+        j += 2 if css[j] == '\\' else 1
+    return j + 1
+
+
+def _bloques(css):
+    """Divide una hoja de estilos en sus reglas de primer nivel (incluidas
+    las at-rules completas, con sus bloques anidados)."""
+    bloques, inicio, profundidad, i, n = [], 0, 0, 0, len(css)
+    while i < n:
+        c = css[i]
+        if c in '"\'':
+            i = _fin_string(css, i)
+            continue
+        if css.startswith('/*', i):
+            fin = css.find('*/', i + 2)
+            i = n if fin < 0 else fin + 2
+            continue
+        if c == '{':
+            profundidad += 1
+        elif c == '}':
+            profundidad -= 1
+            if profundidad == 0:
+                bloques.append(css[inicio:i + 1])
+                inicio = i + 1
+        elif c == ';' and profundidad == 0:
+            # @charset / @import
+            bloques.append(css[inicio:i + 1])
+            inicio = i + 1
+        i += 1
+    if css[inicio:].strip():
+        bloques.append(css[inicio:])
+    return bloques
+
+
+def _prelude(bloque):
+    return _COMENTARIO.sub('', bloque.split('{', 1)[0]).strip()
+
+
+def podar_iconos(css, usadas):
+    """Elimina las reglas de glifo (``.fa-x:before``, ``.bi-x::before``) de
+    íconos que no están en ``usadas``. Devuelve (css, reglas eliminadas)."""
+    conservados, eliminadas = [], 0
+    for bloque in _bloques(css):
+        glifos = [_GLIFO.match(s.strip()) for s in _prelude(bloque).split(',')] if '{' in bloque else [None]
+        if all(glifos) and not any(m.group(1) in usadas for m in glifos):
+            eliminadas += 1
+            continue
+        conservados.append(bloque)
+    return ''.join(conservados), eliminadas
+
+
+def solo_latino(css):
+    """Conserva solo los @font-face del subconjunto latino (Google Fonts sirve
+    uno por alfabeto: cirílico, griego, vietnamita...)."""
+    return ''.join(
+        b for b in _bloques(css)
+        if not _prelude(b).startswith('@font-face') or 'unicode-range' not in b or RANGO_LATINO in b
+    )
+
+
+def reubicar_urls(css, origen, destino):
+    """Reescribe las ``url()`` relativas de un CSS ubicado en ``origen`` para
+    que sigan apuntando al mismo archivo desde ``destino`` (rutas en static/).
+    Se quita el query string (``?v=...``): del cache busting se encarga el hash
+    del manifest."""
+    def cambiar(m):
+        ruta = m.group(2).strip()
+        if ruta.startswith(('data:', '#', '/')) or '://' in ruta:
+            return m.group(0)
+        ruta = ruta.split('?', 1)[0].split('#', 1)[0]
+        absoluta = posixpath.normpath(posixpath.join(posixpath.dirname(origen), ruta))
+        return f'url("{posixpath.relpath(absoluta, posixpath.dirname(destino) or ".")}")'
+    return _URL.sub(cambiar, css)
+
+
+def minificar_css(css):
+    """Quita comentarios (salvo los ``/*!`` de licencia) y espacios sobrantes
+    sin tocar el contenido de los strings."""
+    partes, i, inicio, n = [], 0, 0, len(css)
+    tras_string = False
+
+    def codigo(texto):
+        texto = re.sub(r'\s+', ' ', texto)
+        # Tras un string el espacio puede importar (quotes: "«" "»")
+        if not tras_string:
+            texto = texto.lstrip()
+        return re.sub(r'\s*([{};,>])\s*', r'\1', texto)
+
+    while i < n:
+        if css[i] in '"\'':
+            fin = _fin_string(css, i)
+            partes.append(codigo(css[inicio:i]))
+            partes.append(css[i:fin])
+            i = inicio = fin
+            tras_string = True
+        elif css.startswith('/*', i):
+            fin = css.find('*/', i + 2)
+            fin = n if fin < 0 else fin + 2
+            partes.append(codigo(css[inicio:i]))
+            if css.startswith('/*!', i):
+                partes.append(css[i:fin] + '\n')
+            i = inicio = fin
+            tras_string = False
+        else:
+            i += 1
+    partes.append(codigo(css[inicio:]))
+    return ''.join(partes).replace(';}', '}').strip()
+
+
+def iconos_usados(directorios):
+    """Clases ``fa-*``/``bi-*`` que aparecen en plantillas, JS y vistas."""
+    usadas = set()
+    for directorio in directorios:
+        for raiz, carpetas, archivos in os.walk(directorio):
+            # No contar las propias librerías ni el bundle generado
+            carpetas[:] = [c for c in carpetas if c not in ('vendor', 'bundle')]
+            for archivo in archivos:
+                if archivo.endswith(('.html', '.js', '.py')):
+                    with open(os.path.join(raiz, archivo), encoding='utf-8', errors='ignore') as f:
+                        usadas.update(_CLASE_ICONO.findall(f.read()))
+    return usadas
+
+
+def directorios_fuente():
+    """Directorios de plantillas del proyecto y de sus apps, y STATICFILES_DIRS."""
+    from django.apps import apps
+
+    directorios = [str(d) for t in settings.TEMPLATES for d in t.get('DIRS', [])]
+    directorios += [
+        os.path.join(app.path, 'templates') for app in apps.get_app_configs()
+        if str(app.path).startswith(str(settings.BASE_DIR))
+    ]
+    directorios += [str(d) for d in settings.STATICFILES_DIRS]
+    return [d for d in directorios if os.path.isdir(d)]
+
+
+def _bajar(url):
+    peticion = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+        return respuesta.read()
+
+
+def _escribir(static_dir, destino, contenido):
+    ruta = os.path.join(static_dir, *destino.split('/'))
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+
+
+def descargar(static_dir, bajar=_bajar):
+    """Baja ``FUENTES`` (y los recursos que referencian sus CSS) a ``static_dir``.
+    Devuelve las rutas escritas."""
+    escritos = []
+    for destino, url in FUENTES:
+        contenido = bajar(url)
+        if destino.endswith('.css'):
+            css = contenido.decode('utf-8')
+            if 'fonts.googleapis.com' in url:
+                css = solo_latino(css)
+            recursos = {}
+            for m in _URL.finditer(css):
+                ruta = m.group(2).strip()
+                if ruta.startswith(('data:', '#')):
+                    continue
+                remoto = urllib.parse.urljoin(url, ruta.split('?', 1)[0].split('#', 1)[0])
+                if '://' in ruta:
+                    # Fuentes en otro host (fonts.gstatic.com): a fonts/ junto al CSS
+                    local = posixpath.join(posixpath.dirname(destino), 'fonts', posixpath.basename(remoto))
+                else:
+                    local = posixpath.normpath(posixpath.join(
+                        posixpath.dirname(destino), ruta.split('?', 1)[0].split('#', 1)[0]))
+                if local not in recursos.values():
+                    _escribir(static_dir, local, bajar(remoto))
+                    escritos.append(local)
+                recursos[ruta] = local
+            css = _URL.sub(
+                lambda m: (
+                    f'url("{posixpath.relpath(recursos[m.group(2).strip()], posixpath.dirname(destino))}")'
+                    if m.group(2).strip() in recursos else m.group(0)
+                ),
+                css,
+            )
+            contenido = css.encode('utf-8')
+        _escribir(static_dir, destino, contenido)
+        escritos.append(destino)
+    return escritos
+
+
+def construir(static_dir, usadas):
+    """Genera ``bundle/app.css`` y ``bundle/app.js`` en ``static_dir``."""
+    def leer(ruta):
+        with open(os.path.join(static_dir, *ruta.split('/')), encoding='utf-8') as f:
+            return f.read()
+
+    partes, original, eliminadas = [], 0, 0
+    for ruta in CSS_BUNDLE:
+        css = leer(ruta)
+        original += len(css.encode('utf-8'))
+        css, n = podar_iconos(css, usadas)
+        eliminadas += n
+        partes.append(reubicar_urls(css, ruta, BUNDLE_CSS))
+    app_css = minificar_css('\n'.join(partes))
+    # Los JS de terceros ya vienen minificados: solo se concatenan
+    app_js = '\n;'.join(leer(ruta) for ruta in JS_BUNDLE)
+
+    _escribir(static_dir, BUNDLE_CSS, app_css.encode('utf-8'))
+    _escribir(static_dir, BUNDLE_JS, app_js.encode('utf-8'))
+    return {
+        'css_original': original,
+        'css_bundle': len(app_css.encode('utf-8')),
+        'js_bundle': len(app_js.encode('utf-8')),
+        'glifos_eliminados': eliminadas,
+        'iconos_usados': len(usadas),
+    }
+
+
+@lru_cache
+def bundle_disponible():
+    """True si ya se construyó el bundle (en STATICFILES_DIRS o STATIC_ROOT)."""
+    return bool(finders.find(BUNDLE_CSS)) or staticfiles_storage.exists(BUNDLE_CSS)
+
+
+class ManifestGzipStorage(ManifestStaticFilesStorage):
+    """Manifest con nombres hasheados que además deja una copia ``.gz``
+    precomprimida de cada archivo de texto hasheado."""
+
+    extensiones_gzip = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.ttf', '.otf', '.eot', '.ico')
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nombre in set(self.hashed_files.values()):
+            self.comprimir(nombre)
+
+    def comprimir(self, nombre):
+        if not nombre.endswith(self.extensiones_gzip):
+            return False
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        comprimido = gzip.compress(datos, compresslevel=9, mtime=0)
+        # Si casi no se reduce (woff2, png) no vale la pena
+        if len(comprimido) >= len(datos) * 0.95:
+            return False
+        with open(ruta + '.gz', 'wb') as f:
+            f.write(comprimido)
+        return True
+
+
+def servir(request, path):
+    """Sirve STATIC_ROOT: la copia ``.gz`` si el cliente acepta gzip, y caché
+    de un año para nombres hasheados (su contenido no cambia nunca)."""
+    raiz = settings.STATIC_ROOT
+    gz = 'gzip' in request.headers.get('Accept-Encoding', '') and os.path.isfile(safe_join(raiz, path + '.gz'))
+    # serve() deduce Content-Type y Content-Encoding: gzip del nombre .css.gz
+    response = serve(request, path + '.gz' if gz else path, document_root=raiz)
+    if gz and response.has_header('Content-Disposition'):
+        del response['Content-Disposition']
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if _HASHEADO.search(path):
+        patch_cache_control(response, public=True, max_age=UN_ANIO, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,36 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cuentas import estaticos
+
+
+class Command(BaseCommand):
+    help = ('Construye static/bundle/app.css y app.js a partir de las librerías en static/vendor. '
+            'Con --descargar primero las baja de los CDN (versiones fijadas en cuentas.estaticos.FUENTES). '
+            'Luego ejecute collectstatic.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--descargar', action='store_true',
+                            help='Bajar las librerías a static/vendor (requiere internet).')
+        parser.add_argument('--static', help='Directorio static de origen (por defecto el primero de STATICFILES_DIRS).')
+
+    def handle(self, *args, **options):
+        static_dir = options['static'] or str(settings.STATICFILES_DIRS[0])
+
+        if options['descargar']:
+            for ruta in estaticos.descargar(static_dir):
+                self.stdout.write(f'  {ruta}')
+
+        faltantes = [r for r in estaticos.CSS_BUNDLE + estaticos.JS_BUNDLE
+                     if not os.path.isfile(os.path.join(static_dir, *r.split('/')))]
+        if faltantes:
+            raise CommandError(f'Faltan {", ".join(faltantes)} en {static_dir}; ejecute con --descargar.')
+
+        resumen = estaticos.construir(static_dir, estaticos.iconos_usados(estaticos.directorios_fuente()))
+        self.stdout.write(self.style.SUCCESS(
+            f'{estaticos.BUNDLE_CSS}: {resumen["css_original"] // 1024} KB -> {resumen["css_bundle"] // 1024} KB '
+            f'({resumen["glifos_eliminados"]} glifos sin usar eliminados, {resumen["iconos_usados"]} íconos en uso); '
+            f'{estaticos.BUNDLE_JS}: {resumen["js_bundle"] // 1024} KB'
+        ))
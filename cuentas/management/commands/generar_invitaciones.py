@@ -0,0 +1,65 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cuentas.models import InviteCode
+
+
+class Command(BaseCommand):
+    help = ('Genera un lote de códigos de invitación aleatorios con la misma expiración '
+            'y límite de usos (p. ej. para un nuevo ingreso de personal).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('cantidad', type=int, help='Número de códigos a generar.')
+        expira = parser.add_mutually_exclusive_group()
+        expira.add_argument('--expira', help='Fecha de expiración (YYYY-MM-DD, fin del día local).')
+        expira.add_argument('--dias', type=int, help='Expira en N días desde ahora.')
+        parser.add_argument('--max-usos', type=int, help='Usos máximos por código (por defecto, un solo uso).')
+        parser.add_argument('--prefijo', default='', help='Prefijo para identificar el lote, p. ej. "MAT25-".')
+        parser.add_argument('--creado-por', help='Username del usuario que emite el lote.')
+        parser.add_argument('--salida', help='Escribir los códigos en un CSV en vez de la salida estándar.')
+
+    def handle(self, *args, **options):
+        cantidad = options['cantidad']
+        if cantidad < 1:
+            raise CommandError('La cantidad debe ser mayor que 0')
+
+        expires_at = None
+        if options['expira']:
+            try:
+                dia = datetime.strptime(options['expira'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+            expires_at = timezone.make_aware(datetime.combine(dia, time.max))
+        elif options['dias'] is not None:
+            expires_at = timezone.now() + timedelta(days=options['dias'])
+
+        max_usos = options['max_usos']
+        if max_usos is not None and max_usos < 1:
+            raise CommandError('--max-usos debe ser mayor que 0')
+
+        creado_por = None
+        if options['creado_por']:
+            creado_por = get_user_model().objects.filter(username=options['creado_por']).first()
+            if creado_por is None:
+                raise CommandError(f'No existe el usuario {options["creado_por"]}')
+
+        codigos = InviteCode.generar_lote(
+            cantidad, expires_at=expires_at, max_uses=max_usos,
+            single_use=max_usos is None, created_by=creado_por, prefijo=options['prefijo'],
+        )
+
+        if options['salida']:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['codigo', 'expira', 'max_usos'])
+                for c in codigos:
+                    writer.writerow([c.code, c.expires_at.isoformat() if c.expires_at else '', c.max_uses or 1])
+            self.stdout.write(self.style.SUCCESS(f'{len(codigos)} códigos escritos en {options["salida"]}'))
+        else:
+            for c in codigos:
+                self.stdout.write(c.code)
+            self.stderr.write(self.style.SUCCESS(f'{len(codigos)} códigos generados'))
@@ -0,0 +1,52 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cuentas.models import InviteCode
+
+CAMPOS = ('id', 'code', 'single_use', 'used', 'created_by_id', 'used_by_id',
+          'created_at', 'used_at', 'expires_at', 'max_uses', 'uses_count')
+
+
+class Command(BaseCommand):
+    help = ('Elimina en lotes los códigos de invitación expirados o agotados hace más de '
+            '--dias días. Con --archivo se guardan antes como JSON Lines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30,
+                            help='Antigüedad mínima desde la expiración o el último uso (por defecto 30).')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por lote (por defecto 1000).')
+        parser.add_argument('--archivo', help='Archivo JSON Lines donde agregar los códigos antes de borrarlos.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin borrar.')
+
+    def handle(self, *args, **options):
+        antes = timezone.now() - timedelta(days=options['dias'])
+        purgables = InviteCode.purgables(antes).order_by('id')
+
+        if options['dry_run']:
+            self.stdout.write(f'{purgables.count()} códigos para purgar (sin cambios)')
+            return
+
+        archivo = open(options['archivo'], 'a', encoding='utf-8') if options['archivo'] else None
+        total, ultimo = 0, 0
+        try:
+            while True:
+                # Lotes por id: transacciones cortas y sin bloquear la tabla entera
+                filas = list(purgables.filter(id__gt=ultimo).values(*CAMPOS)[:options['lote']])
+                if not filas:
+                    break
+                if archivo:
+                    for fila in filas:
+                        archivo.write(json.dumps(fila, default=str, ensure_ascii=False) + '\n')
+                    archivo.flush()
+                ids = [fila['id'] for fila in filas]
+                # Re-aplicar el criterio: un código reactivado entre lectura y borrado se conserva
+                total += purgables.filter(id__in=ids).delete()[0]
+                ultimo = ids[-1]
+        finally:
+            if archivo:
+                archivo.close()
+
+        self.stdout.write(self.style.SUCCESS(f'{total} códigos de invitación purgados'))
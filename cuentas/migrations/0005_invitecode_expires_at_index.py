@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0004_usuario_run_usuario_telefono'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invitecode',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -26,7 +26,7 @@ class InviteCode(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     used_at = models.DateTimeField(null=True, blank=True)
     # New fields for expiry and usage limits
-    expires_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
     max_uses = models.IntegerField(null=True, blank=True, help_text='Max number of times this code can be used. Null = unlimited')
     uses_count = models.IntegerField(default=0)
 
@@ -34,40 +34,116 @@ class InviteCode(models.Model):
         verbose_name = 'Invite Code'
         verbose_name_plural = 'Invite Codes'
 
+    # Alfabeto sin caracteres ambiguos (0/O, 1/I/L): 31 símbolos, ~59 bits por código
+    ALFABETO = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+    LARGO_CODIGO = 12
+
     def __str__(self):
         return self.code
 
+    @classmethod
+    def nuevo_codigo(cls, prefijo=''):
+        """Random code from ``secrets`` (cryptographically secure), e.g. ``ABCD-EFGH-JKMN``."""
+        import secrets
+        simbolos = ''.join(secrets.choice(cls.ALFABETO) for _ in range(cls.LARGO_CODIGO))
+        grupos = '-'.join(simbolos[i:i + 4] for i in range(0, cls.LARGO_CODIGO, 4))
+        return f'{prefijo}{grupos}'
+
+    @classmethod
+    def generar_lote(cls, cantidad, expires_at=None, max_uses=None, single_use=True, created_by=None, prefijo=''):
+        """Create ``cantidad`` codes sharing expiry and limits with one bulk_create.
+
+        Codes that collide with existing ones (or each other) are regenerated
+        before inserting. Returns the list of created InviteCode objects.
+        """
+        from django.db import transaction
+
+        codigos = set()
+        while len(codigos) < cantidad:
+            nuevos = {cls.nuevo_codigo(prefijo) for _ in range(cantidad - len(codigos))}
+            existentes = set(cls.objects.filter(code__in=nuevos).values_list('code', flat=True))
+            codigos |= nuevos - existentes
+        now = timezone.now()
+        objetos = [
+            cls(code=codigo, expires_at=expires_at, max_uses=max_uses, single_use=single_use,
+                created_by=created_by, created_at=now)
+            for codigo in sorted(codigos)
+        ]
+        with transaction.atomic():
+            return cls.objects.bulk_create(objetos, batch_size=500)
+
+    @classmethod
+    def purgables(cls, antes):
+        """Codes expired before ``antes`` or exhausted (used / max_uses reached)
+        with their last use (or creation) before ``antes``."""
+        Q, F = models.Q, models.F
+        agotado = Q(used=True) | Q(max_uses__isnull=False, uses_count__gte=F('max_uses'))
+        inactivo = Q(used_at__lt=antes) | Q(used_at__isnull=True, created_at__lt=antes)
+        return cls.objects.filter(Q(expires_at__lt=antes) | (agotado & inactivo))
+
+    @staticmethod
+    def disponible_q(now=None):
+        """Condición SQL equivalente a ``is_valid()``: no expirado y con cupo.
+        Un código de un solo uso tiene cupo 1."""
+        now = now or timezone.now()
+        return (
+            (models.Q(expires_at__isnull=True) | models.Q(expires_at__gte=now))
+            & (models.Q(max_uses__isnull=True) | models.Q(uses_count__lt=models.F('max_uses')))
+            & ~models.Q(single_use=True, used=True)
+            & ~models.Q(single_use=True, uses_count__gte=1)
+        )
+
+    @classmethod
+    def reservar(cls, code, user=None):
+        """Reserve a use slot atomically with a single conditional UPDATE.
+
+        ``UPDATE ... SET uses_count = uses_count + 1 WHERE code = ... AND
+        <disponible>``: the database serializes concurrent reservations on the
+        row, so at most ``max_uses`` calls succeed. Returns True if a slot was
+        obtained (affected rows == 1). With ``user`` the use is also recorded
+        as consumed by that user (reservation and consumption in one step).
+        """
+        now = timezone.now()
+        # `used` va antes que `uses_count`: MySQL evalúa las asignaciones de
+        # izquierda a derecha con los valores ya actualizados, el resto con
+        # los originales; en este orden todos ven el uses_count anterior.
+        cambios = {
+            'used': models.Case(
+                models.When(
+                    models.Q(single_use=True)
+                    | models.Q(max_uses__isnull=False, max_uses__lte=models.F('uses_count') + 1),
+                    then=models.Value(True),
+                ),
+                default=models.F('used'),
+            ),
+            'uses_count': models.F('uses_count') + 1,
+        }
+        if user is not None:
+            cambios.update(used_by=user, used_at=now)
+        return cls.objects.filter(cls.disponible_q(now), code=code).update(**cambios) == 1
+
+    @classmethod
+    def consumir(cls, code, user=None):
+        """Finalize a reservation made with ``reservar``: records used_by and
+        used_at in one UPDATE. Does NOT increment uses_count."""
+        return cls.objects.filter(code=code).update(used_by=user, used_at=timezone.now()) == 1
+
     def mark_used(self, user=None):
-        """Mark code as used: increment uses_count, set used flag when limits reached or single_use."""
-        self.uses_count = (self.uses_count or 0) + 1
-        if self.single_use:
-            self.used = True
-        if self.max_uses is not None and self.uses_count >= self.max_uses:
-            self.used = True
-        self.used_by = user
-        self.used_at = timezone.now()
-        self.save()
+        """Reserve and consume one use in a single step (see ``reservar``)."""
+        ok = self.reservar(self.code, user=user)
+        self.refresh_from_db()
+        return ok
 
     def reserve(self):
-        """Reserve a use slot without setting used_by/used_at (called on initial acceptance).
-        This increments uses_count but does not set used_by/used_at.
-        """
-        self.uses_count = (self.uses_count or 0) + 1
-        if self.max_uses is not None and self.uses_count >= self.max_uses:
-            self.used = True
-        self.save()
+        """Reserve a use slot without setting used_by/used_at (see ``reservar``)."""
+        ok = self.reservar(self.code)
+        self.refresh_from_db()
+        return ok
 
     def consume(self, user=None):
-        """Finalize consumption: set used_by and used_at and mark used flag if single_use.
-        Does NOT increment uses_count (assumes reserve() already did).
-        """
-        if self.single_use:
-            self.used = True
-        if self.max_uses is not None and self.uses_count >= self.max_uses:
-            self.used = True
-        self.used_by = user
-        self.used_at = timezone.now()
-        self.save()
+        """Finalize consumption: set used_by and used_at (see ``consumir``)."""
+        self.consumir(self.code, user=user)
+        self.refresh_from_db()
 
     def is_valid(self):
         """Return True if the code is currently valid (not expired and under max_uses)."""
@@ -77,7 +153,7 @@ class InviteCode(models.Model):
             return False
         if self.max_uses is not None and self.uses_count >= self.max_uses:
             return False
-        if self.single_use and self.used:
+        if self.single_use and (self.used or self.uses_count >= 1):
             return False
         return True
 
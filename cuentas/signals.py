@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Rol
+
+
+@receiver(post_save, sender=Rol)
+@receiver(post_delete, sender=Rol)
+def rol_modificado(sender, **kwargs):
+    # Vaciar el LRU de nombres de rol (cuentas.backends.nombre_rol)
+    from .backends import nombre_rol
+    nombre_rol.cache_clear()
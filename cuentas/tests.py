@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from .models import InviteCode
@@ -55,4 +55,363 @@ class InviteCodeSignupTests(TestCase):
 		self.assertEqual(ic.uses_count, 2)
 		self.assertTrue(ic.used)
 		# Now is_valid should be False
-		self.assertFalse(ic.is_valid())
\ No newline at end of file
+		self.assertFalse(ic.is_valid())
+
+class RolBackendTests(TestCase):
+	def setUp(self):
+		from .backends import nombre_rol
+		from .models import Rol
+		nombre_rol.cache_clear()
+		self.User = get_user_model()
+		self.rol = Rol.objects.create(nombre='superusuario')
+		self.user = self.User.objects.create_user(username='jefa', password='pass', rol=self.rol)
+
+	def test_get_user_loads_rol_in_one_query(self):
+		from .backends import UsuarioBackend
+		with self.assertNumQueries(1):
+			user = UsuarioBackend().get_user(self.user.pk)
+			self.assertEqual(user.rol.nombre, 'superusuario')
+
+	def test_tiene_rol_uses_lru_for_users_without_rol_loaded(self):
+		from .backends import tiene_rol
+		user = self.User.objects.get(pk=self.user.pk)
+		with self.assertNumQueries(1):
+			self.assertTrue(tiene_rol(user, 'superusuario'))
+		otro = self.User.objects.get(pk=self.user.pk)
+		with self.assertNumQueries(0):
+			self.assertTrue(tiene_rol(otro, 'usuario', 'superusuario'))
+			self.assertFalse(tiene_rol(otro, 'usuario'))
+
+	def test_lru_invalidated_when_rol_changes(self):
+		from .backends import nombre_rol, tiene_rol
+		self.assertEqual(nombre_rol(self.rol.pk), 'superusuario')
+		self.rol.nombre = 'usuario'
+		self.rol.save()
+		self.assertTrue(tiene_rol(self.User.objects.get(pk=self.user.pk), 'usuario'))
+
+	def test_requiere_rol(self):
+		from .models import Rol
+		client = Client()
+		client.login(username='jefa', password='pass')
+		self.assertEqual(client.get(reverse('cuentas:form_parto')).status_code, 302)
+		self.User.objects.create_user(username='sinrol', password='pass', rol=Rol.objects.create(nombre='otro'))
+		client.login(username='sinrol', password='pass')
+		self.assertEqual(client.get(reverse('cuentas:form_parto')).status_code, 403)
+
+
+class InviteCodeReservationTests(TestCase):
+	def test_reservar_is_single_update(self):
+		InviteCode.objects.create(code='MULTI', single_use=False, max_uses=2)
+		with self.assertNumQueries(1):
+			self.assertTrue(InviteCode.reservar('MULTI'))
+		self.assertTrue(InviteCode.reservar('MULTI'))
+		self.assertFalse(InviteCode.reservar('MULTI'))
+		code = InviteCode.objects.get(code='MULTI')
+		self.assertEqual(code.uses_count, 2)
+		self.assertTrue(code.used)
+		self.assertFalse(InviteCode.reservar('NOEXISTE'))
+
+	def test_single_use_and_expired(self):
+		from datetime import timedelta
+		from django.utils import timezone
+		InviteCode.objects.create(code='UNO', single_use=True)
+		InviteCode.objects.create(code='VIEJO', single_use=False, expires_at=timezone.now() - timedelta(days=1))
+		self.assertTrue(InviteCode.reservar('UNO'))
+		self.assertFalse(InviteCode.reservar('UNO'))
+		self.assertFalse(InviteCode.reservar('VIEJO'))
+		self.assertFalse(InviteCode.objects.get(code='UNO').is_valid())
+
+	def test_consumir_records_user_without_counting(self):
+		user = get_user_model().objects.create_user(username='invitada', password='pass')
+		InviteCode.objects.create(code='C', single_use=False, max_uses=5)
+		InviteCode.reservar('C')
+		with self.assertNumQueries(1):
+			InviteCode.consumir('C', user=user)
+		code = InviteCode.objects.get(code='C')
+		self.assertEqual((code.uses_count, code.used_by_id), (1, user.pk))
+		self.assertIsNotNone(code.used_at)
+
+
+class InviteCodeConcurrencyTests(TransactionTestCase):
+	"""100 reservas concurrentes sobre un código con max_uses=7: exactamente 7 ganan."""
+
+	def test_exactly_max_uses_winners(self):
+		import threading
+		from django.db import connection, connections
+		if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+			self.skipTest('SQLite en memoria no admite escrituras concurrentes entre hilos')
+
+		InviteCode.objects.create(code='STRESS', single_use=False, max_uses=7)
+		hilos, resultados = 100, []
+		barrera = threading.Barrier(hilos)
+		lock = threading.Lock()
+
+		def registrarse():
+			try:
+				barrera.wait()
+				ok = InviteCode.reservar('STRESS')
+				with lock:
+					resultados.append(ok)
+			finally:
+				connections.close_all()
+
+		threads = [threading.Thread(target=registrarse) for _ in range(hilos)]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+
+		self.assertEqual(len(resultados), hilos)
+		self.assertEqual(sum(resultados), 7)
+		code = InviteCode.objects.get(code='STRESS')
+		self.assertEqual(code.uses_count, 7)
+		self.assertTrue(code.used)
+
+
+class InviteCodeBulkTests(TestCase):
+	def test_generar_lote_single_bulk_insert(self):
+		from datetime import timedelta
+		from django.utils import timezone
+		expira = timezone.now() + timedelta(days=7)
+		with self.assertNumQueries(4):  # colisiones + savepoint + INSERT + release
+			codigos = InviteCode.generar_lote(50, expires_at=expira, max_uses=3, single_use=False, prefijo='MAT-')
+		self.assertEqual(len(codigos), 50)
+		self.assertEqual(InviteCode.objects.filter(code__startswith='MAT-', max_uses=3, expires_at=expira).count(), 50)
+		self.assertEqual(len({c.code for c in codigos}), 50)
+		self.assertRegex(codigos[0].code, r'^MAT-[A-Z2-9]{4}-[A-Z2-9]{4}-[A-Z2-9]{4}$')
+
+	def test_generar_invitaciones_command(self):
+		import io
+		from django.core.management import call_command
+		salida = io.StringIO()
+		call_command('generar_invitaciones', 5, dias=10, stdout=salida, stderr=io.StringIO())
+		self.assertEqual(len(salida.getvalue().split()), 5)
+		self.assertEqual(InviteCode.objects.filter(single_use=True, expires_at__isnull=False).count(), 5)
+
+	def test_purgar_invitaciones(self):
+		import io
+		import json
+		import os
+		import tempfile
+		from datetime import timedelta
+		from django.core.management import call_command
+		from django.utils import timezone
+		viejo = timezone.now() - timedelta(days=60)
+		InviteCode.objects.create(code='EXPIRADO', expires_at=viejo)
+		InviteCode.objects.create(code='AGOTADO', single_use=False, max_uses=2, uses_count=2, created_at=viejo)
+		InviteCode.objects.create(code='USADO', used=True, used_at=viejo)
+		InviteCode.objects.create(code='RECIEN', used=True, used_at=timezone.now())
+		InviteCode.objects.create(code='VIGENTE', expires_at=timezone.now() + timedelta(days=5))
+		InviteCode.objects.create(code='SINLIMITE', single_use=False, created_at=viejo)
+		with tempfile.TemporaryDirectory() as tmp:
+			archivo = os.path.join(tmp, 'inv.jsonl')
+			call_command('purgar_invitaciones', lote=2, archivo=archivo, stdout=io.StringIO())
+			with open(archivo, encoding='utf-8') as f:
+				archivados = {json.loads(linea)['code'] for linea in f}
+		self.assertEqual(archivados, {'EXPIRADO', 'AGOTADO', 'USADO'})
+		self.assertEqual(set(InviteCode.objects.values_list('code', flat=True)), {'RECIEN', 'VIGENTE', 'SINLIMITE'})
+
+
+class LoginThrottleTests(TestCase):
+	def setUp(self):
+		from unittest import mock
+		from django.core.cache import cache
+		cache.clear()
+		# Reloj fijo al comienzo de una ventana: con el reloj real los intentos
+		# pueden caer a ambos lados de un borde y el conteo estimado decae
+		patcher = mock.patch('cuentas.throttle.reloj', lambda: 3_000_000.0)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.User = get_user_model()
+		self.User.objects.create_user(username='matrona', password='correcta')
+		self.url = reverse('cuentas:login')
+
+	def test_blocks_username_before_hashing(self):
+		from unittest import mock
+		for _ in range(5):
+			self.assertEqual(self.client.post(self.url, {'username': 'matrona', 'password': 'mala'}).status_code, 200)
+		with mock.patch('cuentas.views.authenticate') as authenticate:
+			response = self.client.post(self.url, {'username': 'Matrona ', 'password': 'correcta'})
+			authenticate.assert_not_called()
+		self.assertEqual(response.status_code, 429)
+		self.assertGreater(int(response['Retry-After']), 0)
+
+	def test_ip_limit_covers_many_usernames(self):
+		with override_settings(LOGIN_THROTTLE={'ip': (3, 60)}):
+			for i in range(3):
+				self.client.post(self.url, {'username': f'u{i}', 'password': 'x'})
+			self.assertEqual(self.client.post(self.url, {'username': 'otro', 'password': 'x'}).status_code, 429)
+			otra_ip = self.client.post(self.url, {'username': 'otro', 'password': 'x'}, REMOTE_ADDR='10.0.0.2')
+			self.assertEqual(otra_ip.status_code, 200)
+
+	def test_valid_user_logs_in_during_spray_from_many_ips(self):
+		# Más intentos que el antiguo límite global (20 cada 10 s)
+		for i in range(25):
+			response = self.client.post(self.url, {'username': f'u{i}', 'password': 'Verano2025'}, REMOTE_ADDR=f'10.0.0.{i}')
+			self.assertEqual(response.status_code, 200)
+		response = self.client.post(self.url, {'username': 'matrona', 'password': 'correcta'}, REMOTE_ADDR='10.9.9.9')
+		self.assertEqual(response.status_code, 302)
+
+	def test_only_failed_attempts_count(self):
+		with override_settings(LOGIN_THROTTLE={'ip': (2, 60)}):
+			for _ in range(3):
+				self.assertEqual(self.client.post(self.url, {'username': 'matrona', 'password': 'correcta'}).status_code, 302)
+				self.client.logout()
+			self.client.post(self.url, {'username': 'matrona', 'password': 'mala'})
+			self.assertEqual(self.client.post(self.url, {'username': 'matrona', 'password': 'correcta'}).status_code, 302)
+
+	def test_client_ip_from_trusted_proxy_hop(self):
+		detras_del_proxy = {'REMOTE_ADDR': '10.1.1.1'}
+		with override_settings(LOGIN_THROTTLE={'ip': (2, 60)}, LOGIN_THROTTLE_PROXIES=1):
+			for i in range(2):
+				self.client.post(self.url, {'username': f'u{i}', 'password': 'x'}, HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.7', **detras_del_proxy)
+			# El cliente no puede esquivar el límite inventando la parte izquierda
+			response = self.client.post(self.url, {'username': 'u9', 'password': 'x'}, HTTP_X_FORWARDED_FOR='5.6.7.8, 203.0.113.7', **detras_del_proxy)
+			self.assertEqual(response.status_code, 429)
+			# Otro cliente detrás del mismo proxy no queda bloqueado
+			response = self.client.post(self.url, {'username': 'matrona', 'password': 'correcta'}, HTTP_X_FORWARDED_FOR='203.0.113.8', **detras_del_proxy)
+			self.assertEqual(response.status_code, 302)
+
+	def test_concurrent_hashes_capped(self):
+		from unittest import mock
+		from .throttle import _semaforo
+		with override_settings(LOGIN_THROTTLE_HASHES=(1, 0.01)):
+			semaforo = _semaforo(1)
+			semaforo.acquire()
+			try:
+				with mock.patch('cuentas.views.authenticate') as authenticate:
+					response = self.client.post(self.url, {'username': 'matrona', 'password': 'correcta'})
+					authenticate.assert_not_called()
+			finally:
+				semaforo.release()
+			self.assertEqual(response.status_code, 429)
+			self.assertEqual(self.client.post(self.url, {'username': 'matrona', 'password': 'correcta'}).status_code, 302)
+
+	def test_successful_login_resets_username_counter(self):
+		for _ in range(4):
+			self.client.post(self.url, {'username': 'matrona', 'password': 'mala'})
+		self.assertEqual(self.client.post(self.url, {'username': 'matrona', 'password': 'correcta'}).status_code, 302)
+		self.client.logout()
+		self.assertEqual(self.client.post(self.url, {'username': 'matrona', 'password': 'mala'}).status_code, 200)
+
+	def test_sliding_window_decays(self):
+		from django.core.cache import cache
+		from .throttle import VentanaDeslizante
+		ventana = VentanaDeslizante(cache, 'prueba', limite=10, ventana=60)
+		for _ in range(10):
+			ventana.registrar('x', 1000 * 60 + 30)
+		self.assertGreater(ventana.espera('x', 1000 * 60 + 59), 0)
+		# 30 s dentro de la ventana siguiente, la anterior pesa la mitad: 5 < 10
+		self.assertEqual(ventana.espera('x', 1001 * 60 + 30), 0)
+		# Al 10 % de la ventana siguiente aún pesa 9 + 1 nuevo = 10
+		ventana.registrar('x', 1001 * 60 + 6)
+		self.assertGreater(ventana.espera('x', 1001 * 60 + 6), 0)
+
+
+class StaticBundleTests(TestCase):
+	ICONOS_CSS = (
+		'/*! Font Awesome */.fa-solid{font-weight:900}'
+		'.fa-house:before,.fa-home:before{content:"\\f015"}.fa-user:before{content:"\\f007"}'
+		'.bi-check::before { content: "\\f26e"; }'
+		'@media (min-width:576px){.fa-user:before{color:red}}'
+	)
+
+	def setUp(self):
+		import tempfile
+		self.tmp = tempfile.mkdtemp()
+
+	def tearDown(self):
+		import shutil
+		from .estaticos import bundle_disponible
+		shutil.rmtree(self.tmp, ignore_errors=True)
+		bundle_disponible.cache_clear()
+
+	def test_podar_iconos_keeps_used_and_structural_rules(self):
+		from .estaticos import podar_iconos
+		css, eliminadas = podar_iconos(self.ICONOS_CSS, {'fa-home'})
+		self.assertEqual(eliminadas, 2)
+		self.assertIn('.fa-home:before', css)
+		self.assertIn('.fa-solid{', css)
+		self.assertIn('@media', css)
+		self.assertNotIn('.fa-user:before{content', css)
+		self.assertNotIn('.bi-check', css)
+
+	def test_minificar_css_keeps_strings_and_license(self):
+		from .estaticos import minificar_css
+		css = '/*! licencia */\n/* nota */\n.a  >  .b ,\n.c {\n  content: "  x ; }  ";\n  margin: 0 auto;\n}\n'
+		self.assertEqual(minificar_css(css), '/*! licencia */\n.a>.b,.c{content: "  x ; }  ";margin: 0 auto}')
+
+	def test_reubicar_urls(self):
+		from .estaticos import reubicar_urls
+		css = 'src:url("../webfonts/fa.woff2?v=1") format("woff2"),url(data:font/x;base64,AA),url(https://x.org/f.ttf)'
+		self.assertEqual(
+			reubicar_urls(css, 'vendor/fontawesome/css/all.min.css', 'bundle/app.css'),
+			'src:url("../vendor/fontawesome/webfonts/fa.woff2") format("woff2"),url(data:font/x;base64,AA),url(https://x.org/f.ttf)',
+		)
+
+	def _descargar(self):
+		from . import estaticos
+		contenidos = {url: f'/* {destino} */'.encode() for destino, url in estaticos.FUENTES}
+		contenidos[estaticos.FUENTES[0][1]] = (
+			b'/* cyrillic */@font-face{font-family:Roboto;src:url(https://fonts.gstatic.com/s/roboto/cy.woff2);unicode-range:U+0400-045F}'
+			b'/* latin */@font-face{font-family:Roboto;src:url(https://fonts.gstatic.com/s/roboto/la.woff2);unicode-range:U+0000-00FF, U+0131}'
+		)
+		contenidos[estaticos.FUENTES[1][1]] = self.ICONOS_CSS.encode() + b'@font-face{src:url(../webfonts/fa-solid-900.woff2)}'
+		bajados = []
+
+		def bajar(url):
+			bajados.append(url)
+			return contenidos.get(url, b'\x00fuente')
+
+		escritos = estaticos.descargar(self.tmp, bajar=bajar)
+		return escritos, bajados
+
+	def test_descargar_y_construir_bundle(self):
+		import os
+		from . import estaticos
+		escritos, bajados = self._descargar()
+		self.assertIn('vendor/roboto/fonts/la.woff2', escritos)
+		self.assertIn('vendor/fontawesome/webfonts/fa-solid-900.woff2', escritos)
+		self.assertNotIn('https://fonts.gstatic.com/s/roboto/cy.woff2', bajados)
+		os.makedirs(os.path.join(self.tmp, 'css'))
+		with open(os.path.join(self.tmp, 'css', 'styles.css'), 'w') as f:
+			f.write('body {\n  color: red;\n}\n')
+
+		resumen = estaticos.construir(self.tmp, {'fa-home'})
+		with open(os.path.join(self.tmp, 'bundle', 'app.css')) as f:
+			css = f.read()
+		self.assertEqual(resumen['glifos_eliminados'], 2)
+		self.assertIn('url("../vendor/roboto/fonts/la.woff2")', css)
+		self.assertIn('url("../vendor/fontawesome/webfonts/fa-solid-900.woff2")', css)
+		self.assertIn('body{color: red}', css)
+		self.assertTrue(os.path.isfile(os.path.join(self.tmp, 'bundle', 'app.js')))
+
+	def test_collectstatic_writes_gzip_and_servir_uses_it(self):
+		import gzip
+		import os
+		from django.core.management import call_command
+		from django.test import RequestFactory
+		from .estaticos import servir
+		fuente, destino = os.path.join(self.tmp, 'static'), os.path.join(self.tmp, 'root')
+		os.makedirs(os.path.join(fuente, 'bundle'))
+		with open(os.path.join(fuente, 'bundle', 'app.css'), 'w') as f:
+			f.write('body{margin:0}' * 200)
+		storages = {
+			'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+			'staticfiles': {'BACKEND': 'cuentas.estaticos.ManifestGzipStorage'},
+		}
+		with override_settings(STATICFILES_DIRS=[fuente], STATIC_ROOT=destino, STORAGES=storages):
+			call_command('collectstatic', interactive=False, verbosity=0)
+			from django.contrib.staticfiles.storage import staticfiles_storage
+			nombre = staticfiles_storage.stored_name('bundle/app.css')
+			self.assertTrue(os.path.isfile(os.path.join(destino, nombre + '.gz')))
+
+			response = servir(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br'), nombre)
+			self.assertEqual(response['Content-Encoding'], 'gzip')
+			self.assertEqual(response['Content-Type'], 'text/css')
+			self.assertIn('immutable', response['Cache-Control'])
+			self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'body{margin:0}' * 200)
+
+			sin_hash = servir(RequestFactory().get('/'), 'bundle/app.css')
+			self.assertFalse(sin_hash.has_header('Content-Encoding'))
+			self.assertIn('no-cache', sin_hash['Cache-Control'])
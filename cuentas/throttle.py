@@ -0,0 +1,180 @@
+"""Límite de intentos de inicio de sesión (ventana deslizante en la caché).
+
+Antes de calcular el hash de la contraseña (PBKDF2, cientos de milisegundos
+de CPU) se verifica que no se haya superado el límite de intentos *fallidos*
+en ninguno de dos ámbitos:
+
+- ``usuario``: por nombre de usuario, frena la adivinación de una cuenta,
+- ``ip``: por IP del cliente, frena el credential stuffing.
+
+Solo los intentos fallidos se registran (``login_fallido``); un login
+correcto no cuenta y además olvida los fallos de su usuario. Así un ataque
+solo bloquea a los usuarios e IPs que él mismo usa, nunca a todos.
+
+La IP del cliente es ``REMOTE_ADDR``, salvo que la aplicación esté detrás de
+proxies de confianza: con ``LOGIN_THROTTLE_PROXIES = n`` se toma la n-ésima
+dirección desde la derecha de ``X-Forwarded-For`` (la que agregó el primer
+proxy propio; las de más a la izquierda las puede inventar el cliente).
+
+La CPU total gastada en hashes no se acota con un contador global, que un
+atacante desde muchas IPs podría agotar y dejar fuera a todos, sino con un
+tope de hashes calculados a la vez por proceso (``turno_hash``): un intento
+espera turno unos segundos y solo se rechaza si no lo obtiene. Se configura
+con ``LOGIN_THROTTLE_HASHES = (concurrentes, segundos de espera)``.
+
+El conteo usa una ventana deslizante aproximada con dos contadores fijos
+(ventana actual y anterior, ponderada por la fracción que aún se solapa), así
+que cada verificación cuesta un ``get_many`` por ámbito y cada fallo un
+``incr`` en la caché de Django: la local en memoria por defecto (límites por
+proceso) o una caché de base de datos para compartirlos entre procesos,
+configurable con ``LOGIN_THROTTLE_CACHE``.
+
+Los límites se ajustan en ``settings.LOGIN_THROTTLE`` como
+``{'usuario': (intentos, segundos), ...}``.
+"""
+import hashlib
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+LIMITES_POR_DEFECTO = {
+    'usuario': (5, 300),
+    'ip': (30, 60),
+}
+
+HASHES_POR_DEFECTO = (2, 5)
+
+# Reloj usado por defecto (reemplazable en benchmarks con tiempo simulado)
+reloj = time.time
+
+
+def _cache():
+    return caches[getattr(settings, 'LOGIN_THROTTLE_CACHE', 'default')]
+
+
+def _limites():
+    limites = {**LIMITES_POR_DEFECTO, **getattr(settings, 'LOGIN_THROTTLE', {})}
+    return {ambito: limites[ambito] for ambito in LIMITES_POR_DEFECTO}
+
+
+class VentanaDeslizante:
+    """Contador de ventana deslizante aproximada sobre una caché de Django."""
+
+    def __init__(self, cache, ambito, limite, ventana):
+        self.cache = cache
+        self.ambito = ambito
+        self.limite = limite
+        self.ventana = ventana
+
+    def _clave(self, ident, indice):
+        return f'login-throttle:{self.ambito}:{ident}:{indice}'
+
+    def estado(self, ident, ahora):
+        """(conteo estimado, fracción transcurrida, n actual, n anterior)."""
+        indice, resto = divmod(ahora, self.ventana)
+        indice = int(indice)
+        actual, anterior = self._clave(ident, indice), self._clave(ident, indice - 1)
+        valores = self.cache.get_many([actual, anterior])
+        fraccion = resto / self.ventana
+        n_actual, n_anterior = valores.get(actual, 0), valores.get(anterior, 0)
+        return n_anterior * (1 - fraccion) + n_actual, fraccion, n_actual, n_anterior
+
+    def espera(self, ident, ahora):
+        """Segundos hasta que se permita otro intento (0 si ya se permite)."""
+        conteo, fraccion, n_actual, n_anterior = self.estado(ident, ahora)
+        if conteo < self.limite:
+            return 0
+        if n_actual >= self.limite or not n_anterior:
+            # Solo baja al empezar la próxima ventana (y luego sigue bajando)
+            return math.ceil((1 - fraccion) * self.ventana)
+        # Fracción en que la ventana anterior pesa lo bastante poco
+        objetivo = 1 - (self.limite - n_actual) / n_anterior
+        return max(1, math.ceil((objetivo - fraccion) * self.ventana))
+
+    def registrar(self, ident, ahora):
+        clave = self._clave(ident, int(ahora // self.ventana))
+        # add() es atómico: solo el primero crea la clave; el resto incrementa
+        if not self.cache.add(clave, 1, timeout=2 * self.ventana):
+            try:
+                self.cache.incr(clave)
+            except ValueError:
+                self.cache.set(clave, 1, timeout=2 * self.ventana)
+
+    def reiniciar(self, ident, ahora):
+        indice = int(ahora // self.ventana)
+        self.cache.delete_many([self._clave(ident, indice), self._clave(ident, indice - 1)])
+
+
+def ip_cliente(request):
+    """IP del cliente: ``REMOTE_ADDR`` o, detrás de ``LOGIN_THROTTLE_PROXIES``
+    proxies de confianza, la que agregó el primero de ellos a ``X-Forwarded-For``."""
+    proxies = getattr(settings, 'LOGIN_THROTTLE_PROXIES', 0)
+    if proxies:
+        reenviadas = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(reenviadas) >= proxies:
+            return reenviadas[-proxies]
+    return request.META.get('REMOTE_ADDR') or 'desconocida'
+
+
+def _identificadores(request, username):
+    usuario = hashlib.sha256((username or '').strip().lower().encode('utf-8')).hexdigest()[:32]
+    return {'usuario': usuario, 'ip': ip_cliente(request)}
+
+
+def _ventanas():
+    cache = _cache()
+    return {ambito: VentanaDeslizante(cache, ambito, limite, ventana)
+            for ambito, (limite, ventana) in _limites().items()}
+
+
+def verificar(request, username, ahora=None):
+    """Devuelve 0 si se permite intentar el login o los segundos de espera si
+    el usuario o la IP superaron su límite de intentos fallidos. No registra
+    nada: eso lo hace ``login_fallido``."""
+    ahora = reloj() if ahora is None else ahora
+    idents = _identificadores(request, username)
+    return max(v.espera(idents[ambito], ahora) for ambito, v in _ventanas().items())
+
+
+def login_fallido(request, username, ahora=None):
+    """Registra un intento fallido en todos los ámbitos."""
+    ahora = reloj() if ahora is None else ahora
+    idents = _identificadores(request, username)
+    for ambito, v in _ventanas().items():
+        v.registrar(idents[ambito], ahora)
+
+
+def login_exitoso(request, username, ahora=None):
+    """Tras un login correcto se olvidan los intentos fallidos del usuario."""
+    ahora = reloj() if ahora is None else ahora
+    _ventanas()['usuario'].reiniciar(_identificadores(request, username)['usuario'], ahora)
+
+
+_semaforos = {}
+_semaforos_lock = threading.Lock()
+
+
+def _semaforo(concurrentes):
+    with _semaforos_lock:
+        if concurrentes not in _semaforos:
+            _semaforos[concurrentes] = threading.BoundedSemaphore(concurrentes)
+        return _semaforos[concurrentes]
+
+
+@contextmanager
+def turno_hash():
+    """Reserva uno de los hashes concurrentes del proceso mientras dura el
+    bloque. Entrega False si no se liberó ninguno en el tiempo de espera."""
+    concurrentes, espera = getattr(settings, 'LOGIN_THROTTLE_HASHES', HASHES_POR_DEFECTO)
+    semaforo = _semaforo(concurrentes)
+    if not semaforo.acquire(timeout=espera):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        semaforo.release()
@@ -2,25 +2,46 @@
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
-from django.http import HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseForbidden
 from django.contrib import messages
 from .forms import LoginForm, ProfesionalRegistroForm
 from .models import Usuario, Rol
-from registros.models import Parto
+from .backends import tiene_rol
+from . import throttle
+from registros.models import FilaListadoParto, Parto
 from django.utils import timezone
 
+def _demasiados_intentos(espera):
+    # Respuesta mínima (sin plantilla): el rechazo debe costar poco
+    response = HttpResponse(
+        f"Demasiados intentos de inicio de sesión. Intente nuevamente en {espera} segundos.",
+        status=429, content_type="text/plain; charset=utf-8",
+    )
+    response["Retry-After"] = str(espera)
+    return response
+
 def login_view(request):
     if request.user.is_authenticated:
         return redirect("cuentas:dashboard")
     form = LoginForm(request.POST or None)
     error = None
+    if request.method == "POST":
+        # Límite de intentos fallidos antes de calcular ningún hash de contraseña
+        espera = throttle.verificar(request, request.POST.get("username", ""))
+        if espera:
+            return _demasiados_intentos(espera)
     if request.method == "POST" and form.is_valid():
         u = form.cleaned_data["username"]
         p = form.cleaned_data["password"]
-        user = authenticate(request, username=u, password=p)
+        with throttle.turno_hash() as permitido:
+            if not permitido:
+                return _demasiados_intentos(1)
+            user = authenticate(request, username=u, password=p)
         if user and user.is_active:
+            throttle.login_exitoso(request, u)
             login(request, user)
             return redirect("cuentas:dashboard")
+        throttle.login_fallido(request, u)
         error = "Credenciales inválidas."
     return render(request, "cuentas/login.html", {"form": form, "error": error})
 
@@ -28,14 +49,14 @@ def login_view(request):
 def dashboard(request):
     # Estadísticas rápidas para matronas
     now = timezone.now()
-    inicio_mes = now.replace(day=1)
+    inicio_mes = timezone.localdate().replace(day=1)
     # Totales
-    total_mes = Parto.objects.filter(fecha_hora__date__gte=inicio_mes.date()).count()
+    total_mes = Parto.objects.in_local_dates(inicio_mes, None).count()
     total_30dias = Parto.objects.filter(fecha_hora__gte=now - timezone.timedelta(days=30)).count()
-    # Últimos 5 registros (global)
-    recientes = Parto.objects.select_related('madre', 'created_by').order_by('-fecha_hora')[:5]
+    # Últimos 5 registros (global), desde el modelo de lectura del listado
+    recientes = FilaListadoParto.objects.order_by('-fecha_hora', '-parto_id')[:5]
     # Mis registros
-    mis_registros = Parto.objects.filter(created_by=request.user).select_related('madre').order_by('-fecha_hora')[:5]
+    mis_registros = FilaListadoParto.objects.filter(created_by_id=request.user.pk).order_by('-fecha_hora', '-parto_id')[:5]
 
     return render(request, "cuentas/dashboard.html", {
         'total_mes': total_mes,
@@ -55,7 +76,7 @@ def requiere_rol(*rol_nombres):
         def _wrap(request, *args, **kwargs):
             if not request.user.is_authenticated:
                 return redirect("cuentas:login")
-            if not request.user.rol or request.user.rol.nombre not in rol_nombres:
+            if not tiene_rol(request.user, *rol_nombres):
                 return HttpResponseForbidden("No tiene permisos para esta acción.")
             return vista(request, *args, **kwargs)
         return _wrap
@@ -73,6 +73,8 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 # Expose a small flag to templates so they can show/hide signup links
                 'cuentas.context_processors.signup_settings',
+                # Bundle estático propio (si no está construido se usan los CDN)
+                'cuentas.context_processors.static_bundle',
             ],
         },
     },
@@ -139,6 +141,14 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# En producción collectstatic agrega un hash del contenido a cada nombre y
+# deja copias .gz precomprimidas (ver cuentas/estaticos.py)
+if not DEBUG:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'cuentas.estaticos.ManifestGzipStorage'},
+    }
+
 MEDIA_URL = '/media/'
 LOGIN_URL = '/login/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -150,7 +160,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Configuración de Autenticación
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    # ModelBackend que carga el Usuario con su Rol en una sola consulta
+    'cuentas.backends.UsuarioBackend',
 ]
 
 # Configuraciones de autenticación
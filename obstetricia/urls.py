@@ -16,7 +16,7 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
@@ -34,3 +34,9 @@ urlpatterns = [
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    # Estáticos hasheados con .gz y caché de un año (un nginx con
+    # gzip_static puede reemplazar esta ruta)
+    from cuentas.estaticos import servir
+
+    urlpatterns += [re_path(r"^%s(?P<path>.*)$" % settings.STATIC_URL.lstrip("/"), servir)]
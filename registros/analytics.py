@@ -0,0 +1,231 @@
+"""Snapshot columnar de madres, partos y recién nacidos para análisis offline.
+
+``escribir_snapshot`` vuelca las tablas con tipos fijos (enteros, flotantes,
+fechas ``datetime64`` y campos de elección como códigos categóricos) a un
+directorio. Si pyarrow está instalado se escribe un Parquet por tabla; si no,
+un ``.npy`` por columna (el mismo formato que los miembros de un ``.npz``,
+pero sin zip para que ``np.load(mmap_mode='r')`` pueda mapearlos en memoria).
+``cargar_snapshot`` los lee de vuelta mapeados en memoria, sin tocar la base
+de datos de producción.
+
+Los datos personales identificables (nombres, RUT, dirección, teléfono) no
+se incluyen: los análisis trabajan con ids. Los partos y recién nacidos
+archivados (``archivo``) se incluyen a continuación de los de la tabla
+caliente.
+"""
+import json
+import os
+from datetime import timezone as dt_timezone
+
+from . import archivo
+from .models import Madre, Parto, RecienNacido
+from .respaldo import lectura_consistente
+
+TAMANO_LOTE = 5000
+
+# tabla -> (modelo, [(columna, campo ORM, tipo)])
+# tipos: 'id' (int64, nulo = -1), 'int16', 'int8', 'float' (float64, nulo = NaN),
+# 'fecha' (datetime64[D]), 'fecha_hora' (datetime64[s] UTC), 'hora' (segundos
+# desde medianoche, int32), o una lista de choices (código int8, nulo = -1).
+TABLAS = {
+    'madres': (Madre, [
+        ('id', 'id', 'id'),
+        ('fecha_nacimiento', 'fecha_nacimiento', 'fecha'),
+        ('estado_civil', 'estado_civil', Madre.ESTADO_CIVIL_CHOICES),
+        ('prevision', 'prevision', Madre.PREVISION_CHOICES),
+    ]),
+    'partos': (Parto, [
+        ('id', 'id', 'id'),
+        ('madre_id', 'madre_id', 'id'),
+        ('fecha_hora', 'fecha_hora', 'fecha_hora'),
+        ('tipo_parto', 'tipo_parto', Parto.TIPO_PARTO_CHOICES),
+        ('semanas_gestacion', 'semanas_gestacion', 'int16'),
+        ('tipo_anestesia', 'tipo_anestesia', Parto.TIPO_ANESTESIA_CHOICES),
+        ('created_by_id', 'created_by_id', 'id'),
+    ]),
+    'recien_nacidos': (RecienNacido, [
+        ('id', 'id', 'id'),
+        ('parto_id', 'parto_id', 'id'),
+        ('hora_nacimiento', 'hora_nacimiento', 'hora'),
+        ('sexo', 'sexo', RecienNacido.SEXO_CHOICES),
+        ('peso', 'peso', 'float'),
+        ('talla', 'talla', 'float'),
+        ('apgar_1', 'apgar_1', 'int8'),
+        ('apgar_5', 'apgar_5', 'int8'),
+        ('estado', 'estado', RecienNacido.ESTADO_CHOICES),
+    ]),
+}
+
+
+def _dtype(np, tipo):
+    if isinstance(tipo, list):
+        return np.int8
+    return {
+        'id': np.int64, 'int16': np.int16, 'int8': np.int8, 'float': np.float64,
+        'fecha': 'datetime64[D]', 'fecha_hora': 'datetime64[s]', 'hora': np.int32,
+    }[tipo]
+
+
+def _convertir(tipo, valor, codigos):
+    if isinstance(tipo, list):
+        return codigos.get(valor, -1)
+    if valor is None:
+        return {'float': float('nan'), 'fecha': 'NaT', 'fecha_hora': 'NaT'}.get(tipo, -1)
+    if tipo == 'float':
+        return float(valor)
+    if tipo == 'fecha_hora':
+        # datetime64 no admite zona horaria: se guarda en UTC
+        return valor.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    if tipo == 'hora':
+        return valor.hour * 3600 + valor.minute * 60 + valor.second
+    return valor
+
+
+def leer_columnas(tabla):
+    """Lee una tabla a arrays NumPy tipados. Devuelve (columnas, categorias)."""
+    import numpy as np
+
+    modelo, columnas = TABLAS[tabla]
+    campos = [campo for _, campo, _ in columnas]
+    codigos = {
+        nombre: {valor: i for i, (valor, _) in enumerate(tipo)}
+        for nombre, _, tipo in columnas if isinstance(tipo, list)
+    }
+
+    # Conteo y lectura de cada tabla (caliente y archivo) en la misma
+    # instantánea: ni inserciones ni un archivado concurrente desalinean filas
+    partes = []
+    with lectura_consistente():
+        for m in archivo.modelos(modelo):
+            total = m.objects.count()
+            arrays = {nombre: np.empty(total, dtype=_dtype(np, tipo)) for nombre, _, tipo in columnas}
+            # Lotes por id: memoria acotada y sin cursores largos
+            n, ultimo = 0, 0
+            qs = m.objects.order_by('id')
+            while n < total:
+                lote = list(qs.filter(id__gt=ultimo).values_list(*campos)[:TAMANO_LOTE])
+                if not lote:
+                    break
+                lote = lote[:total - n]
+                for j, (nombre, _, tipo) in enumerate(columnas):
+                    arrays[nombre][n:n + len(lote)] = [_convertir(tipo, fila[j], codigos.get(nombre)) for fila in lote]
+                n += len(lote)
+                ultimo = lote[-1][0]
+            partes.append({nombre: arr[:n] for nombre, arr in arrays.items()})
+
+    columnas_leidas = {
+        nombre: partes[0][nombre] if len(partes) == 1 else np.concatenate([p[nombre] for p in partes])
+        for nombre, _, _ in columnas
+    }
+    categorias = {
+        nombre: [valor for valor, _ in tipo]
+        for nombre, _, tipo in columnas if isinstance(tipo, list)
+    }
+    return columnas_leidas, categorias
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def escribir_snapshot(directorio, formato='auto'):
+    """Escribe el snapshot en ``directorio``. ``formato``: auto, parquet o npy.
+
+    Devuelve {tabla: número de filas}.
+    """
+    import numpy as np
+
+    pa = _pyarrow()
+    if formato == 'auto':
+        formato = 'parquet' if pa else 'npy'
+    if formato == 'parquet' and pa is None:
+        raise RuntimeError('pyarrow no está instalado; use formato npy')
+
+    os.makedirs(directorio, exist_ok=True)
+    meta = {'formato': formato, 'tablas': {}}
+    # Todas las tablas en la misma instantánea: los ids cruzados (madre_id,
+    # parto_id) siempre apuntan a filas del snapshot
+    with lectura_consistente():
+        leidas = {tabla: leer_columnas(tabla) for tabla in TABLAS}
+    for tabla, (columnas, categorias) in leidas.items():
+        filas = len(next(iter(columnas.values())))
+        if formato == 'parquet':
+            _escribir_parquet(pa, os.path.join(directorio, f'{tabla}.parquet'), columnas, categorias)
+        else:
+            carpeta = os.path.join(directorio, tabla)
+            os.makedirs(carpeta, exist_ok=True)
+            for nombre, arr in columnas.items():
+                np.save(os.path.join(carpeta, f'{nombre}.npy'), arr)
+        meta['tablas'][tabla] = {'filas': filas, 'columnas': list(columnas), 'categorias': categorias}
+
+    with open(os.path.join(directorio, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return {t: m['filas'] for t, m in meta['tablas'].items()}
+
+
+def _escribir_parquet(pa, ruta, columnas, categorias):
+    import pyarrow.parquet as pq
+
+    campos = {}
+    for nombre, arr in columnas.items():
+        if nombre in categorias:
+            # Código -1 = sin valor -> nulo en el diccionario
+            indices = pa.array(arr, mask=arr < 0, type=pa.int8())
+            campos[nombre] = pa.DictionaryArray.from_arrays(indices, pa.array(categorias[nombre]))
+        else:
+            campos[nombre] = pa.array(arr)
+    pq.write_table(pa.table(campos), ruta)
+
+
+class SnapshotAnalitico:
+    """Snapshot cargado: ``columnas[tabla][columna]`` son arrays NumPy
+    (mapeados en memoria cuando el formato lo permite) y
+    ``categorias[tabla][columna]`` la lista de valores de cada código."""
+
+    def __init__(self, columnas, categorias):
+        self.columnas = columnas
+        self.categorias = categorias
+
+    def a_pandas(self, tabla):
+        """DataFrame de una tabla con los campos de elección como Categorical."""
+        import pandas as pd
+        datos = {}
+        for nombre, arr in self.columnas[tabla].items():
+            cats = self.categorias[tabla].get(nombre)
+            datos[nombre] = pd.Categorical.from_codes(arr, cats) if cats else arr
+        return pd.DataFrame(datos)
+
+
+def cargar_snapshot(directorio):
+    """Carga un snapshot escrito por ``escribir_snapshot`` sin usar la BD."""
+    import numpy as np
+
+    with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    columnas = {}
+    categorias = {t: m['categorias'] for t, m in meta['tablas'].items()}
+    for tabla in meta['tablas']:
+        if meta['formato'] == 'parquet':
+            import pyarrow.parquet as pq
+            tabla_pa = pq.read_table(os.path.join(directorio, f'{tabla}.parquet'), memory_map=True)
+            cols = {}
+            for nombre in tabla_pa.column_names:
+                col = tabla_pa.column(nombre).combine_chunks()
+                if nombre in categorias[tabla]:
+                    cols[nombre] = col.indices.fill_null(-1).to_numpy()
+                else:
+                    cols[nombre] = col.to_numpy(zero_copy_only=False)
+            columnas[tabla] = cols
+        else:
+            carpeta = os.path.join(directorio, tabla)
+            columnas[tabla] = {
+                nombre: np.load(os.path.join(carpeta, f'{nombre}.npy'), mmap_mode='r')
+                for nombre in meta['tablas'][tabla]['columnas']
+            }
+    return SnapshotAnalitico(columnas, categorias)
@@ -0,0 +1,131 @@
+"""Archivo frío de partos antiguos (partición caliente/fría).
+
+El trabajo diario solo toca las últimas semanas, pero listado, dashboard y
+búsqueda recorrían toda la historia. ``archivar`` mueve los partos (y sus
+recién nacidos) anteriores al horizonte a ``PartoArchivado`` /
+``RecienNacidoArchivado`` (y sus complicaciones codificadas a
+``PartoArchivadoComplicacion``), con los mismos ids y columnas, en lotes por id y
+una transacción corta por lote. Las consultas operativas siguen usando
+``Parto``/``RecienNacido`` y por lo tanto solo recorren el conjunto caliente.
+
+Lectura transparente:
+
+- ``obtener_parto`` busca en la tabla caliente y luego en el archivo (la URL
+  de detalle de un parto archivado sigue funcionando, en solo lectura).
+- ``tablas(fecha_inicio, fecha_fin)`` devuelve los pares de modelos que debe
+  consultar un reporte o exportación por rango: el archivo solo se agrega si
+  el rango empieza antes del parto archivado más reciente (``frontera``, una
+  lectura del extremo del índice de ``fecha_hora``). ``modelos`` hace lo
+  mismo para una sola tabla (partos o recién nacidos).
+
+No se usan particiones RANGE de MySQL: InnoDB no admite claves foráneas en
+tablas particionadas y ``RecienNacido`` depende de ``Parto``.
+
+Mover un registro al archivo no es una eliminación: se borra de la tabla
+caliente sin señales, así que no deja lápida para la exportación incremental
+ni se publica en el tablero.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import (
+    FilaListadoParto, Parto, PartoArchivado, PartoArchivadoComplicacion, PartoComplicacion,
+    RecienNacido, RecienNacidoArchivado,
+)
+from .utils import local_date_bounds
+
+HORIZONTE_DIAS = 730
+TAMANO_LOTE = 500
+
+CALIENTE = (Parto, RecienNacido)
+ARCHIVO = (PartoArchivado, RecienNacidoArchivado)
+
+# Columnas comunes (attname: madre_id, created_by_id, parto_id...)
+CAMPOS_PARTO = [f.attname for f in PartoArchivado._meta.concrete_fields if f.name != 'archivado_en']
+CAMPOS_RN = [f.attname for f in RecienNacidoArchivado._meta.concrete_fields]
+
+
+def horizonte():
+    """Días que un parto permanece en la tabla caliente (``ARCHIVO_PARTOS_DIAS``)."""
+    return getattr(settings, 'ARCHIVO_PARTOS_DIAS', HORIZONTE_DIAS)
+
+
+def archivables(antes):
+    return Parto.objects.filter(fecha_hora__lt=antes)
+
+
+def _borrar(qs):
+    # DELETE directo, sin cargar objetos ni disparar señales
+    qs._raw_delete(qs.db)
+
+
+def archivar(antes, lote=TAMANO_LOTE):
+    """Mueve al archivo los partos con ``fecha_hora < antes`` y sus recién
+    nacidos. Devuelve (partos, recién nacidos) movidos."""
+    total_partos = total_rn = 0
+    ultimo = 0
+    while True:
+        with transaction.atomic():
+            partos = list(
+                archivables(antes).filter(id__gt=ultimo).order_by('id')
+                .select_for_update().values(*CAMPOS_PARTO)[:lote]
+            )
+            if not partos:
+                break
+            ids = [p['id'] for p in partos]
+            recien_nacidos = list(
+                RecienNacido.objects.filter(parto_id__in=ids).order_by('id').values(*CAMPOS_RN)
+            )
+            complicaciones = list(
+                PartoComplicacion.objects.filter(parto_id__in=ids).values_list('parto_id', 'complicacion_id')
+            )
+            PartoArchivado.objects.bulk_create([PartoArchivado(**p) for p in partos])
+            RecienNacidoArchivado.objects.bulk_create([RecienNacidoArchivado(**r) for r in recien_nacidos])
+            PartoArchivadoComplicacion.objects.bulk_create([
+                PartoArchivadoComplicacion(parto_id=parto_id, complicacion_id=complicacion_id)
+                for parto_id, complicacion_id in complicaciones
+            ])
+            _borrar(RecienNacido.objects.filter(parto_id__in=ids))
+            _borrar(PartoComplicacion.objects.filter(parto_id__in=ids))
+            # Los archivados salen del listado (solo muestra la tabla caliente)
+            _borrar(FilaListadoParto.objects.filter(parto_id__in=ids))
+            _borrar(Parto.objects.filter(id__in=ids))
+        ultimo = ids[-1]
+        total_partos += len(partos)
+        total_rn += len(recien_nacidos)
+    return total_partos, total_rn
+
+
+def frontera():
+    """``fecha_hora`` del parto archivado más reciente (None si no hay archivo)."""
+    return PartoArchivado.objects.aggregate(m=Max('fecha_hora'))['m']
+
+
+def tablas(fecha_inicio=None, fecha_fin=None):
+    """Pares (modelo de parto, modelo de recién nacido) que cubren el rango de
+    días locales: la tabla caliente siempre y el archivo si el rango lo alcanza."""
+    desde, _ = local_date_bounds(fecha_inicio, fecha_fin)
+    limite = frontera()
+    if limite is None or (desde is not None and desde > limite):
+        return [CALIENTE]
+    return [CALIENTE, ARCHIVO]
+
+
+def modelos(modelo, fecha_inicio=None, fecha_fin=None):
+    """Modelos que guardan las filas de ``modelo`` en el rango: ``Parto`` o
+    ``RecienNacido`` y, si el rango lo alcanza, su tabla de archivo. Un
+    modelo que no se archiva (``Madre``) se devuelve solo."""
+    if modelo not in CALIENTE:
+        return [modelo]
+    i = CALIENTE.index(modelo)
+    return [par[i] for par in tablas(fecha_inicio, fecha_fin)]
+
+
+def obtener_parto(parto_id):
+    """Parto con su detalle (``for_detail``) desde la tabla caliente o el archivo."""
+    for modelo, _ in (CALIENTE, ARCHIVO):
+        parto = modelo.objects.for_detail().filter(id=parto_id).first()
+        if parto is not None:
+            return parto
+    return None
@@ -0,0 +1,313 @@
+"""Búsqueda clínica de texto libre (índice invertido en la base de datos).
+
+Indexa ``Parto.complicaciones``, ``Parto.observaciones`` y
+``RecienNacido.observaciones`` en ``PosicionTermino``: una fila por palabra
+con su posición en el texto. El texto pasa por el mismo análisis al indexar
+y al consultar:
+
+- plegado de acentos y mayúsculas (``Preeclámpsia`` = ``preeclampsia``),
+- palabras vacías del castellano fuera del índice (``de``, ``la``, ``con``...;
+  ``no`` y ``sin`` se conservan porque cambian el sentido clínico),
+- raíz ligera: plural y género (``distocias`` = ``distocia``,
+  ``severa`` = ``severo``). No se usa un stemmer agresivo: en textos clínicos
+  confunde términos distintos.
+
+Una consulta es una lista de palabras (deben aparecer todas, en cualquier
+campo) y de frases entre comillas (deben aparecer seguidas en el mismo
+campo). Las posiciones cuentan también las palabras vacías, así que
+``"rotura de membranas"`` no coincide con ``rotura prematura de membranas``.
+
+Todo se resuelve en la base de datos: cada frase es un ``EXISTS`` sobre el
+índice correlacionado con el parto (y, para frases de varias palabras, con
+la posición del término anterior), de modo que el filtro, el orden por
+fecha, el conteo y la página (LIMIT/OFFSET) los calcula una sola consulta
+sin traer ids ni posiciones a Python.
+
+El índice se actualiza en la misma transacción que el guardado (señales de
+``registros.signals``): al guardar un parto solo se reescriben sus entradas
+si cambió alguno de sus textos. Los ids de ``PosicionTermino`` no son
+claves foráneas, así que un parto archivado (``registros.archivo``) sigue
+apareciendo en la búsqueda sin reindexarse. ``reindexar`` (comando
+``reindexar_busqueda``) reconstruye el índice completo, por ejemplo tras
+cambiar el análisis.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Value
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from . import archivo
+from .models import PosicionTermino
+
+TAMANO_LOTE = 500
+LARGO_TERMINO = PosicionTermino._meta.get_field('termino').max_length
+
+CAMPOS_PARTO = (
+    (PosicionTermino.CAMPO_COMPLICACIONES, 'complicaciones'),
+    (PosicionTermino.CAMPO_OBSERVACIONES, 'observaciones'),
+)
+
+PALABRAS_VACIAS = frozenset('''
+    a al algo algunas algunos ante antes como con contra cual cuando de del
+    desde donde durante e el ella ellas ellos en entre era es esa esas ese eso
+    esos esta estaba estan estas este esto estos fue fueron ha han hasta hay
+    la las le les lo los mas me mi mis muy nada ni nos o otra otras otro otros
+    para pero poco por porque que quien se sea ser si sido son su sus tambien
+    tanto te todo todos tu un una uno unos y ya yo
+'''.split())
+
+_PALABRA = re.compile(r'[^\W_]+')
+_CONSULTA = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+@lru_cache(maxsize=4096)
+def _plegar_caracter(c):
+    base = ''.join(x for x in unicodedata.normalize('NFKD', c) if not unicodedata.combining(x)).lower()
+    # Un carácter por carácter: las posiciones siguen valiendo en el texto original
+    return base if len(base) == 1 else c
+
+
+def plegar(texto):
+    """Texto en minúsculas y sin acentos, del mismo largo que el original."""
+    return ''.join(map(_plegar_caracter, texto))
+
+
+def raiz(palabra):
+    """Raíz ligera de una palabra ya plegada: quita plural y género."""
+    if len(palabra) <= 3 or palabra.isdigit():
+        return palabra
+    if palabra.endswith('ces'):
+        palabra = palabra[:-3] + 'z'
+    elif palabra.endswith('es') and len(palabra) > 4 and palabra[-3] in 'dijlnrsz':
+        palabra = palabra[:-2]
+    elif palabra.endswith('s') and palabra[-2] in 'aeiou':
+        palabra = palabra[:-1]
+    if len(palabra) > 4 and palabra[-1] in 'aeo':
+        palabra = palabra[:-1]
+    return palabra[:LARGO_TERMINO]
+
+
+def terminos(texto):
+    """(posición, raíz) de cada palabra indexable del texto."""
+    return [
+        (posicion, raiz(palabra))
+        for posicion, palabra in enumerate(_PALABRA.findall(plegar(texto or '')))
+        if palabra not in PALABRAS_VACIAS
+    ]
+
+
+def analizar_consulta(texto):
+    """Frases de la consulta como listas de (desplazamiento, raíz).
+
+    Cada palabra suelta es una frase de un término; lo que va entre comillas
+    (o una palabra con guiones, como ``pre-eclampsia``) es una sola frase.
+    """
+    frases = []
+    for entre_comillas, suelta in _CONSULTA.findall(texto or ''):
+        trozo = terminos(entre_comillas if entre_comillas else suelta)
+        if trozo:
+            inicio = trozo[0][0]
+            frases.append([(posicion - inicio, termino) for posicion, termino in trozo])
+    return frases
+
+
+def _coincide(indice, frase):
+    """EXISTS de la frase en alguno de los textos del parto de la consulta
+    externa: el primer término y cada uno de los siguientes en el mismo campo
+    (y recién nacido) a la distancia justa de él."""
+    (_, primero), siguientes = frase[0], frase[1:]
+    inicio = indice.filter(parto_id=OuterRef('id'), termino=primero)
+    campos_parto = [campo for campo, _ in CAMPOS_PARTO]
+    for desplazamiento, termino in siguientes:
+        inicio = inicio.filter(Exists(PosicionTermino.objects.filter(
+            Q(recien_nacido_id=OuterRef('recien_nacido_id'))
+            | Q(recien_nacido_id__isnull=True, campo__in=campos_parto),
+            parto_id=OuterRef('parto_id'), campo=OuterRef('campo'), termino=termino,
+            posicion=OuterRef('posicion') + desplazamiento,
+        )))
+    return Exists(inicio)
+
+
+def condiciones(texto, campos=None):
+    """Condiciones (una por frase) que debe cumplir un parto para coincidir
+    con la consulta, opcionalmente solo en algunos ``campos``
+    (``PosicionTermino.CAMPO_*``). None si ningún parto puede coincidir."""
+    frases = analizar_consulta(texto)
+    if not frases:
+        return None
+    indice = PosicionTermino.objects.all()
+    if campos:
+        indice = indice.filter(campo__in=campos)
+    raices = {t for frase in frases for _, t in frase}
+    frecuencia = dict(
+        indice.filter(termino__in=raices).order_by().values('termino')
+        .annotate(n=Count('id')).values_list('termino', 'n')
+    )
+    if len(frecuencia) < len(raices):
+        return None
+    # La frase más selectiva primero
+    frases.sort(key=lambda frase: min(frecuencia[t] for _, t in frase))
+    return [_coincide(indice, frase) for frase in frases]
+
+
+def buscar_partos(texto, campos=None, fecha_inicio=None, fecha_fin=None):
+    """Claves ``(fecha_hora, id, tabla)`` de los partos (tabla caliente y
+    archivo) que coinciden con la consulta en el rango de días locales, del
+    más reciente al más antiguo. Es un QuerySet perezoso: ``Paginator`` lo
+    cuenta con COUNT y lee cada página con LIMIT/OFFSET; ``cargar`` trae los
+    partos de una página."""
+    filtros = condiciones(texto, campos)
+    consultas = []
+    for par in archivo.tablas(fecha_inicio, fecha_fin):
+        modelo = par[0]
+        qs = modelo.objects.in_local_dates(fecha_inicio, fecha_fin).order_by()
+        if filtros is None:
+            qs = qs.none()
+        else:
+            qs = qs.filter(*filtros)
+        tabla = Value((archivo.CALIENTE, archivo.ARCHIVO).index(par), IntegerField())
+        consultas.append(qs.annotate(tabla=tabla).values_list('fecha_hora', 'id', 'tabla'))
+    primera, resto = consultas[0], consultas[1:]
+    if resto:
+        primera = primera.union(*resto, all=True)
+    return primera.order_by('-fecha_hora', '-id')
+
+
+def cargar(claves):
+    """Partos (con su madre) de las claves de ``buscar_partos``, en el mismo orden."""
+    por_tabla = defaultdict(list)
+    for _, parto_id, tabla in claves:
+        por_tabla[tabla].append(parto_id)
+    partos = {}
+    for tabla, ids in por_tabla.items():
+        modelo = (archivo.CALIENTE, archivo.ARCHIVO)[tabla][0]
+        for parto in modelo.objects.filter(id__in=ids).select_related('madre').only(
+            'id', 'fecha_hora', 'tipo_parto', 'madre_id',
+            'madre__rut', 'madre__nombres', 'madre__apellidos',
+        ):
+            partos[tabla, parto.id] = parto
+    return [partos[tabla, parto_id] for _, parto_id, tabla in claves if (tabla, parto_id) in partos]
+
+
+def fragmento(texto, raices, margen=80):
+    """Trozo del texto alrededor de la primera coincidencia, con las palabras
+    buscadas marcadas (HTML seguro). None si no hay coincidencias."""
+    marcas = [
+        m.span() for m in _PALABRA.finditer(plegar(texto or ''))
+        if m.group() not in PALABRAS_VACIAS and raiz(m.group()) in raices
+    ]
+    if not marcas:
+        return None
+    inicio = max(0, marcas[0][0] - margen)
+    fin = min(len(texto), marcas[0][1] + margen)
+    partes = ['…' if inicio else '']
+    cursor = inicio
+    for a, b in marcas:
+        if b > fin:
+            break
+        partes.append(escape(texto[cursor:a]))
+        partes.append(format_html('<mark>{}</mark>', texto[a:b]))
+        cursor = b
+    partes.append(escape(texto[cursor:fin]))
+    partes.append('…' if fin < len(texto) else '')
+    return mark_safe(''.join(partes))
+
+
+def resaltar(partos, texto, campos=None):
+    """Agrega a cada parto ``coincidencias``: lista de (campo, fragmento).
+    Solo lee los textos de los partos recibidos (una página)."""
+    raices = {t for frase in analizar_consulta(texto) for _, t in frase}
+    etiquetas = dict(PosicionTermino.CAMPO_CHOICES)
+    por_tabla = defaultdict(list)
+    for parto in partos:
+        parto.coincidencias = []
+        por_tabla[parto.archivado].append(parto)
+    for modelo_parto, modelo_rn in (archivo.CALIENTE, archivo.ARCHIVO):
+        grupo = {p.id: p for p in por_tabla[modelo_parto.archivado]}
+        if not grupo:
+            continue
+        textos = defaultdict(list)
+        for fila in modelo_parto.objects.filter(id__in=grupo).values('id', 'complicaciones', 'observaciones'):
+            for campo, nombre in CAMPOS_PARTO:
+                textos[fila['id']].append((campo, fila[nombre]))
+        for parto_id, observaciones in (
+            modelo_rn.objects.filter(parto_id__in=grupo).order_by('id').values_list('parto_id', 'observaciones')
+        ):
+            textos[parto_id].append((PosicionTermino.CAMPO_OBSERVACIONES_RN, observaciones))
+        for parto_id, lista in textos.items():
+            for campo, contenido in lista:
+                if campos and campo not in campos:
+                    continue
+                trozo = fragmento(contenido, raices)
+                if trozo:
+                    grupo[parto_id].coincidencias.append((etiquetas[campo], trozo))
+
+
+# Mantenimiento del índice
+
+def _entradas(parto_id, campo, texto, recien_nacido_id=None):
+    return [
+        PosicionTermino(termino=termino, parto_id=parto_id, campo=campo,
+                        recien_nacido_id=recien_nacido_id, posicion=posicion)
+        for posicion, termino in terminos(texto)
+    ]
+
+
+def _entradas_parto(parto_id, valores):
+    return [e for campo, nombre in CAMPOS_PARTO for e in _entradas(parto_id, campo, valores[nombre])]
+
+
+def indexar_parto(parto):
+    """Reescribe las entradas de los textos del parto (no las de sus recién nacidos)."""
+    PosicionTermino.objects.filter(parto_id=parto.pk, recien_nacido_id=None).delete()
+    valores = {nombre: getattr(parto, nombre) for _, nombre in CAMPOS_PARTO}
+    PosicionTermino.objects.bulk_create(_entradas_parto(parto.pk, valores), batch_size=TAMANO_LOTE)
+
+
+def indexar_recien_nacido(recien_nacido):
+    PosicionTermino.objects.filter(parto_id=recien_nacido.parto_id, recien_nacido_id=recien_nacido.pk).delete()
+    PosicionTermino.objects.bulk_create(
+        _entradas(recien_nacido.parto_id, PosicionTermino.CAMPO_OBSERVACIONES_RN,
+                  recien_nacido.observaciones, recien_nacido.pk),
+        batch_size=TAMANO_LOTE,
+    )
+
+
+def desindexar(parto_id, recien_nacido_id=None):
+    """Quita las entradas de un parto completo o solo de uno de sus recién nacidos."""
+    entradas = PosicionTermino.objects.filter(parto_id=parto_id)
+    if recien_nacido_id is not None:
+        entradas = entradas.filter(recien_nacido_id=recien_nacido_id)
+    entradas.delete()
+
+
+def reindexar(lote=TAMANO_LOTE):
+    """Reescribe el índice de todos los partos (caliente y archivo) en lotes
+    por id; cada lote reemplaza solo sus propias entradas, así que la búsqueda
+    sigue disponible mientras tanto. Devuelve cuántos partos se indexaron."""
+    total = 0
+    for modelo_parto, modelo_rn in (archivo.CALIENTE, archivo.ARCHIVO):
+        ultimo = 0
+        while True:
+            partos = list(
+                modelo_parto.objects.filter(id__gt=ultimo).order_by('id')
+                .values('id', 'complicaciones', 'observaciones')[:lote]
+            )
+            if not partos:
+                break
+            ids = [p['id'] for p in partos]
+            entradas = [e for p in partos for e in _entradas_parto(p['id'], p)]
+            for rn in modelo_rn.objects.filter(parto_id__in=ids).values('id', 'parto_id', 'observaciones'):
+                entradas += _entradas(rn['parto_id'], PosicionTermino.CAMPO_OBSERVACIONES_RN,
+                                      rn['observaciones'], rn['id'])
+            with transaction.atomic():
+                PosicionTermino.objects.filter(parto_id__in=ids).delete()
+                PosicionTermino.objects.bulk_create(entradas, batch_size=TAMANO_LOTE)
+            ultimo = ids[-1]
+            total += len(ids)
+    return total
@@ -0,0 +1,164 @@
+"""Catálogo codificado de complicaciones (CIE-10) y su uso en reportes.
+
+``Parto.complicaciones`` es texto libre; para contar complicaciones había que
+leer todo el texto y buscar patrones en Python. Ahora cada parto referencia
+entradas de ``Complicacion`` (selector en ``PartoForm``) y los reportes
+cuentan con un GROUP BY sobre ``PartoComplicacion`` unido al índice de
+``Parto.fecha_hora`` (``conteos``).
+
+Para el texto ya registrado, ``codificar`` recorre los partos en lotes por id
+y asocia las entradas cuyo nombre o sinónimos aparecen en
+``complicaciones``. La comparación usa el análisis de ``registros.busqueda``
+(acentos, plurales, palabras vacías) y exige las palabras de la expresión en
+orden; se descarta la coincidencia si alguna de las tres palabras anteriores de la
+misma cláusula es una negación (``sin preeclampsia``, ``se descarta RPM``). Solo agrega
+asociaciones: las elegidas a mano se conservan y repetir la pasada no
+duplica nada.
+"""
+import re
+from collections import Counter, defaultdict
+
+from django.db.models import Count
+
+from . import archivo, busqueda
+from .models import Complicacion
+from .utils import local_date_bounds
+
+TAMANO_LOTE = 1000
+VENTANA_NEGACION = 3
+_CLAUSULAS = re.compile(r'[.,;:\n()]+')
+NEGACIONES = frozenset(busqueda.raiz(p) for p in ('no', 'sin', 'niega', 'descarta', 'descartada', 'descartado'))
+
+# (código CIE-10, nombre, sinónimos) cargados por la migración 0008
+CATALOGO_BASE = [
+    ('O13', 'Hipertensión gestacional', ['hipertension gestacional', 'hipertension del embarazo']),
+    ('O14.0', 'Preeclampsia moderada', ['preeclampsia moderada', 'preeclampsia leve']),
+    ('O14.1', 'Preeclampsia severa', ['preeclampsia severa', 'preeclampsia grave']),
+    ('O14.2', 'Síndrome HELLP', ['HELLP']),
+    ('O14.9', 'Preeclampsia no especificada', ['preeclampsia']),
+    ('O15.9', 'Eclampsia', ['eclampsia']),
+    ('O24.4', 'Diabetes gestacional', ['diabetes gestacional', 'DMG']),
+    ('O41.0', 'Oligohidramnios', ['oligohidramnios', 'OHA']),
+    ('O40', 'Polihidramnios', ['polihidramnios', 'PHA']),
+    ('O42.9', 'Rotura prematura de membranas', [
+        'rotura prematura de membranas', 'rotura de membranas', 'ruptura prematura de membranas', 'RPM',
+    ]),
+    ('O44.1', 'Placenta previa con hemorragia', ['placenta previa']),
+    ('O45.9', 'Desprendimiento prematuro de placenta', [
+        'desprendimiento prematuro de placenta', 'desprendimiento de placenta', 'DPPNI',
+    ]),
+    ('O48', 'Embarazo prolongado', ['embarazo prolongado', 'postermino']),
+    ('O60.1', 'Parto prematuro', ['parto prematuro', 'parto pretermino']),
+    ('O63.9', 'Trabajo de parto prolongado', ['trabajo de parto prolongado', 'expulsivo prolongado']),
+    ('O64.1', 'Presentación podálica', ['presentacion podalica', 'podalica', 'nalgas']),
+    ('O66.0', 'Distocia de hombros', ['distocia de hombros', 'distocia de hombro']),
+    ('O66.9', 'Distocia no especificada', ['distocia']),
+    ('O68.9', 'Sufrimiento fetal', ['sufrimiento fetal', 'SFA', 'estado fetal no tranquilizador']),
+    ('O69.1', 'Circular de cordón', ['circular de cordon', 'circular al cuello']),
+    ('O70.9', 'Desgarro perineal', ['desgarro perineal', 'desgarro']),
+    ('O71.1', 'Rotura uterina', ['rotura uterina', 'ruptura uterina']),
+    ('O72.1', 'Hemorragia postparto', ['hemorragia postparto', 'hemorragia post parto', 'HPP']),
+    ('O73.0', 'Retención de placenta', ['retencion de placenta', 'retencion placentaria']),
+    ('O75.2', 'Fiebre intraparto', ['fiebre intraparto', 'corioamnionitis']),
+]
+
+
+def sembrar_catalogo(modelo=Complicacion):
+    """Crea las entradas de ``CATALOGO_BASE`` que falten (no toca las existentes)."""
+    existentes = set(modelo.objects.values_list('codigo', flat=True))
+    modelo.objects.bulk_create([
+        modelo(codigo=codigo, nombre=nombre, sinonimos='\n'.join(sinonimos))
+        for codigo, nombre, sinonimos in CATALOGO_BASE if codigo not in existentes
+    ])
+
+
+class Diccionario:
+    """Expresiones del catálogo analizadas una vez, indexadas por su primer término."""
+
+    def __init__(self, complicaciones):
+        self.expresiones = defaultdict(list)
+        for complicacion in complicaciones:
+            for expresion in [complicacion.nombre, *complicacion.sinonimos.splitlines()]:
+                terminos = busqueda.terminos(expresion)
+                if not terminos:
+                    continue
+                inicio = terminos[0][0]
+                frase = [(posicion - inicio, termino) for posicion, termino in terminos]
+                self.expresiones[frase[0][1]].append((frase, complicacion.id))
+        # La expresión más larga primero: "preeclampsia severa" gana sobre
+        # "preeclampsia" y el texto queda solo con el código específico
+        for candidatas in self.expresiones.values():
+            candidatas.sort(key=lambda c: -c[0][-1][0])
+
+    def codigos(self, texto):
+        """Ids de las complicaciones mencionadas (sin negar) en el texto."""
+        encontrados = set()
+        # Una negación solo alcanza a su cláusula: "Sin preeclampsia. Distocia..."
+        for clausula in _CLAUSULAS.split(texto or ''):
+            terminos = busqueda.terminos(clausula)
+            por_posicion = dict(terminos)
+            cubierto = -1
+            for inicio, termino in terminos:
+                if inicio <= cubierto:
+                    continue
+                for frase, complicacion_id in self.expresiones.get(termino, ()):
+                    if all(por_posicion.get(inicio + d) == t for d, t in frase):
+                        cubierto = inicio + frase[-1][0]
+                        if not any(por_posicion.get(p) in NEGACIONES
+                                   for p in range(inicio - VENTANA_NEGACION, inicio)):
+                            encontrados.add(complicacion_id)
+                        break
+        return encontrados
+
+
+def codificar(lote=TAMANO_LOTE, dry_run=False):
+    """Asocia complicaciones del catálogo a los partos (caliente y archivo)
+    según su texto libre. Devuelve (partos revisados, partos con alguna
+    coincidencia, asociaciones propuestas)."""
+    diccionario = Diccionario(Complicacion.objects.filter(activa=True))
+    revisados = codificados = asociaciones = 0
+    for modelo, _ in (archivo.CALIENTE, archivo.ARCHIVO):
+        intermedia = modelo.complicaciones_codificadas.through
+        ultimo = 0
+        while True:
+            partos = list(
+                modelo.objects.filter(id__gt=ultimo).exclude(complicaciones='')
+                .order_by('id').values_list('id', 'complicaciones')[:lote]
+            )
+            if not partos:
+                break
+            filas = [
+                intermedia(parto_id=parto_id, complicacion_id=complicacion_id)
+                for parto_id, texto in partos
+                for complicacion_id in diccionario.codigos(texto)
+            ]
+            if not dry_run:
+                # La restricción única descarta las que ya existían
+                intermedia.objects.bulk_create(filas, ignore_conflicts=True)
+            ultimo = partos[-1][0]
+            revisados += len(partos)
+            codificados += len({f.parto_id for f in filas})
+            asociaciones += len(filas)
+    return revisados, codificados, asociaciones
+
+
+def conteos(fecha_inicio=None, fecha_fin=None):
+    """Partos por complicación en el rango de días locales, de la más
+    frecuente a la menos: lista de dicts (codigo, nombre, partos)."""
+    desde, hasta = local_date_bounds(fecha_inicio, fecha_fin)
+    totales = Counter()
+    for modelo, _ in archivo.tablas(fecha_inicio, fecha_fin):
+        filas = modelo.complicaciones_codificadas.through.objects.all()
+        if desde is not None:
+            filas = filas.filter(parto__fecha_hora__gte=desde)
+        if hasta is not None:
+            filas = filas.filter(parto__fecha_hora__lt=hasta)
+        totales.update(dict(
+            filas.order_by().values('complicacion_id').annotate(n=Count('id'))
+            .values_list('complicacion_id', 'n')
+        ))
+    catalogo = Complicacion.objects.in_bulk(list(totales))
+    return [
+        {'codigo': catalogo[cid].codigo, 'nombre': catalogo[cid].nombre, 'partos': n}
+        for cid, n in sorted(totales.items(), key=lambda item: (-item[1], catalogo[item[0]].codigo))
+    ]
@@ -0,0 +1,36 @@
+"""Control optimista de concurrencia para ``editar_parto``.
+
+El formulario lleva como versión el ``updated_at`` de la madre y del parto
+tal como se cargaron. Al guardar, dentro de la transacción, ``reclamar``
+hace un UPDATE condicionado a que ``updated_at`` siga igual: si otra
+persona guardó entretanto no se actualiza ninguna fila y la edición se
+rechaza con ``ConflictoEdicion`` en vez de pisar sus cambios. No se
+mantiene ningún bloqueo mientras el formulario está abierto; el UPDATE solo
+bloquea la fila durante la transacción del guardado.
+"""
+from datetime import datetime
+
+from django.utils import timezone
+
+
+class ConflictoEdicion(Exception):
+    """El registro cambió desde que se abrió el formulario."""
+
+
+def version(instancia):
+    """Versión a incluir en el formulario."""
+    return instancia.updated_at.isoformat()
+
+
+def reclamar(instancia, version_formulario):
+    """Marca la fila como modificada solo si sigue en la versión del
+    formulario; si no, lanza ``ConflictoEdicion``. Debe llamarse dentro de
+    la transacción que guarda los cambios."""
+    try:
+        cargada = datetime.fromisoformat(version_formulario or '')
+    except ValueError:
+        raise ConflictoEdicion(f'{instancia._meta.verbose_name} sin versión válida')
+    actualizadas = type(instancia).objects.filter(pk=instancia.pk, updated_at=cargada).update(
+        updated_at=timezone.now())
+    if not actualizadas:
+        raise ConflictoEdicion(f'{instancia._meta.verbose_name} #{instancia.pk} cambió')
@@ -0,0 +1,108 @@
+"""Exportación incremental (delta) desde la última sincronización.
+
+El cliente envía una marca de agua (watermark) opaca y recibe solo las
+madres, partos y recién nacidos creados o modificados desde entonces, más
+las lápidas (``RegistroEliminado``) de los borrados. Cada entidad avanza con
+un cursor ``(updated_at, id)`` ordenado, de modo que la consulta usa el
+índice ``(updated_at, id)`` y no se pierden filas con el mismo timestamp.
+
+Las filas más recientes que ``MARGEN`` no se entregan todavía: una
+transacción que guardó antes pero confirmó después podría quedar detrás
+del cursor. Las actualizaciones masivas con ``QuerySet.update()`` no
+modifican ``updated_at`` y por lo tanto no aparecen en el delta.
+
+Los partos y recién nacidos archivados conservan id y ``updated_at``: cada
+página lee hasta ``limite`` filas de la tabla caliente y del archivo, las
+mezcla por ``(updated_at, id)`` y entrega las primeras, así el mismo cursor
+recorre ambas tablas. Archivar no es un cambio y no vuelve a entregarlos.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import archivo
+from .models import Madre, Parto, RecienNacido, RegistroEliminado
+from .stream_export import DATASETS, _valor
+
+MARGEN = timedelta(seconds=5)
+LIMITE = 1000
+
+ENTIDADES = {
+    'madres': Madre,
+    'partos': Parto,
+    'recien_nacidos': RecienNacido,
+}
+
+
+class WatermarkInvalido(ValueError):
+    pass
+
+
+def codificar(cursores):
+    datos = {k: [ts.isoformat(), pk] for k, (ts, pk) in cursores.items()}
+    return base64.urlsafe_b64encode(json.dumps(datos, sort_keys=True).encode()).decode()
+
+
+def decodificar(watermark):
+    """Watermark -> {entidad: (datetime, id)}. Vacío/None = desde el inicio."""
+    if not watermark:
+        return {}
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(watermark.encode()))
+        if not isinstance(datos, dict):
+            raise WatermarkInvalido('la marca de agua no es un objeto')
+        return {k: (datetime.fromisoformat(ts), int(pk)) for k, (ts, pk) in datos.items()}
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise WatermarkInvalido(str(e))
+
+
+def _despues_de(qs, campo_ts, cursor, hasta):
+    qs = qs.filter(**{f'{campo_ts}__lt': hasta})
+    if cursor:
+        ts, pk = cursor
+        qs = qs.filter(Q(**{f'{campo_ts}__gt': ts}) | Q(**{campo_ts: ts, 'id__gt': pk}))
+    return qs.order_by(campo_ts, 'id')
+
+
+def cambios(watermark=None, limite=None):
+    """Devuelve el delta desde ``watermark`` y la siguiente marca de agua.
+
+    Resultado: {'madres': [...], 'partos': [...], 'recien_nacidos': [...],
+    'eliminados': [...], 'watermark': str, 'hay_mas': bool}. Si ``hay_mas``
+    es True el cliente debe volver a pedir con la nueva marca de agua.
+    """
+    limite = limite or LIMITE
+    cursores = decodificar(watermark)
+    hasta = timezone.now() - MARGEN
+    resultado = {'hay_mas': False}
+
+    for entidad, modelo in ENTIDADES.items():
+        columnas = DATASETS[entidad][2] + [('updated_at', 'updated_at')]
+        nombres = [n for n, _ in columnas]
+        filas = []
+        for m in archivo.modelos(modelo):
+            qs = _despues_de(m.objects.all(), 'updated_at', cursores.get(entidad), hasta)
+            filas.extend(qs.values_list(*[c for _, c in columnas])[:limite])
+        filas.sort(key=lambda fila: (fila[-1], fila[0]))
+        del filas[limite:]
+        if filas:
+            ultima = filas[-1]
+            cursores[entidad] = (ultima[-1], ultima[0])
+        resultado['hay_mas'] |= len(filas) == limite
+        resultado[entidad] = [dict(zip(nombres, (_valor(v) for v in fila))) for fila in filas]
+
+    qs = _despues_de(RegistroEliminado.objects.all(), 'eliminado_en', cursores.get('eliminados'), hasta)
+    lapidas = list(qs.values_list('id', 'modelo', 'objeto_id', 'eliminado_en')[:limite])
+    if lapidas:
+        cursores['eliminados'] = (lapidas[-1][3], lapidas[-1][0])
+    resultado['hay_mas'] |= len(lapidas) == limite
+    resultado['eliminados'] = [
+        {'modelo': modelo, 'id': objeto_id, 'eliminado_en': _valor(ts)}
+        for _, modelo, objeto_id, ts in lapidas
+    ]
+
+    resultado['watermark'] = codificar(cursores)
+    return resultado
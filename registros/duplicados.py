@@ -0,0 +1,177 @@
+"""Detección y fusión de madres duplicadas.
+
+``Madre.rut`` es único, pero el mismo RUT puede quedar guardado con formatos
+distintos (``12.345.678-9`` y ``12345678-9``) según el camino de creación, y
+un error de digitación en el RUT crea dos fichas de la misma persona. Para no
+comparar todos los pares (O(n²)) se usan claves de bloqueo y solo se
+comparan madres que comparten una:
+
+- ``rut``: el RUT sin puntos, guiones ni espacios. El agrupamiento lo hace la
+  base de datos (GROUP BY ... HAVING COUNT > 1) y solo vuelven los grupos
+  repetidos.
+- ``nombre``: misma fecha de nacimiento y mismas tres primeras letras del
+  primer nombre o del primer apellido (sin acentos). Las madres se recorren
+  en orden de (fecha_nacimiento, id) con paginación por cursor sobre el
+  índice ``madre_nacimiento_idx``, así que en memoria solo hay un lote y el
+  día en curso. Dentro de cada bloque se comparan los nombres completos con
+  ``difflib`` (descartando antes por las cotas rápidas) y se propone el par
+  si la similitud llega a ``UMBRAL_SIMILITUD``.
+
+Los pares se guardan en ``CandidatoDuplicado`` para revisarlos en pantalla.
+``fusionar`` reasigna en bloque los partos (calientes y archivados) a la
+ficha conservada y borra las otras, dejando lápidas para la exportación
+incremental.
+"""
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations, groupby, islice
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Replace, Upper
+from django.utils import timezone
+
+from . import listado
+from .busqueda import plegar
+from .models import CandidatoDuplicado, Madre, Parto, PartoArchivado
+from .utils import format_rut, normalize_rut
+
+UMBRAL_SIMILITUD = 0.88
+TAMANO_LOTE = 5000
+LARGO_CLAVE = 3
+
+
+def _rut_sin_formato():
+    expresion = Upper('rut')
+    for caracter in ('.', '-', ' '):
+        expresion = Replace(expresion, Value(caracter), Value(''))
+    return expresion
+
+
+def pares_por_rut():
+    """(id_a, id_b, 'rut', 1.0) para cada par con el mismo RUT sin formato."""
+    repetidos = (
+        Madre.objects.annotate(clave=_rut_sin_formato()).order_by().values('clave')
+        .annotate(n=Count('id')).filter(n__gt=1).values('clave')
+    )
+    filas = (
+        Madre.objects.annotate(clave=_rut_sin_formato()).filter(clave__in=repetidos)
+        .order_by('clave', 'id').values_list('clave', 'id')
+    )
+    for _, grupo in groupby(filas, key=itemgetter(0)):
+        for a, b in combinations([id_ for _, id_ in grupo], 2):
+            yield a, b, 'rut', 1.0
+
+
+def _similares(a, b, umbral):
+    comparador = SequenceMatcher(None, a, b, autojunk=False)
+    # Cotas superiores baratas antes del cálculo completo
+    if comparador.real_quick_ratio() < umbral or comparador.quick_ratio() < umbral:
+        return None
+    similitud = comparador.ratio()
+    return similitud if similitud >= umbral else None
+
+
+def comparar_dia(filas, umbral=UMBRAL_SIMILITUD):
+    """Pares parecidos entre madres nacidas el mismo día.
+
+    ``filas`` son tuplas (id, nombres, apellidos). Solo se comparan las que
+    comparten el prefijo del primer nombre o del primer apellido.
+    """
+    bloques = defaultdict(list)
+    for id_, nombres, apellidos in filas:
+        nombres, apellidos = plegar(nombres).split(), plegar(apellidos).split()
+        completo = ' '.join(nombres + apellidos)
+        if nombres:
+            bloques[('n', nombres[0][:LARGO_CLAVE])].append((id_, completo))
+        if apellidos:
+            bloques[('a', apellidos[0][:LARGO_CLAVE])].append((id_, completo))
+    vistos = set()
+    for miembros in bloques.values():
+        for (id_a, nombre_a), (id_b, nombre_b) in combinations(miembros, 2):
+            par = (min(id_a, id_b), max(id_a, id_b))
+            if par in vistos:
+                continue
+            vistos.add(par)
+            similitud = _similares(nombre_a, nombre_b, umbral)
+            if similitud is not None:
+                yield par[0], par[1], 'nombre', round(similitud, 3)
+
+
+def pares_por_nombre(umbral=UMBRAL_SIMILITUD, lote=TAMANO_LOTE):
+    """Recorre todas las madres por (fecha_nacimiento, id) en lotes y compara
+    dentro de cada día de nacimiento."""
+    ultimo = None
+    dia, del_dia = None, []
+    while True:
+        qs = Madre.objects.order_by('fecha_nacimiento', 'id').values_list(
+            'id', 'fecha_nacimiento', 'nombres', 'apellidos')
+        if ultimo is not None:
+            qs = qs.filter(Q(fecha_nacimiento__gt=ultimo[0]) | Q(fecha_nacimiento=ultimo[0], id__gt=ultimo[1]))
+        filas = list(qs[:lote])
+        if not filas:
+            break
+        for id_, fecha, nombres, apellidos in filas:
+            if fecha != dia:
+                yield from comparar_dia(del_dia, umbral)
+                dia, del_dia = fecha, []
+            del_dia.append((id_, nombres, apellidos))
+        ultimo = (filas[-1][1], filas[-1][0])
+    yield from comparar_dia(del_dia, umbral)
+
+
+def detectar(umbral=UMBRAL_SIMILITUD, lote=TAMANO_LOTE):
+    """Reemplaza los candidatos pendientes por los pares encontrados ahora.
+    Los pares ya descartados no se vuelven a proponer. Devuelve los pares
+    encontrados por motivo."""
+    CandidatoDuplicado.objects.filter(estado='pendiente').delete()
+    totales = {'rut': 0, 'nombre': 0}
+    # Primero por RUT: si un par coincide por ambos motivos queda como 'rut'
+    for pares in (pares_por_rut(), pares_por_nombre(umbral, lote)):
+        while True:
+            trozo = list(islice(pares, 1000))
+            if not trozo:
+                break
+            CandidatoDuplicado.objects.bulk_create([
+                CandidatoDuplicado(madre_a_id=a, madre_b_id=b, motivo=motivo, similitud=similitud)
+                for a, b, motivo, similitud in trozo
+            ], ignore_conflicts=True)
+            for *_, motivo, _ in trozo:
+                totales[motivo] += 1
+    return totales
+
+
+def fusionar(conservar_id, otras_ids):
+    """Reasigna a la madre ``conservar_id`` los partos de ``otras_ids`` y
+    borra esas madres. Devuelve cuántos partos se reasignaron."""
+    otras_ids = set(otras_ids) - {conservar_id}
+    with transaction.atomic():
+        madres = Madre.objects.select_for_update().in_bulk([conservar_id, *otras_ids])
+        if conservar_id not in madres:
+            raise Madre.DoesNotExist(f'No existe la madre {conservar_id}')
+        otras_ids = [id_ for id_ in otras_ids if id_ in madres]
+        ahora = timezone.now()
+        movidos = list(Parto.objects.filter(madre_id__in=otras_ids).values_list('id', 'fecha_hora'))
+        # UPDATE en bloque; updated_at a mano para que la exportación incremental los vea
+        Parto.objects.filter(id__in=[id_ for id_, _ in movidos]).update(madre_id=conservar_id, updated_at=ahora)
+        archivados = PartoArchivado.objects.filter(madre_id__in=otras_ids)
+        # La edad de la madre cambia el grupo REM también de los partos archivados
+        dias = {timezone.localdate(fecha_hora) for _, fecha_hora in movidos}
+        dias.update(timezone.localdate(fecha_hora) for fecha_hora in archivados.values_list('fecha_hora', flat=True))
+        archivados.update(madre_id=conservar_id, updated_at=ahora)
+        Madre.objects.filter(id__in=otras_ids).delete()
+
+        # Con las otras fichas borradas, la conservada puede tomar el RUT con formato
+        conservada = madres[conservar_id]
+        con_formato = format_rut(normalize_rut(conservada.rut))
+        if con_formato and con_formato != conservada.rut and not Madre.objects.filter(rut=con_formato).exists():
+            Madre.objects.filter(pk=conservar_id).update(rut=con_formato, updated_at=ahora)
+        listado.actualizar(Parto.objects.filter(madre_id=conservar_id).values_list('id', flat=True))
+
+        def invalidar():
+            from . import estadisticas, snapshots
+            snapshots.invalidar(*dias)
+            estadisticas.invalidar()
+        transaction.on_commit(invalidar)
+    return len(movidos)
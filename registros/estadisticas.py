@@ -0,0 +1,148 @@
+"""Series de tiempo para los gráficos del dashboard.
+
+Todo se agrega en la base de datos (``TruncDay``/``TruncWeek``/``TruncMonth``
+en la zona horaria local y ``COUNT`` agrupado) y se devuelve como arreglos
+compactos alineados con la lista de períodos, de modo que un año completo
+cabe en una respuesta pequeña:
+
+    {"periodos": ["2025-01-01", ...],
+     "partos": {"vaginal": [3, 0, ...], "cesarea": [...], "forceps": [...]},
+     "peso": {"desde_kg": 0.0, "ancho_kg": 0.25, "conteos": [...]},
+     "apgar_1": [n0, ..., n10], "apgar_5": [n0, ..., n10]}
+
+Las respuestas se guardan en la caché de Django por (granularidad, rango).
+En vez de borrar cada clave, las señales incrementan un número de versión
+que forma parte de la clave (``invalidar``), lo que descarta de una vez todas
+las series al registrarse o modificarse un parto o recién nacido. Con varios
+procesos hace falta una caché compartida (Redis/Memcached) para que la
+invalidación llegue a todos; el tiempo de expiración acota el desfase con la
+caché local por proceso. Si la clave de versión se pierde (expulsada de la
+caché), se vuelve a sembrar con ``time.time_ns()`` y no con un número fijo,
+para no reutilizar una versión con series antiguas aún guardadas.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, F, Value
+from django.db.models.functions import Floor, TruncDay, TruncMonth, TruncWeek
+
+from . import archivo
+from .models import Parto
+
+GRANULARIDADES = {
+    'dia': TruncDay,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+ANCHO_PESO_KG = 0.25
+PESO_MAXIMO_KG = 6.0
+CACHE_PREFIJO = 'estadisticas'
+CACHE_TIMEOUT = 15 * 60
+RANGO_MAXIMO_DIAS = 5 * 366
+
+
+def inicio_periodo(fecha, granularidad):
+    """Primer día del período (día, semana ISO desde el lunes o mes) de ``fecha``."""
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+def periodos(desde, hasta, granularidad):
+    """Lista de inicios de período que cubren [desde, hasta]."""
+    actual = inicio_periodo(desde, granularidad)
+    resultado = []
+    while actual <= hasta:
+        resultado.append(actual)
+        if granularidad == 'mes':
+            actual = (actual.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            actual += timedelta(days=7 if granularidad == 'semana' else 1)
+    return resultado
+
+
+def _partos_por_periodo(tablas, desde, hasta, granularidad, indice):
+    trunc = GRANULARIDADES[granularidad]('fecha_hora', output_field=DateField())
+    series = {tipo: [0] * len(indice) for tipo, _ in Parto.TIPO_PARTO_CHOICES}
+    for modelo, _ in tablas:
+        filas = (
+            modelo.objects.in_local_dates(desde, hasta).order_by()
+            .annotate(periodo=trunc).values('periodo', 'tipo_parto')
+            .annotate(n=Count('id')).values_list('periodo', 'tipo_parto', 'n')
+        )
+        for periodo, tipo, n in filas:
+            if tipo in series and periodo in indice:
+                series[tipo][indice[periodo]] += n
+    return series
+
+
+def _distribucion_peso(recien_nacidos):
+    conteos = [0] * int(PESO_MAXIMO_KG / ANCHO_PESO_KG)
+    for qs in recien_nacidos:
+        # Intervalos de 250 g calculados en SQL: FLOOR(peso / ancho)
+        filas = (
+            qs.annotate(intervalo=Floor(F('peso') / Value(Decimal(str(ANCHO_PESO_KG)))))
+            .values('intervalo').annotate(n=Count('id')).values_list('intervalo', 'n')
+        )
+        for intervalo, n in filas:
+            if intervalo is not None:
+                conteos[min(max(int(intervalo), 0), len(conteos) - 1)] += n
+    return {'desde_kg': 0.0, 'ancho_kg': ANCHO_PESO_KG, 'conteos': conteos}
+
+
+def _distribucion_apgar(recien_nacidos, campo):
+    conteos = [0] * 11
+    for qs in recien_nacidos:
+        for valor, n in qs.values(campo).annotate(n=Count('id')).values_list(campo, 'n'):
+            if valor is not None and 0 <= valor <= 10:
+                conteos[valor] += n
+    return conteos
+
+
+def calcular(granularidad, desde, hasta):
+    lista = periodos(desde, hasta, granularidad)
+    indice = {p: i for i, p in enumerate(lista)}
+    # Tabla caliente y, si el rango lo alcanza, el archivo
+    tablas = archivo.tablas(desde, hasta)
+    recien_nacidos = [
+        modelo_rn.objects.filter(parto__in=modelo_parto.objects.in_local_dates(desde, hasta)).order_by()
+        for modelo_parto, modelo_rn in tablas
+    ]
+    return {
+        'granularidad': granularidad,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'periodos': [p.isoformat() for p in lista],
+        'partos': _partos_por_periodo(tablas, desde, hasta, granularidad, indice),
+        'peso': _distribucion_peso(recien_nacidos),
+        'apgar_1': _distribucion_apgar(recien_nacidos, 'apgar_1'),
+        'apgar_5': _distribucion_apgar(recien_nacidos, 'apgar_5'),
+    }
+
+
+def _version():
+    return cache.get_or_set(f'{CACHE_PREFIJO}:version', time.time_ns, None)
+
+
+def obtener(granularidad, desde, hasta):
+    """Series del rango desde la caché, calculándolas si no están."""
+    clave = f'{CACHE_PREFIJO}:{_version()}:{granularidad}:{desde.isoformat()}:{hasta.isoformat()}'
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular(granularidad, desde, hasta)
+        cache.set(clave, datos, CACHE_TIMEOUT)
+    return datos
+
+
+def invalidar():
+    """Descarta todas las series en caché (nueva versión de clave)."""
+    clave = f'{CACHE_PREFIJO}:version'
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, time.time_ns(), None)
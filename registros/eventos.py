@@ -0,0 +1,133 @@
+"""Pub/sub en proceso para el tablero en vivo (server-sent events).
+
+Las señales de ``Parto`` publican un evento por registro creado, editado o
+eliminado (después del commit) en ``tablero``. Cada pantalla conectada al
+endpoint SSE es un suscriptor con su propia ``asyncio.Queue``: la publicación
+ocurre en el hilo de la petición que guardó el parto y se entrega al event
+loop del suscriptor con ``call_soon_threadsafe``, sin sondear la base de
+datos. Una pantalla inactiva solo recibe un comentario de latido cada
+``LATIDO_SEGUNDOS`` para mantener viva la conexión. Sin pantallas conectadas
+no se publica nada (ni se consulta la base de datos por cada guardado).
+
+Se guardan los últimos ``HISTORIAL`` eventos para que un cliente que se
+reconecta con ``Last-Event-ID`` reciba lo que se perdió.
+
+El canal vive en memoria del proceso: con varios procesos ASGI cada pantalla
+solo ve los cambios guardados en su mismo proceso, así que el tablero debe
+servirse con un único proceso (o reemplazar ``Canal`` por un pub/sub externo).
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from contextlib import aclosing
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+from django.utils import formats, timezone
+
+HISTORIAL = 200
+LATIDO_SEGUNDOS = 15
+REINTENTO_MS = 3000
+
+
+class Canal:
+    def __init__(self, historial=HISTORIAL):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._historial = deque(maxlen=historial)
+        self._suscriptores = set()
+
+    def publicar(self, tipo, datos):
+        """Publica un evento a todos los suscriptores; seguro desde cualquier hilo."""
+        with self._lock:
+            evento = (next(self._ids), tipo, datos)
+            self._historial.append(evento)
+            suscriptores = list(self._suscriptores)
+        for loop, cola in suscriptores:
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, evento)
+            except RuntimeError:
+                # Loop ya cerrado: el suscriptor se desconectó
+                pass
+        return evento[0]
+
+    def pendientes(self, ultimo_id=None):
+        """Eventos del historial posteriores a ``ultimo_id`` (todos si es None)."""
+        with self._lock:
+            return [e for e in self._historial if ultimo_id is None or e[0] > ultimo_id]
+
+    @property
+    def suscriptores(self):
+        return len(self._suscriptores)
+
+    async def escuchar(self, ultimo_id=None, latido=None):
+        """Genera eventos (id, tipo, datos) a medida que se publican, o None
+        como latido si no llega nada en ``latido`` segundos."""
+        latido = latido or LATIDO_SEGUNDOS
+        suscriptor = (asyncio.get_running_loop(), asyncio.Queue())
+        # Registrar y leer el historial bajo el mismo lock: cada evento llega
+        # una sola vez, ya sea por el historial o por la cola
+        with self._lock:
+            self._suscriptores.add(suscriptor)
+            perdidos = [e for e in self._historial if ultimo_id is not None and e[0] > ultimo_id]
+        try:
+            for evento in perdidos:
+                yield evento
+            cola = suscriptor[1]
+            while True:
+                try:
+                    yield await asyncio.wait_for(cola.get(), latido)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._suscriptores.discard(suscriptor)
+
+
+tablero = Canal()
+
+
+def fila_parto(fila):
+    """Datos de una fila de ``lista_partos`` (``FilaListadoParto``) para que
+    el cliente la pinte."""
+    return {
+        'id': fila.id,
+        'rut': fila.madre_rut,
+        'madre': f'{fila.madre_nombres} {fila.madre_apellidos}',
+        'fecha_hora': formats.date_format(timezone.localtime(fila.fecha_hora), 'SHORT_DATETIME_FORMAT'),
+        'registrado_por': fila.registrado_por,
+        'detalle_url': reverse('registros:detalle_parto', args=[fila.id]),
+        'editar_url': reverse('registros:editar_parto', args=[fila.id]),
+    }
+
+
+def publicar_parto(parto_id, accion):
+    """Publica el parto (creado/editado) o su eliminación en el tablero.
+    Sin suscriptores no hace nada; si los hay, lee la fila ya desnormalizada
+    del listado (una búsqueda por clave primaria, sin JOIN)."""
+    from .models import FilaListadoParto
+
+    if not tablero.suscriptores:
+        return None
+    if accion == 'eliminado':
+        return tablero.publicar('parto', {'accion': accion, 'id': parto_id})
+    fila = FilaListadoParto.objects.filter(pk=parto_id).first()
+    if fila is None:
+        return None
+    return tablero.publicar('parto', {'accion': accion, **fila_parto(fila)})
+
+
+async def flujo_sse(ultimo_id=None, canal=None):
+    """Formatea los eventos del canal según el protocolo text/event-stream."""
+    canal = canal or tablero
+    yield f'retry: {REINTENTO_MS}\n\n'
+    # aclosing: al cortarse la conexión se cancela la suscripción de inmediato
+    async with aclosing(canal.escuchar(ultimo_id)) as escucha:
+        async for evento in escucha:
+            if evento is None:
+                yield ': latido\n\n'
+                continue
+            id_evento, tipo, datos = evento
+            yield f'id: {id_evento}\nevent: {tipo}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n'
@@ -4,6 +4,25 @@ from datetime import datetime
 from django.utils import timezone
 
 
+RN_EXPORT_FIELDS = (
+    'parto_id', 'hora_nacimiento', 'sexo', 'peso', 'talla',
+    'apgar_1', 'apgar_5', 'estado', 'observaciones',
+)
+
+
+def _naive_local(value):
+    """Excel no admite datetimes con zona horaria: pasar a hora local naive."""
+    if value is not None and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def registrado_por(row):
+    """Nombre del usuario que registró el parto a partir de una fila de
+    ``Parto.objects.for_export()`` (equivalente a get_full_name/username)."""
+    nombre = f"{row.get('created_by__first_name') or ''} {row.get('created_by__last_name') or ''}".strip()
+    return nombre or row.get('created_by__username') or 'Sistema'
+
 
 def exportar_datos_excel(fecha_inicio=None, fecha_fin=None):
     """
@@ -18,94 +37,88 @@ def exportar_datos_excel(fecha_inicio=None, fecha_fin=None):
         return HttpResponse('Export unavailable: pandas not installed', status=500)
 
     # Import models here to avoid touching Django settings at module import time
-    from .models import Madre, Parto, RecienNacido
+    from .archivo import tablas
 
     # Crear un archivo Excel con múltiples hojas
     output = BytesIO()
     # Use a context manager for ExcelWriter to ensure resources are flushed/closed
     # and be compatible with different pandas/openpyxl versions.
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Obtener los datos - evaluar el queryset para asegurarse de que se ejecute
-        partos_qs = Parto.objects.select_related('madre', 'created_by').prefetch_related('recien_nacidos').order_by('-fecha_hora')
-        
         # Filtrar por fecha solo si se proporcionaron fechas válidas
-        if fecha_inicio and fecha_fin:
-            partos = partos_qs.filter(
-                fecha_hora__date__range=[fecha_inicio, fecha_fin]
-            )
-        else:
-            # Si no hay fechas, exportar todos los partos
-            partos = partos_qs
-        
-        # Evaluar el queryset para obtener la lista (limitar a 10000 para evitar problemas de memoria)
-        partos_list = list(partos[:10000])
+        rango = (fecha_inicio, fecha_fin) if fecha_inicio and fecha_fin else (None, None)
+
+        # Obtener los datos como diccionarios planos (sin hidratar modelos), de
+        # la tabla caliente y, si el rango lo alcanza, del archivo
+        partos_list = []
+        rn_por_parto = {}
+        for modelo_parto, modelo_rn in tablas(*rango):
+            partos_qs = modelo_parto.objects.all()
+            if fecha_inicio and fecha_fin:
+                partos_qs = partos_qs.in_local_dates(fecha_inicio, fecha_fin)
+
+            # Evaluar el queryset para obtener la lista (limitar a 10000 para evitar problemas de memoria)
+            filas = list(partos_qs.for_export()[:10000])
+            partos_list.extend(filas)
+
+            # Recién nacidos de los partos exportados, agrupados por parto_id
+            if filas:
+                rn_rows = modelo_rn.objects.filter(
+                    parto_id__in=[p['id'] for p in filas]
+                ).order_by('id').values(*RN_EXPORT_FIELDS)
+                for rn in rn_rows:
+                    rn_por_parto.setdefault(rn['parto_id'], []).append(rn)
+        partos_list.sort(key=lambda p: p['fecha_hora'], reverse=True)
+        del partos_list[10000:]
         
         # Datos de las madres
         datos_madres = []
         for parto in partos_list:
             try:
-                edad = (parto.fecha_hora.date() - parto.madre.fecha_nacimiento).days // 365
-            except:
+                edad = (parto['fecha_hora'].date() - parto['madre__fecha_nacimiento']).days // 365
+            except Exception:
                 edad = None
             datos_madres.append({
-                'RUT': parto.madre.rut,
-                'Nombres': parto.madre.nombres,
-                'Apellidos': parto.madre.apellidos,
-                'Fecha Nacimiento': parto.madre.fecha_nacimiento,
+                'RUT': parto['madre__rut'],
+                'Nombres': parto['madre__nombres'],
+                'Apellidos': parto['madre__apellidos'],
+                'Fecha Nacimiento': parto['madre__fecha_nacimiento'],
                 'Edad': edad,
-                'Estado Civil': parto.madre.estado_civil,
-                'Dirección': parto.madre.direccion,
-                'Teléfono': parto.madre.telefono,
-                'Previsión': parto.madre.prevision
+                'Estado Civil': parto['madre__estado_civil'],
+                'Dirección': parto['madre__direccion'],
+                'Teléfono': parto['madre__telefono'],
+                'Previsión': parto['madre__prevision']
             })
 
         # Datos de los partos
         datos_partos = []
         for parto in partos_list:
-            # Convertir datetime con timezone a naive datetime para Excel
-            fecha_hora_naive = parto.fecha_hora
-            if timezone.is_aware(fecha_hora_naive):
-                # Convertir a la zona horaria local y luego a naive
-                fecha_hora_naive = timezone.localtime(fecha_hora_naive).replace(tzinfo=None)
-            
-            created_at_naive = parto.created_at
-            if timezone.is_aware(created_at_naive):
-                # Convertir a la zona horaria local y luego a naive
-                created_at_naive = timezone.localtime(created_at_naive).replace(tzinfo=None)
-            
             datos_partos.append({
-                'RUT Madre': parto.madre.rut,
-                'Fecha y Hora': fecha_hora_naive,
-                'Tipo Parto': parto.tipo_parto,
-                'Semanas Gestación': parto.semanas_gestacion,
-                'Tipo Anestesia': parto.tipo_anestesia,
-                'Complicaciones': parto.complicaciones or '',
-                'Observaciones': parto.observaciones or '',
-                'Registrado por': parto.created_by.get_full_name() if parto.created_by and parto.created_by.get_full_name() else (parto.created_by.username if parto.created_by else 'Sistema'),
-                'Fecha Registro': created_at_naive
+                'RUT Madre': parto['madre__rut'],
+                'Fecha y Hora': _naive_local(parto['fecha_hora']),
+                'Tipo Parto': parto['tipo_parto'],
+                'Semanas Gestación': parto['semanas_gestacion'],
+                'Tipo Anestesia': parto['tipo_anestesia'],
+                'Complicaciones': parto['complicaciones'] or '',
+                'Observaciones': parto['observaciones'] or '',
+                'Registrado por': registrado_por(parto),
+                'Fecha Registro': _naive_local(parto['created_at'])
             })
 
         # Datos de recién nacidos
         datos_rn = []
         for parto in partos_list:
-            for rn in parto.recien_nacidos.all():
-                # Convertir hora_nacimiento a naive si es datetime con timezone
-                hora_nacimiento_naive = rn.hora_nacimiento
-                if hora_nacimiento_naive and timezone.is_aware(hora_nacimiento_naive):
-                    # Convertir a la zona horaria local y luego a naive
-                    hora_nacimiento_naive = timezone.localtime(hora_nacimiento_naive).replace(tzinfo=None)
-                
+            for rn in rn_por_parto.get(parto['id'], ()):
                 datos_rn.append({
-                    'RUT Madre': parto.madre.rut,
-                    'Fecha Parto': parto.fecha_hora.date(),
-                    'Hora Nacimiento': hora_nacimiento_naive,
-                    'Sexo': 'Masculino' if rn.sexo == 'M' else 'Femenino',
-                    'Peso (kg)': float(rn.peso) if rn.peso else None,
-                    'Talla (cm)': float(rn.talla) if rn.talla else None,
-                    'APGAR 1min': rn.apgar_1,
-                    'APGAR 5min': rn.apgar_5,
-                    'Estado': rn.estado,
-                    'Observaciones': rn.observaciones or ''
+                    'RUT Madre': parto['madre__rut'],
+                    'Fecha Parto': parto['fecha_hora'].date(),
+                    'Hora Nacimiento': rn['hora_nacimiento'],
+                    'Sexo': 'Masculino' if rn['sexo'] == 'M' else 'Femenino',
+                    'Peso (kg)': float(rn['peso']) if rn['peso'] else None,
+                    'Talla (cm)': float(rn['talla']) if rn['talla'] else None,
+                    'APGAR 1min': rn['apgar_1'],
+                    'APGAR 5min': rn['apgar_5'],
+                    'Estado': rn['estado'],
+                    'Observaciones': rn['observaciones'] or ''
                 })
 
         # Crear DataFrames - usar columnas definidas si están vacíos
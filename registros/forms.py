@@ -92,10 +92,23 @@ class PartoForm(forms.ModelForm):
             '%d-%m-%Y %H:%M',   # form uses day-month-year in templates
         ]
     )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Catálogo vigente más las entradas ya asociadas (aunque se hayan desactivado)
+        from django.db.models import Q
+        from .models import Complicacion
+        vigentes = Q(activa=True)
+        if self.instance.pk:
+            vigentes |= Q(partos=self.instance)
+        self.fields['complicaciones_codificadas'].queryset = Complicacion.objects.filter(vigentes).distinct()
+
     class Meta:
         model = Parto
         fields = ['fecha_hora', 'tipo_parto', 'semanas_gestacion', 
-                 'tipo_anestesia', 'complicaciones', 'observaciones']
+                 'tipo_anestesia', 'complicaciones', 'complicaciones_codificadas', 'observaciones']
+        labels = {'complicaciones_codificadas': 'Complicaciones codificadas (CIE-10)'}
+        help_texts = {'complicaciones_codificadas': 'Mantenga Ctrl presionado para elegir varias.'}
         widgets = {
             # fecha_hora widget is provided explicitly above so we don't
             # need to redefine it here. Keep other widgets below.
@@ -110,6 +123,10 @@ class PartoForm(forms.ModelForm):
                 'class': 'form-control',
                 'rows': 3
             }),
+            'complicaciones_codificadas': forms.SelectMultiple(attrs={
+                'class': 'form-select',
+                'size': 6
+            }),
             'observaciones': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3
@@ -242,6 +259,7 @@ class PartoCompletoForm(forms.Form):
             parto = self.parto_form.save(commit=False)
             parto.madre = madre
             parto.save()
+            self.parto_form.save_m2m()
             
             recien_nacido = self.recien_nacido_form.save(commit=False)
             recien_nacido.parto = parto
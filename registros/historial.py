@@ -0,0 +1,137 @@
+"""Historial de cambios por campo de Madre, Parto y RecienNacido.
+
+``editar_parto`` sobrescribe las filas en su lugar. Antes de ligar los
+formularios se toma una ``captura`` de cada instancia cargada y, ya
+guardado, ``registrar`` compara campo a campo y escribe en
+``CambioRegistro`` solo los que cambiaron, con un único ``bulk_create``
+dentro de la misma transacción de la edición. Nada se escribe si no hubo
+cambios y nada de esto corre al leer: el historial solo se consulta desde
+su propia pantalla (``leer``).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Q
+from django.utils import formats, timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from .models import CambioRegistro, Madre, Parto, RecienNacido
+
+# Campos que cambian solos o no son datos del registro
+EXCLUIDOS = frozenset({'id', 'created_at', 'updated_at', 'created_by'})
+
+MODELOS = {Madre: 'madres', Parto: 'partos', RecienNacido: 'recien_nacidos'}
+
+
+def _campos(modelo):
+    return [
+        f for f in modelo._meta.get_fields()
+        if f.concrete and not f.auto_created and f.name not in EXCLUIDOS
+    ]
+
+
+def captura(instancia):
+    """Valores actuales de la instancia, por campo. Las relaciones muchos a
+    muchos se guardan como lista ordenada de textos (usa el prefetch si lo
+    hay). ``None`` o una instancia sin guardar dan una captura vacía."""
+    if instancia is None or instancia.pk is None:
+        return {}
+    valores = {}
+    for campo in _campos(type(instancia)):
+        if campo.many_to_many:
+            valores[campo.name] = sorted(str(o) for o in getattr(instancia, campo.name).all())
+        else:
+            valores[campo.attname] = campo.value_from_object(instancia)
+    return valores
+
+
+def diferencias(antes, despues):
+    """``{campo: [antes, después]}`` de los campos con valor distinto."""
+    return {
+        campo: [antes.get(campo), valor]
+        for campo, valor in despues.items()
+        if antes.get(campo) != valor
+    }
+
+
+def registrar(usuario, parto_id, ediciones):
+    """Escribe los cambios de ``ediciones`` (pares ``(instancia guardada,
+    captura previa)``) en una sola inserción. Devuelve las filas escritas."""
+    filas = []
+    for instancia, antes in ediciones:
+        if instancia is None:
+            continue
+        cambios = diferencias(antes, captura(instancia))
+        if cambios:
+            filas.append(CambioRegistro(
+                modelo=MODELOS[type(instancia)], objeto_id=instancia.pk,
+                parto_id=parto_id, cambios=cambios, usuario=usuario,
+            ))
+    CambioRegistro.objects.bulk_create(filas)
+    return len(filas)
+
+
+def _fecha(campo, valor):
+    """Las fechas y horas llegan como texto ISO (``cambios`` se guarda con
+    DjangoJSONEncoder, las fechas-hora en UTC); se muestran en hora local con
+    los mismos formatos que el resto de las plantillas. ``None`` si el campo
+    no es de fecha o el texto no se puede leer."""
+    if isinstance(campo, models.DateTimeField):
+        fecha_hora = parse_datetime(valor)
+        if fecha_hora is not None:
+            if timezone.is_naive(fecha_hora):
+                fecha_hora = timezone.make_aware(fecha_hora)
+            return formats.date_format(timezone.localtime(fecha_hora), 'SHORT_DATETIME_FORMAT')
+    elif isinstance(campo, models.DateField):
+        fecha = parse_date(valor)
+        if fecha is not None:
+            return formats.date_format(fecha, 'd/m/Y')
+    elif isinstance(campo, models.TimeField):
+        hora = parse_time(valor)
+        if hora is not None:
+            return formats.time_format(hora, 'H:i')
+    return None
+
+
+def _mostrar(campo, valor):
+    if valor is None or valor == '' or valor == []:
+        return '—'
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if isinstance(valor, list):
+        return ', '.join(valor)
+    if campo is not None and campo.choices:
+        return dict(campo.flatchoices).get(valor, valor)
+    if campo is not None and isinstance(valor, str):
+        return _fecha(campo, valor) or valor
+    return valor
+
+
+def filas(modelo, cambios):
+    """(etiqueta, antes, después) listas para mostrar, por cada campo de
+    ``cambios`` (``{campo: [antes, después]}``) del modelo dado."""
+    opciones = modelo._meta
+    resultado = []
+    for nombre, (antes, despues) in sorted(cambios.items()):
+        try:
+            campo = opciones.get_field(nombre)
+        except FieldDoesNotExist:
+            campo = None  # campo eliminado del modelo después de la edición
+        etiqueta = str(campo.verbose_name).capitalize() if campo is not None else nombre
+        resultado.append((etiqueta, _mostrar(campo, antes), _mostrar(campo, despues)))
+    return resultado
+
+
+def leer(parto_id, madre_id=None):
+    """Ediciones del parto (y de su madre, hechas desde cualquier parto), de
+    la más reciente a la más antigua. Cada edición trae ``filas`` con
+    (etiqueta, antes, después) listas para mostrar."""
+    filtro = Q(parto_id=parto_id)
+    if madre_id is not None:
+        filtro |= Q(modelo='madres', objeto_id=madre_id)
+    modelos = {nombre: modelo for modelo, nombre in MODELOS.items()}
+    ediciones = list(
+        CambioRegistro.objects.filter(filtro).select_related('usuario').order_by('-fecha', '-id')
+    )
+    for edicion in ediciones:
+        edicion.filas = filas(modelos[edicion.modelo], edicion.cambios)
+    return ediciones
@@ -0,0 +1,184 @@
+"""Indicadores de calidad perinatal calculados de forma vectorizada.
+
+Las columnas se leen una sola vez con ``values_list`` y se convierten en
+arrays NumPy tipados; todos los indicadores se calculan con operaciones
+vectorizadas (``bincount``, ``digitize``, ordenamientos) en vez de recorrer
+filas en Python:
+
+- tasa de bajo peso al nacer (< 2,5 kg) por semana de gestación,
+- percentiles de peso (P10/P50/P90) por semana de gestación,
+- tasa de APGAR < 7 a los 5 minutos,
+- tasa de cesárea por grupo de edad materna,
+- distribución de anestesia por tipo de parto,
+- partos por complicación codificada (CIE-10): un GROUP BY en la base de
+  datos (``registros.complicaciones.conteos``), no una lectura del texto.
+"""
+from . import archivo
+from .models import Parto
+from .rem import edad_madre
+
+BAJO_PESO_KG = 2.5
+APGAR_BAJO = 7
+PERCENTILES = (10, 50, 90)
+ESCALA_CLAVE = 100.0
+LIMITES_EDAD = (15, 20, 25, 30, 35)
+GRUPOS_EDAD = ('menor_15', '15_19', '20_24', '25_29', '30_34', '35_mas')
+
+
+def _codigos(np, valores, choices):
+    """Strings de un campo de elección -> códigos int8 (posición en choices, -1 si desconocido)."""
+    claves = [c for c, _ in choices]
+    indice = {c: i for i, c in enumerate(claves)}
+    return np.fromiter((indice.get(v, -1) for v in valores), dtype=np.int8, count=len(valores))
+
+
+def leer_columnas(fecha_inicio, fecha_fin):
+    """Lee las columnas necesarias del rango como arrays NumPy."""
+    import numpy as np
+
+    rn, partos = [], []
+    # Tabla caliente y, si el rango lo alcanza, el archivo
+    for modelo_parto, modelo_rn in archivo.tablas(fecha_inicio, fecha_fin):
+        rango = modelo_parto.objects.in_local_dates(fecha_inicio, fecha_fin)
+        rn.extend(
+            modelo_rn.objects.filter(parto__in=rango)
+            .order_by().values_list('peso', 'apgar_5', 'parto__semanas_gestacion')
+        )
+        partos.extend(
+            rango.order_by().annotate(edad=edad_madre())
+            .values_list('tipo_parto', 'tipo_anestesia', 'edad')
+        )
+    return {
+        'peso': np.array([float(r[0]) for r in rn], dtype=np.float64),
+        'apgar_5': np.array([r[1] for r in rn], dtype=np.int16),
+        'semanas_rn': np.array([r[2] for r in rn], dtype=np.int16),
+        'tipo_parto': _codigos(np, [p[0] for p in partos], Parto.TIPO_PARTO_CHOICES),
+        'tipo_anestesia': _codigos(np, [p[1] for p in partos], Parto.TIPO_ANESTESIA_CHOICES),
+        'edad_madre': np.array([p[2] if p[2] is not None else -1 for p in partos], dtype=np.int16),
+    }
+
+
+def _tasa(np, num, den):
+    """Porcentaje con un decimal; None donde el denominador es 0."""
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tasa = np.round(100.0 * num / den, 1)
+    return [None if d == 0 else float(t) for t, d in zip(np.atleast_1d(tasa), np.atleast_1d(den))]
+
+
+def calcular(columnas):
+    """Calcula todos los indicadores a partir de los arrays de ``leer_columnas``."""
+    import numpy as np
+
+    peso = columnas['peso']
+    semanas = columnas['semanas_rn'].astype(np.int64)
+    apgar_5 = columnas['apgar_5']
+    tipo_parto = columnas['tipo_parto']
+    anestesia = columnas['tipo_anestesia']
+    edad = columnas['edad_madre']
+
+    n_rn, n_partos = len(peso), len(tipo_parto)
+    bajo_peso = peso < BAJO_PESO_KG
+    cesarea = tipo_parto == [c for c, _ in Parto.TIPO_PARTO_CHOICES].index('cesarea')
+
+    # Bajo peso por semana: conteos por semana con bincount
+    nacidos_sem = np.bincount(semanas, minlength=1) if n_rn else np.zeros(0, dtype=np.int64)
+    bajo_sem = np.bincount(semanas, weights=bajo_peso, minlength=len(nacidos_sem)) if n_rn else nacidos_sem
+    semanas_presentes = np.flatnonzero(nacidos_sem)
+    tasas_sem = _tasa(np, bajo_sem[semanas_presentes], nacidos_sem[semanas_presentes])
+    bajo_peso_por_semana = {
+        int(s): {'nacidos': int(nacidos_sem[s]), 'bajo_peso': int(bajo_sem[s]), 'tasa': t}
+        for s, t in zip(semanas_presentes, tasas_sem)
+    }
+
+    # Percentiles de peso por semana: ordenar por (semana, peso) y tomar
+    # posiciones dentro de cada bloque contiguo. En vez de lexsort (lento) se
+    # ordena una sola clave float semana * ESCALA + peso: peso < 100 por
+    # max_digits=5, decimal_places=3, así que los bloques no se mezclan.
+    percentiles_por_semana = {}
+    if n_rn:
+        clave = np.sort(semanas * ESCALA_CLAVE + peso)
+        sem_ord = (clave // ESCALA_CLAVE).astype(np.int64)
+        peso_ord = clave - sem_ord * ESCALA_CLAVE
+        valores_sem, inicios, conteos = np.unique(sem_ord, return_index=True, return_counts=True)
+        for p in PERCENTILES:
+            # Interpolación lineal (igual que np.percentile por defecto)
+            pos = inicios + (conteos - 1) * (p / 100.0)
+            bajo, alto = np.floor(pos).astype(np.int64), np.ceil(pos).astype(np.int64)
+            valor = peso_ord[bajo] + (peso_ord[alto] - peso_ord[bajo]) * (pos - bajo)
+            for s, v in zip(valores_sem, valor):
+                percentiles_por_semana.setdefault(int(s), {})[f'p{p}'] = round(float(v), 3)
+
+    # Cesárea por grupo de edad materna
+    grupo = np.digitize(edad, LIMITES_EDAD)
+    validos = edad >= 0
+    partos_grupo = np.bincount(grupo[validos], minlength=len(GRUPOS_EDAD))
+    ces_grupo = np.bincount(grupo[validos], weights=cesarea[validos], minlength=len(GRUPOS_EDAD))
+    tasas_grupo = _tasa(np, ces_grupo, partos_grupo)
+    cesarea_por_edad = {
+        g: {'partos': int(partos_grupo[i]), 'cesareas': int(ces_grupo[i]), 'tasa': tasas_grupo[i]}
+        for i, g in enumerate(GRUPOS_EDAD)
+    }
+
+    # Mezcla de anestesia por tipo de parto: tabla de contingencia con bincount 2D
+    n_tipos, n_anest = len(Parto.TIPO_PARTO_CHOICES), len(Parto.TIPO_ANESTESIA_CHOICES)
+    conocidos = (tipo_parto >= 0) & (anestesia >= 0)
+    tabla = np.bincount(
+        tipo_parto[conocidos].astype(np.int64) * n_anest + anestesia[conocidos],
+        minlength=n_tipos * n_anest,
+    ).reshape(n_tipos, n_anest)
+    anestesia_por_tipo_parto = {
+        tipo: {anest: int(tabla[i, j]) for j, (anest, _) in enumerate(Parto.TIPO_ANESTESIA_CHOICES)}
+        for i, (tipo, _) in enumerate(Parto.TIPO_PARTO_CHOICES)
+    }
+
+    return {
+        'resumen': {
+            'recien_nacidos': n_rn,
+            'partos': n_partos,
+            'tasa_bajo_peso': _tasa(np, bajo_peso.sum(), n_rn)[0],
+            'tasa_apgar5_menor_7': _tasa(np, (apgar_5 < APGAR_BAJO).sum(), n_rn)[0],
+            'tasa_cesarea': _tasa(np, cesarea.sum(), n_partos)[0],
+        },
+        'bajo_peso_por_semana': bajo_peso_por_semana,
+        'percentiles_peso_por_semana': percentiles_por_semana,
+        'cesarea_por_edad': cesarea_por_edad,
+        'anestesia_por_tipo_parto': anestesia_por_tipo_parto,
+    }
+
+
+def generar(fecha_inicio, fecha_fin):
+    from .complicaciones import conteos
+
+    datos = calcular(leer_columnas(fecha_inicio, fecha_fin))
+    partos = datos['resumen']['partos']
+    datos['complicaciones'] = [
+        {**fila, 'tasa': round(100.0 * fila['partos'] / partos, 1) if partos else None}
+        for fila in conteos(fecha_inicio, fecha_fin)
+    ]
+    return datos
+
+
+def exportar_excel(indicadores, fecha_inicio, fecha_fin):
+    """XLSX con una hoja por grupo de indicadores (sin filas de total)."""
+    from .rem_excel import escribir_rem
+
+    resumen = indicadores['resumen']
+    secciones = [
+        ('Resumen', 'Indicadores de calidad perinatal', resumen),
+        ('Bajo peso', 'Bajo peso al nacer por semana de gestación',
+         {'bajo_peso_por_semana': indicadores['bajo_peso_por_semana']}),
+        ('Percentiles peso', 'Peso (kg) para la edad gestacional',
+         {'percentiles_peso_por_semana': indicadores['percentiles_peso_por_semana']}),
+        ('Cesárea por edad', 'Tasa de cesárea por grupo de edad materna',
+         {'cesarea_por_edad': indicadores['cesarea_por_edad']}),
+        ('Anestesia', 'Anestesia por tipo de parto',
+         {'anestesia_por_tipo_parto': indicadores['anestesia_por_tipo_parto']}),
+        ('Complicaciones', 'Partos por complicación (CIE-10)',
+         {'complicaciones': {
+             f"{fila['codigo']} {fila['nombre']}": {'partos': fila['partos'], 'tasa': fila['tasa']}
+             for fila in indicadores.get('complicaciones', [])
+         }}),
+    ]
+    return escribir_rem(secciones, subtitulo=f'Período: {fecha_inicio} al {fecha_fin}', totales=False)
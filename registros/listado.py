@@ -0,0 +1,103 @@
+"""Mantenimiento de ``FilaListadoParto``, el modelo de lectura de lista_partos.
+
+``lista_partos`` y las listas del dashboard leen una sola tabla plana,
+ordenada por el índice ``(fecha_hora, parto)`` y filtrada por el índice
+``(created_by_id, fecha_hora)``, sin JOIN con ``Madre`` ni ``Usuario``.
+
+Las filas se escriben en la misma transacción que el cambio de origen:
+
+- guardar un ``Parto`` reescribe su fila (``actualizar``, un upsert),
+- crear/borrar un ``RecienNacido`` suma/resta uno al contador,
+- editar una ``Madre`` reescribe las filas de sus partos,
+- cambiar el nombre de un usuario actualiza ``registrado_por`` en un UPDATE.
+
+Borrar un parto borra su fila por CASCADE. ``reconstruir`` regenera la tabla
+completa en lotes (comando ``reconstruir_listado``).
+"""
+from django.db import connection
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import FilaListadoParto, Parto
+
+TAMANO_LOTE = 2000
+
+CAMPOS = [
+    'fecha_hora', 'madre_id', 'madre_rut', 'madre_nombres', 'madre_apellidos',
+    'madre_edad', 'created_by_id', 'registrado_por', 'recien_nacidos',
+]
+
+
+def edad_al(fecha_nacimiento, dia):
+    """Años cumplidos a ``dia``."""
+    if fecha_nacimiento is None:
+        return None
+    return dia.year - fecha_nacimiento.year - ((dia.month, dia.day) < (fecha_nacimiento.month, fecha_nacimiento.day))
+
+
+def nombre_usuario(usuario):
+    return (usuario.get_full_name() or usuario.username) if usuario else ''
+
+
+def fila(parto, recien_nacidos):
+    madre = parto.madre
+    return FilaListadoParto(
+        parto_id=parto.id,
+        fecha_hora=parto.fecha_hora,
+        madre_id=madre.id,
+        madre_rut=madre.rut,
+        madre_nombres=madre.nombres,
+        madre_apellidos=madre.apellidos,
+        # Edad al día del parto: no cambia con el tiempo
+        madre_edad=edad_al(madre.fecha_nacimiento, timezone.localdate(parto.fecha_hora)),
+        created_by_id=parto.created_by_id,
+        registrado_por=nombre_usuario(parto.created_by),
+        recien_nacidos=recien_nacidos,
+    )
+
+
+def actualizar(parto_ids):
+    """Inserta o reescribe las filas de esos partos (y borra las de partos que ya no existen)."""
+    ids = set(parto_ids)
+    if not ids:
+        return
+    partos = (
+        Parto.objects.filter(id__in=ids).select_related('madre', 'created_by')
+        .annotate(n_rn=Count('recien_nacidos')).order_by()
+    )
+    filas = [fila(p, p.n_rn) for p in partos]
+    # MySQL resuelve el conflicto por cualquier clave única (ON DUPLICATE KEY)
+    # y no admite indicar cuál; SQLite/PostgreSQL la exigen
+    con_destino = connection.features.supports_update_conflicts_with_target
+    FilaListadoParto.objects.bulk_create(
+        filas, update_conflicts=True, update_fields=CAMPOS,
+        unique_fields=['parto'] if con_destino else None,
+    )
+    faltantes = ids - {f.parto_id for f in filas}
+    if faltantes:
+        FilaListadoParto.objects.filter(parto_id__in=faltantes).delete()
+
+
+def sumar_recien_nacidos(parto_id, delta):
+    FilaListadoParto.objects.filter(parto_id=parto_id).update(
+        recien_nacidos=Greatest(F('recien_nacidos') + delta, 0)
+    )
+
+
+def renombrar_usuario(usuario):
+    FilaListadoParto.objects.filter(created_by_id=usuario.pk).update(registrado_por=nombre_usuario(usuario))
+
+
+def reconstruir(lote=TAMANO_LOTE):
+    """Reescribe todas las filas en lotes por id (upsert: el listado sigue
+    disponible mientras tanto; la FK impide filas huérfanas). Devuelve
+    cuántas se escribieron."""
+    ultimo, total = 0, 0
+    while True:
+        ids = list(Parto.objects.filter(id__gt=ultimo).order_by('id').values_list('id', flat=True)[:lote])
+        if not ids:
+            return total
+        actualizar(ids)
+        ultimo = ids[-1]
+        total += len(ids)
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from registros import archivo
+
+
+class Command(BaseCommand):
+    help = ('Mueve al archivo los partos (y sus recién nacidos) más antiguos que el horizonte '
+            '(settings.ARCHIVO_PARTOS_DIAS, por defecto 730 días).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Horizonte en días (por defecto ARCHIVO_PARTOS_DIAS).')
+        parser.add_argument('--lote', type=int, default=archivo.TAMANO_LOTE,
+                            help=f'Partos por lote/transacción (por defecto {archivo.TAMANO_LOTE}).')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin mover.')
+
+    def handle(self, *args, **options):
+        dias = options['dias'] if options['dias'] is not None else archivo.horizonte()
+        if dias < 1:
+            raise CommandError('El horizonte debe ser de al menos 1 día.')
+        antes = timezone.now() - timedelta(days=dias)
+
+        if options['dry_run']:
+            self.stdout.write(f'{archivo.archivables(antes).count()} partos anteriores a {antes:%Y-%m-%d} para archivar (sin cambios)')
+            return
+
+        partos, recien_nacidos = archivo.archivar(antes, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{partos} partos y {recien_nacidos} recién nacidos anteriores a {antes:%Y-%m-%d} movidos al archivo'
+        ))
@@ -0,0 +1,30 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from registros import respaldo
+
+
+class Command(BaseCommand):
+    help = ('Respalda roles, usuarios, invitaciones, catálogo de complicaciones, madres, partos y '
+            'recién nacidos (incluido el archivo) e historial de cambios en un JSON Lines comprimido, '
+            'leído en lotes dentro de una transacción con instantánea consistente.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo de salida (p. ej. respaldo.jsonl.gz).')
+        parser.add_argument('--lote', type=int, default=respaldo.TAMANO_LOTE,
+                            help=f'Filas por consulta (por defecto {respaldo.TAMANO_LOTE}).')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        totales = respaldo.respaldar(options['archivo'], lote=options['lote'])
+        segundos = time.perf_counter() - inicio
+        for seccion, n in totales.items():
+            self.stdout.write(f'{seccion}: {n} filas')
+        filas = sum(totales.values())
+        megas = os.path.getsize(options['archivo']) / 1e6
+        self.stdout.write(self.style.SUCCESS(
+            f'{filas} filas respaldadas en {options["archivo"]} ({megas:.1f} MB) '
+            f'en {segundos:.1f} s ({filas / max(segundos, 1e-9):,.0f} filas/s)'
+        ))
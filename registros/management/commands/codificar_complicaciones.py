@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from registros import complicaciones
+
+
+class Command(BaseCommand):
+    help = ('Asocia complicaciones del catálogo (CIE-10) a los partos según el texto libre de '
+            'Parto.complicaciones. Solo agrega asociaciones; se puede repetir sin duplicar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=complicaciones.TAMANO_LOTE,
+                            help=f'Partos por lote (por defecto {complicaciones.TAMANO_LOTE}).')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar coincidencias, sin guardar.')
+
+    def handle(self, *args, **options):
+        revisados, codificados, asociaciones = complicaciones.codificar(
+            lote=options['lote'], dry_run=options['dry_run'])
+        resumen = f'{revisados} partos revisados, {codificados} con coincidencias ({asociaciones} asociaciones)'
+        if options['dry_run']:
+            self.stdout.write(f'{resumen} (sin cambios)')
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen))
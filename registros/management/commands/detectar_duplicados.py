@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from registros import duplicados
+
+
+class Command(BaseCommand):
+    help = ('Busca madres probablemente duplicadas (mismo RUT con distinto formato, o nombre casi '
+            'idéntico y misma fecha de nacimiento) y las deja para revisión en madre/duplicados/.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--umbral', type=float, default=duplicados.UMBRAL_SIMILITUD,
+                            help=f'Similitud mínima de nombres, 0-1 (por defecto {duplicados.UMBRAL_SIMILITUD}).')
+        parser.add_argument('--lote', type=int, default=duplicados.TAMANO_LOTE,
+                            help=f'Madres por lote de lectura (por defecto {duplicados.TAMANO_LOTE}).')
+
+    def handle(self, *args, **options):
+        if not 0 < options['umbral'] <= 1:
+            raise CommandError('El umbral debe estar entre 0 y 1.')
+        inicio = time.monotonic()
+        totales = duplicados.detectar(umbral=options['umbral'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{totales['rut']} pares por RUT y {totales['nombre']} por nombre y fecha de nacimiento "
+            f"en {time.monotonic() - inicio:.1f} s"
+        ))
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from registros.utils import meses_entre
+
+
+def _iniciar_worker(settings_module):
+    """Inicializa Django en cada proceso del pool (cada uno abre su propia conexión)."""
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _generar_mes(args):
+    inicio, fin, usar_snapshot = args
+    from registros.utils import GeneradorREM
+    datos = GeneradorREM(inicio, fin, usar_snapshot=usar_snapshot).calcular()
+    return inicio, fin, datos
+
+
+def _aplanar(datos, prefijo=''):
+    """{'a': {'b': 1}} -> {'a.b': 1} para escribir una fila por mes."""
+    plano = {}
+    for clave, valor in datos.items():
+        nombre = f'{prefijo}{clave}'
+        if isinstance(valor, dict):
+            plano.update(_aplanar(valor, f'{nombre}.'))
+        else:
+            plano[nombre] = valor
+    return plano
+
+
+class Command(BaseCommand):
+    help = ('Genera los REM de cada mes entre --desde y --hasta en paralelo y los '
+            'reúne en un libro Excel (una hoja por sección, una fila por mes).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', required=True, help='Primer mes (YYYY-MM).')
+        parser.add_argument('--hasta', required=True, help='Último mes (YYYY-MM).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Procesos en paralelo (1 = en serie, en este proceso).')
+        parser.add_argument('--salida', help='Archivo XLSX de salida (por defecto REM_<desde>_<hasta>.xlsx).')
+        parser.add_argument('--sin-cache', action='store_true',
+                            help='Recalcular aunque existan snapshots de meses cerrados.')
+        parser.add_argument('--comparar', action='store_true',
+                            help='Ejecutar también en serie e informar la aceleración '
+                                 '(ambas corridas sin snapshots, para medir el cálculo).')
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m').date()
+            hasta = datetime.strptime(options['hasta'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('Formato de mes inválido. Use YYYY-MM')
+        if desde > hasta:
+            raise CommandError('--desde debe ser anterior o igual a --hasta')
+
+        # Al comparar, ninguna corrida lee snapshots: la segunda mediría aciertos
+        # de caché de los snapshots que escribió la primera
+        usar_snapshot = not options['sin_cache'] and not options['comparar']
+        tareas = [(inicio, fin, usar_snapshot) for inicio, fin in meses_entre(desde, hasta)]
+        workers = max(1, min(options['workers'], len(tareas)))
+
+        t0 = time.perf_counter()
+        resultados = self._ejecutar(tareas, workers)
+        t_paralelo = time.perf_counter() - t0
+        self.stdout.write(f'{len(tareas)} meses con {workers} worker(s): {t_paralelo:.2f}s')
+
+        if options['comparar']:
+            t0 = time.perf_counter()
+            self._ejecutar(tareas, 1)
+            t_serie = time.perf_counter() - t0
+            self.stdout.write(
+                f'En serie: {t_serie:.2f}s -> aceleración x{t_serie / t_paralelo:.2f}'
+                if t_paralelo else f'En serie: {t_serie:.2f}s'
+            )
+
+        salida = options['salida'] or f'REM_{options["desde"]}_{options["hasta"]}.xlsx'
+        self._escribir_libro(resultados, salida)
+        self.stdout.write(self.style.SUCCESS(f'Libro REM escrito en {salida}'))
+
+    def _ejecutar(self, tareas, workers):
+        if workers == 1:
+            return [_generar_mes(t) for t in tareas]
+        # No heredar sockets abiertos en los procesos hijos
+        connections.close_all()
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=contexto,
+            initializer=_iniciar_worker, initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),),
+        ) as pool:
+            return list(pool.map(_generar_mes, tareas))
+
+    def _escribir_libro(self, resultados, salida):
+        from openpyxl import Workbook
+        from registros import rem
+
+        libro = Workbook(write_only=True)
+        for clave, seccion in rem.SECCIONES.items():
+            filas = [_aplanar(datos[clave]) for _, _, datos in resultados]
+            columnas = list(filas[0]) if filas else []
+            hoja = libro.create_sheet(seccion.hoja)
+            hoja.append(['Mes'] + columnas)
+            for (inicio, _, _), fila in zip(resultados, filas):
+                hoja.append([inicio.strftime('%Y-%m')] + [fila.get(c) for c in columnas])
+        libro.save(salida)
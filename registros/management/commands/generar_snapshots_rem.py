@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from registros import snapshots
+from registros.utils import GeneradorREM, fin_de_mes
+
+
+class Command(BaseCommand):
+    help = 'Pre-genera los snapshots REM (datos y XLSX) de un mes cerrado. Por defecto, el mes anterior.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mes', help='Mes a generar en formato YYYY-MM (por defecto, el mes anterior).')
+
+    def handle(self, *args, **options):
+        if options['mes']:
+            try:
+                inicio = datetime.strptime(options['mes'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Formato de mes inválido. Use YYYY-MM')
+        else:
+            inicio = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+        fin = fin_de_mes(inicio)
+
+        if not snapshots.periodo_cerrado(fin):
+            raise CommandError(f'El período {inicio} - {fin} aún no está cerrado.')
+
+        generador = GeneradorREM(inicio, fin)
+        generador.exportar_excel()
+        self.stdout.write(self.style.SUCCESS(f'Snapshot REM generado para {inicio} - {fin}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from registros import listado
+
+
+class Command(BaseCommand):
+    help = 'Reescribe el modelo de lectura de lista_partos (FilaListadoParto) desde Parto, Madre y Usuario.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=listado.TAMANO_LOTE,
+                            help=f'Partos por lote (por defecto {listado.TAMANO_LOTE}).')
+
+    def handle(self, *args, **options):
+        total = listado.reconstruir(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} filas del listado reescritas'))
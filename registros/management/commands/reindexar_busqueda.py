@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from registros import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda clínica (complicaciones y observaciones) de partos y archivo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=busqueda.TAMANO_LOTE,
+                            help=f'Partos por lote (por defecto {busqueda.TAMANO_LOTE}).')
+
+    def handle(self, *args, **options):
+        total = busqueda.reindexar(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} partos indexados'))
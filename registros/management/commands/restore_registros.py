@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from registros import respaldo
+from registros.models import Parto, PartoArchivado
+
+
+class Command(BaseCommand):
+    help = ('Restaura un respaldo de backup_registros con bulk_create en lotes y en una sola '
+            'transacción, reasignando ids y claves foráneas. Luego devuelve al archivo los partos '
+            'antiguos y reconstruye listado e índice de búsqueda.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Respaldo generado por backup_registros.')
+        parser.add_argument('--lote', type=int, default=respaldo.TAMANO_LOTE,
+                            help=f'Filas por inserción (por defecto {respaldo.TAMANO_LOTE}).')
+        parser.add_argument('--anexar', action='store_true',
+                            help='Permite restaurar sobre una base que ya tiene partos (se agregan como nuevos).')
+        parser.add_argument('--sin-derivados', action='store_true',
+                            help='No archivar ni reconstruir listado e índice de búsqueda al terminar.')
+
+    def handle(self, *args, **options):
+        if not options['anexar'] and (Parto.objects.exists() or PartoArchivado.objects.exists()):
+            raise CommandError('La base ya tiene partos; restaurar los duplicaría. Use --anexar para agregarlos igual.')
+
+        inicio = time.perf_counter()
+        try:
+            resultado = respaldo.restaurar(options['archivo'], lote=options['lote'])
+        except respaldo.ErrorRespaldo as e:
+            raise CommandError(str(e))
+        segundos = time.perf_counter() - inicio
+        for seccion, (insertadas, omitidas) in resultado.items():
+            detalle = f' ({omitidas} ya existían)' if omitidas else ''
+            self.stdout.write(f'{seccion}: {insertadas} filas{detalle}')
+        filas = sum(insertadas for insertadas, _ in resultado.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{filas} filas restauradas en {segundos:.1f} s ({filas / max(segundos, 1e-9):,.0f} filas/s)'
+        ))
+
+        if options['sin_derivados']:
+            self.stdout.write('Pendiente: archivar_partos, reconstruir_listado y reindexar_busqueda.')
+            return
+        inicio = time.perf_counter()
+        archivados = respaldo.derivados()
+        self.stdout.write(self.style.SUCCESS(
+            f'{archivados} partos devueltos al archivo; listado e índice reconstruidos '
+            f'en {time.perf_counter() - inicio:.1f} s'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from registros import analytics
+
+
+class Command(BaseCommand):
+    help = ('Escribe un snapshot columnar (Parquet si hay pyarrow, si no .npy mapeables) '
+            'de madres, partos y recién nacidos para análisis offline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', default='analytics_snapshot', help='Directorio de salida.')
+        parser.add_argument('--formato', choices=['auto', 'parquet', 'npy'], default='auto')
+
+    def handle(self, *args, **options):
+        try:
+            filas = analytics.escribir_snapshot(options['salida'], options['formato'])
+        except ImportError:
+            raise CommandError('Se requiere numpy para generar el snapshot (pip install numpy).')
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        for tabla, n in filas.items():
+            self.stdout.write(f'{tabla}: {n} filas')
+        self.stdout.write(self.style.SUCCESS(f'Snapshot escrito en {options["salida"]}'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0002_alter_madre_rut_alter_parto_fecha_hora_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reciennacido',
+            name='talla',
+            field=models.DecimalField(decimal_places=1, max_digits=4),
+        ),
+        migrations.CreateModel(
+            name='ReporteREMSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('version', models.CharField(max_length=20)),
+                ('datos', models.JSONField()),
+                ('xlsx', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Reporte REM',
+                'verbose_name_plural': 'Snapshots de Reportes REM',
+                'indexes': [models.Index(fields=['fecha_inicio', 'fecha_fin'], name='rem_snapshot_rango_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha_inicio', 'fecha_fin', 'version'), name='uniq_rem_snapshot_rango_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0003_reporte_rem_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('madres', 'Madre'), ('partos', 'Parto'), ('recien_nacidos', 'Recién Nacido')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('eliminado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Registro Eliminado',
+                'verbose_name_plural': 'Registros Eliminados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='madre',
+            index=models.Index(fields=['updated_at', 'id'], name='madre_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parto',
+            index=models.Index(fields=['updated_at', 'id'], name='parto_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciennacido',
+            index=models.Index(fields=['updated_at', 'id'], name='rn_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroeliminado',
+            index=models.Index(fields=['eliminado_en', 'id'], name='eliminado_cursor_idx'),
+        ),
+    ]
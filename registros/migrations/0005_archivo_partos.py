@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0004_delta_export'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_hora', models.DateTimeField(db_index=True)),
+                ('tipo_parto', models.CharField(choices=[('vaginal', 'Vaginal'), ('cesarea', 'Cesárea'), ('forceps', 'Fórceps')], max_length=20)),
+                ('semanas_gestacion', models.IntegerField()),
+                ('tipo_anestesia', models.CharField(choices=[('ninguna', 'Ninguna'), ('local', 'Local'), ('epidural', 'Epidural'), ('raquidea', 'Raquídea'), ('general', 'General')], max_length=20)),
+                ('complicaciones', models.TextField(blank=True)),
+                ('observaciones', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('madre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='partos_archivados', to='registros.madre')),
+            ],
+            options={
+                'verbose_name': 'Parto Archivado',
+                'verbose_name_plural': 'Partos Archivados',
+                'ordering': ['-fecha_hora'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecienNacidoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('hora_nacimiento', models.TimeField()),
+                ('sexo', models.CharField(choices=[('M', 'Masculino'), ('F', 'Femenino')], max_length=1)),
+                ('peso', models.DecimalField(decimal_places=3, max_digits=5)),
+                ('talla', models.DecimalField(decimal_places=1, max_digits=4)),
+                ('apgar_1', models.IntegerField()),
+                ('apgar_5', models.IntegerField()),
+                ('estado', models.CharField(choices=[('vivo', 'Vivo'), ('fallecido', 'Fallecido')], default='vivo', max_length=10)),
+                ('observaciones', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('parto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recien_nacidos', to='registros.partoarchivado')),
+            ],
+            options={
+                'verbose_name': 'Recién Nacido Archivado',
+                'verbose_name_plural': 'Recién Nacidos Archivados',
+            },
+        ),
+    ]
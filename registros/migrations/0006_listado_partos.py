@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def poblar_listado(apps, schema_editor):
+    # Equivalente a registros.listado.reconstruir con los modelos históricos
+    Parto = apps.get_model('registros', 'Parto')
+    FilaListadoParto = apps.get_model('registros', 'FilaListadoParto')
+    ultimo = 0
+    while True:
+        partos = list(
+            Parto.objects.filter(id__gt=ultimo).select_related('madre', 'created_by')
+            .annotate(n_rn=Count('recien_nacidos')).order_by('id')[:2000]
+        )
+        if not partos:
+            return
+        filas = []
+        for p in partos:
+            nacimiento, dia = p.madre.fecha_nacimiento, timezone.localdate(p.fecha_hora)
+            autor = p.created_by
+            nombre = f'{autor.first_name} {autor.last_name}'.strip() or autor.username if autor else ''
+            filas.append(FilaListadoParto(
+                parto_id=p.id, fecha_hora=p.fecha_hora, madre_id=p.madre_id,
+                madre_rut=p.madre.rut, madre_nombres=p.madre.nombres, madre_apellidos=p.madre.apellidos,
+                madre_edad=dia.year - nacimiento.year - ((dia.month, dia.day) < (nacimiento.month, nacimiento.day)),
+                created_by_id=p.created_by_id, registrado_por=nombre, recien_nacidos=p.n_rn,
+            ))
+        FilaListadoParto.objects.bulk_create(filas)
+        ultimo = partos[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0005_archivo_partos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilaListadoParto',
+            fields=[
+                ('parto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fila_listado', serialize=False, to='registros.parto')),
+                ('fecha_hora', models.DateTimeField()),
+                ('madre_id', models.BigIntegerField(db_index=True)),
+                ('madre_rut', models.CharField(max_length=12)),
+                ('madre_nombres', models.CharField(max_length=100)),
+                ('madre_apellidos', models.CharField(max_length=100)),
+                ('madre_edad', models.PositiveSmallIntegerField(null=True)),
+                ('created_by_id', models.BigIntegerField(null=True)),
+                ('registrado_por', models.CharField(blank=True, max_length=255)),
+                ('recien_nacidos', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Fila del Listado de Partos',
+                'verbose_name_plural': 'Filas del Listado de Partos',
+                'ordering': ['-fecha_hora', '-parto_id'],
+                'indexes': [models.Index(fields=['-fecha_hora', '-parto'], name='listado_fecha_idx'), models.Index(fields=['created_by_id', '-fecha_hora'], name='listado_usuario_idx'), models.Index(fields=['madre_rut'], name='listado_rut_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_listado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+def indexar_textos(apps, schema_editor):
+    # Equivalente a registros.busqueda.reindexar con los modelos históricos
+    from registros.busqueda import terminos
+
+    PosicionTermino = apps.get_model('registros', 'PosicionTermino')
+    pares = [
+        (apps.get_model('registros', 'Parto'), apps.get_model('registros', 'RecienNacido')),
+        (apps.get_model('registros', 'PartoArchivado'), apps.get_model('registros', 'RecienNacidoArchivado')),
+    ]
+    for Parto, RecienNacido in pares:
+        ultimo = 0
+        while True:
+            partos = list(
+                Parto.objects.filter(id__gt=ultimo).order_by('id')
+                .values('id', 'complicaciones', 'observaciones')[:500]
+            )
+            if not partos:
+                break
+            ids = [p['id'] for p in partos]
+            textos = [(p['id'], campo, None, p[nombre]) for p in partos
+                      for campo, nombre in ((1, 'complicaciones'), (2, 'observaciones'))]
+            textos += [(rn['parto_id'], 3, rn['id'], rn['observaciones'])
+                       for rn in RecienNacido.objects.filter(parto_id__in=ids).values('id', 'parto_id', 'observaciones')]
+            PosicionTermino.objects.bulk_create([
+                PosicionTermino(termino=termino, parto_id=parto_id, campo=campo,
+                                recien_nacido_id=recien_nacido_id, posicion=posicion)
+                for parto_id, campo, recien_nacido_id, texto in textos
+                for posicion, termino in terminos(texto)
+            ], batch_size=500)
+            ultimo = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0006_listado_partos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosicionTermino',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('parto_id', models.BigIntegerField()),
+                ('campo', models.PositiveSmallIntegerField(choices=[(1, 'Complicaciones'), (2, 'Observaciones del parto'), (3, 'Observaciones del recién nacido')])),
+                ('recien_nacido_id', models.BigIntegerField(null=True)),
+                ('posicion', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Posición de Término',
+                'verbose_name_plural': 'Índice de Búsqueda Clínica',
+                'indexes': [models.Index(fields=['termino', 'campo', 'parto_id'], name='busqueda_termino_idx'), models.Index(fields=['parto_id', 'recien_nacido_id'], name='busqueda_parto_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_textos, migrations.RunPython.noop),
+    ]
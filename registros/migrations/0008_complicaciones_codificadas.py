@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def sembrar_catalogo(apps, schema_editor):
+    # Catálogo inicial; la codificación del texto existente la hace el comando
+    # codificar_complicaciones (puede tardar en bases grandes)
+    from registros.complicaciones import sembrar_catalogo
+    sembrar_catalogo(apps.get_model('registros', 'Complicacion'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0007_busqueda_clinica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Complicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=10, unique=True)),
+                ('nombre', models.CharField(max_length=200)),
+                ('sinonimos', models.TextField(blank=True)),
+                ('activa', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Complicación',
+                'verbose_name_plural': 'Complicaciones',
+                'ordering': ['codigo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartoArchivadoComplicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('complicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='registros.complicacion')),
+                ('parto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='registros.partoarchivado')),
+            ],
+            options={
+                'verbose_name': 'Complicación del Parto Archivado',
+                'verbose_name_plural': 'Complicaciones de Partos Archivados',
+            },
+        ),
+        migrations.AddField(
+            model_name='partoarchivado',
+            name='complicaciones_codificadas',
+            field=models.ManyToManyField(blank=True, related_name='+', through='registros.PartoArchivadoComplicacion', to='registros.complicacion'),
+        ),
+        migrations.CreateModel(
+            name='PartoComplicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('complicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='registros.complicacion')),
+                ('parto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='registros.parto')),
+            ],
+            options={
+                'verbose_name': 'Complicación del Parto',
+                'verbose_name_plural': 'Complicaciones de Partos',
+            },
+        ),
+        migrations.AddField(
+            model_name='parto',
+            name='complicaciones_codificadas',
+            field=models.ManyToManyField(blank=True, related_name='partos', through='registros.PartoComplicacion', to='registros.complicacion'),
+        ),
+        migrations.AddConstraint(
+            model_name='partoarchivadocomplicacion',
+            constraint=models.UniqueConstraint(fields=('parto', 'complicacion'), name='parto_arch_complicacion_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='partocomplicacion',
+            constraint=models.UniqueConstraint(fields=('parto', 'complicacion'), name='parto_complicacion_unica'),
+        ),
+        migrations.RunPython(sembrar_catalogo, migrations.RunPython.noop),
+    ]
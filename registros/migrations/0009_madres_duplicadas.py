@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0008_complicaciones_codificadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidatoDuplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(choices=[('rut', 'Mismo RUT con distinto formato'), ('nombre', 'Nombre casi idéntico y misma fecha de nacimiento')], max_length=10)),
+                ('similitud', models.FloatField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('descartado', 'Descartado')], default='pendiente', max_length=10)),
+                ('detectado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Candidato a Duplicado',
+                'verbose_name_plural': 'Candidatos a Duplicado',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='madre',
+            index=models.Index(fields=['fecha_nacimiento', 'id'], name='madre_nacimiento_idx'),
+        ),
+        migrations.AddField(
+            model_name='candidatoduplicado',
+            name='madre_a',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='registros.madre'),
+        ),
+        migrations.AddField(
+            model_name='candidatoduplicado',
+            name='madre_b',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='registros.madre'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatoduplicado',
+            index=models.Index(fields=['estado', '-similitud'], name='candidato_estado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='candidatoduplicado',
+            constraint=models.UniqueConstraint(fields=('madre_a', 'madre_b'), name='candidato_par_unico'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:48
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registros', '0009_madres_duplicadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioRegistro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('madres', 'Madre'), ('partos', 'Parto'), ('recien_nacidos', 'Recién Nacido')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('parto_id', models.BigIntegerField()),
+                ('cambios', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cambio de Registro',
+                'verbose_name_plural': 'Cambios de Registro',
+                'indexes': [models.Index(fields=['parto_id', 'fecha'], name='cambio_parto_idx'), models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='cambio_objeto_idx')],
+            },
+        ),
+    ]
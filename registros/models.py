@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 
 class Madre(models.Model):
     ESTADO_CIVIL_CHOICES = [
@@ -129,6 +130,73 @@ class Madre(models.Model):
     class Meta:
         verbose_name = "Madre"
         verbose_name_plural = "Madres"
+        indexes = [
+            # Cursor (updated_at, id) de la exportación incremental
+            models.Index(fields=['updated_at', 'id'], name='madre_updated_idx'),
+            # Recorrido por bloques de fecha de nacimiento (registros.duplicados)
+            models.Index(fields=['fecha_nacimiento', 'id'], name='madre_nacimiento_idx'),
+        ]
+
+class Complicacion(models.Model):
+    """Complicación obstétrica del catálogo codificado (CIE-10).
+
+    Los partos la referencian con ``Parto.complicaciones_codificadas``; los
+    conteos de los reportes agrupan por ``complicacion_id`` en vez de leer el
+    texto libre. ``sinonimos`` (una expresión por línea) alimenta la
+    codificación automática del texto existente (``registros.complicaciones``).
+    Una entrada en uso no se borra: se desactiva.
+    """
+    codigo = models.CharField(max_length=10, unique=True)
+    nombre = models.CharField(max_length=200)
+    sinonimos = models.TextField(blank=True)
+    activa = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.codigo} - {self.nombre}"
+
+    class Meta:
+        verbose_name = "Complicación"
+        verbose_name_plural = "Complicaciones"
+        ordering = ['codigo']
+
+
+class PartoQuerySet(models.QuerySet):
+    def in_local_dates(self, fecha_inicio=None, fecha_fin=None):
+        """Filtra partos cuyo día local (America/Santiago) está en
+        [fecha_inicio, fecha_fin]. Usa límites datetime para que el filtro
+        sea sargable sobre el índice de ``fecha_hora``."""
+        from .utils import local_date_bounds
+        desde, hasta = local_date_bounds(fecha_inicio, fecha_fin)
+        qs = self
+        if desde is not None:
+            qs = qs.filter(fecha_hora__gte=desde)
+        if hasta is not None:
+            qs = qs.filter(fecha_hora__lt=hasta)
+        return qs
+
+    # Proyecciones reutilizables: detalle/edición (views, archivo) y
+    # exportación Excel (excel_export).
+
+    def for_detail(self):
+        """Registro completo para detalle/edición: madre, usuario y recién
+        nacidos ordenados (así ``recien_nacidos.first()`` usa el prefetch)."""
+        recien_nacidos = self.model._meta.get_field('recien_nacidos').related_model
+        return self.select_related('madre', 'created_by').prefetch_related(
+            models.Prefetch('recien_nacidos', queryset=recien_nacidos.objects.order_by('id'))
+        )
+
+    def for_export(self):
+        """Diccionarios planos con las columnas de la exportación Excel."""
+        return self.order_by('-fecha_hora').values(*self.EXPORT_FIELDS)
+
+    EXPORT_FIELDS = (
+        'id', 'fecha_hora', 'tipo_parto', 'semanas_gestacion', 'tipo_anestesia',
+        'complicaciones', 'observaciones', 'created_at',
+        'madre__rut', 'madre__nombres', 'madre__apellidos', 'madre__fecha_nacimiento',
+        'madre__estado_civil', 'madre__direccion', 'madre__telefono', 'madre__prevision',
+        'created_by__username', 'created_by__first_name', 'created_by__last_name',
+    )
+
 
 class Parto(models.Model):
     TIPO_PARTO_CHOICES = [
@@ -153,6 +221,9 @@ class Parto(models.Model):
     )
     tipo_anestesia = models.CharField(max_length=20, choices=TIPO_ANESTESIA_CHOICES)
     complicaciones = models.TextField(blank=True)
+    complicaciones_codificadas = models.ManyToManyField(
+        Complicacion, through='PartoComplicacion', blank=True, related_name='partos'
+    )
     observaciones = models.TextField(blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -164,6 +235,11 @@ class Parto(models.Model):
         related_name='partos_registrados'
     )
 
+    objects = PartoQuerySet.as_manager()
+
+    # Ver PartoArchivado
+    archivado = False
+
     def clean(self):
         from django.core.exceptions import ValidationError
         from datetime import timedelta
@@ -203,6 +279,23 @@ class Parto(models.Model):
         verbose_name = "Parto"
         verbose_name_plural = "Partos"
         ordering = ['-fecha_hora']  # Ordenar por fecha descendente
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='parto_updated_idx'),
+        ]
+
+
+class PartoComplicacion(models.Model):
+    """Relación Parto–Complicacion. La restricción única (parto, complicación)
+    hace que contar filas por complicación sea contar partos."""
+    parto = models.ForeignKey(Parto, on_delete=models.CASCADE)
+    complicacion = models.ForeignKey(Complicacion, on_delete=models.PROTECT)
+
+    class Meta:
+        verbose_name = "Complicación del Parto"
+        verbose_name_plural = "Complicaciones de Partos"
+        constraints = [
+            models.UniqueConstraint(fields=['parto', 'complicacion'], name='parto_complicacion_unica'),
+        ]
 
 class RecienNacido(models.Model):
     SEXO_CHOICES = [
@@ -340,6 +433,9 @@ class RecienNacido(models.Model):
     class Meta:
         verbose_name = "Recién Nacido"
         verbose_name_plural = "Recién Nacidos"
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='rn_updated_idx'),
+        ]
 
 class SesionUsuario(models.Model):
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -354,3 +450,277 @@ class SesionUsuario(models.Model):
     class Meta:
         verbose_name = "Sesión de Usuario"
         verbose_name_plural = "Sesiones de Usuario"
+
+
+class ReporteREMSnapshot(models.Model):
+    """Resultado inmutable de los REM de un período cerrado.
+
+    Guarda los ``datos`` de todas las secciones y el XLSX ya generado. La
+    clave es (rango de fechas, versión del motor REM); se elimina cuando se
+    edita un Parto/RecienNacido cuyo día cae dentro del rango.
+    """
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    version = models.CharField(max_length=20)
+    datos = models.JSONField()
+    xlsx = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"REM {self.fecha_inicio} - {self.fecha_fin} (v{self.version})"
+
+    class Meta:
+        verbose_name = "Snapshot de Reporte REM"
+        verbose_name_plural = "Snapshots de Reportes REM"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha_inicio', 'fecha_fin', 'version'], name='uniq_rem_snapshot_rango_version'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha_inicio', 'fecha_fin'], name='rem_snapshot_rango_idx'),
+        ]
+
+
+class RegistroEliminado(models.Model):
+    """Lápida (tombstone) de una Madre/Parto/RecienNacido eliminado, para que
+    la exportación incremental pueda informar borrados."""
+    MODELO_CHOICES = [
+        ('madres', 'Madre'),
+        ('partos', 'Parto'),
+        ('recien_nacidos', 'Recién Nacido'),
+    ]
+
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    objeto_id = models.BigIntegerField()
+    eliminado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} eliminado {self.eliminado_en}"
+
+    class Meta:
+        verbose_name = "Registro Eliminado"
+        verbose_name_plural = "Registros Eliminados"
+        indexes = [
+            models.Index(fields=['eliminado_en', 'id'], name='eliminado_cursor_idx'),
+        ]
+
+
+class PartoArchivado(models.Model):
+    """Parto movido al archivo frío (ver ``registros.archivo``).
+
+    Mismas columnas e id que ``Parto``: el detalle y los reportes por rango
+    lo leen con el mismo ``PartoQuerySet``. Los registros archivados son de
+    solo lectura.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    madre = models.ForeignKey(Madre, on_delete=models.CASCADE, related_name='partos_archivados')
+    fecha_hora = models.DateTimeField(db_index=True)
+    tipo_parto = models.CharField(max_length=20, choices=Parto.TIPO_PARTO_CHOICES)
+    semanas_gestacion = models.IntegerField()
+    tipo_anestesia = models.CharField(max_length=20, choices=Parto.TIPO_ANESTESIA_CHOICES)
+    complicaciones = models.TextField(blank=True)
+    complicaciones_codificadas = models.ManyToManyField(
+        Complicacion, through='PartoArchivadoComplicacion', blank=True, related_name='+'
+    )
+    observaciones = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    objects = PartoQuerySet.as_manager()
+
+    archivado = True
+
+    def __str__(self):
+        return f"Parto archivado de {self.madre} - {self.fecha_hora.date()}"
+
+    class Meta:
+        verbose_name = "Parto Archivado"
+        verbose_name_plural = "Partos Archivados"
+        ordering = ['-fecha_hora']
+
+
+class PartoArchivadoComplicacion(models.Model):
+    """Relación PartoArchivado–Complicacion (mismas columnas que ``PartoComplicacion``)."""
+    parto = models.ForeignKey(PartoArchivado, on_delete=models.CASCADE)
+    complicacion = models.ForeignKey(Complicacion, on_delete=models.PROTECT)
+
+    class Meta:
+        verbose_name = "Complicación del Parto Archivado"
+        verbose_name_plural = "Complicaciones de Partos Archivados"
+        constraints = [
+            models.UniqueConstraint(fields=['parto', 'complicacion'], name='parto_arch_complicacion_unica'),
+        ]
+
+
+class RecienNacidoArchivado(models.Model):
+    """Recién nacido de un ``PartoArchivado`` (mismas columnas e id que ``RecienNacido``)."""
+    id = models.BigIntegerField(primary_key=True)
+    parto = models.ForeignKey(PartoArchivado, on_delete=models.CASCADE, related_name='recien_nacidos')
+    hora_nacimiento = models.TimeField()
+    sexo = models.CharField(max_length=1, choices=RecienNacido.SEXO_CHOICES)
+    peso = models.DecimalField(max_digits=5, decimal_places=3)
+    talla = models.DecimalField(max_digits=4, decimal_places=1)
+    apgar_1 = models.IntegerField()
+    apgar_5 = models.IntegerField()
+    estado = models.CharField(max_length=10, choices=RecienNacido.ESTADO_CHOICES, default='vivo')
+    observaciones = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"RN archivado de {self.parto.madre} - {self.hora_nacimiento}"
+
+    class Meta:
+        verbose_name = "Recién Nacido Archivado"
+        verbose_name_plural = "Recién Nacidos Archivados"
+
+
+class FilaListadoParto(models.Model):
+    """Fila plana de ``lista_partos`` (modelo de lectura desnormalizado).
+
+    Una fila por parto con los datos de la madre, el nombre del usuario que
+    lo registró y la cantidad de recién nacidos, para listar y buscar sin
+    JOIN. La mantienen las señales de ``registros.signals`` dentro de la misma
+    transacción; ``reconstruir_listado`` la regenera completa.
+    """
+    parto = models.OneToOneField(Parto, on_delete=models.CASCADE, primary_key=True, related_name='fila_listado')
+    fecha_hora = models.DateTimeField()
+    madre_id = models.BigIntegerField(db_index=True)
+    madre_rut = models.CharField(max_length=12)
+    madre_nombres = models.CharField(max_length=100)
+    madre_apellidos = models.CharField(max_length=100)
+    madre_edad = models.PositiveSmallIntegerField(null=True)
+    created_by_id = models.BigIntegerField(null=True)
+    registrado_por = models.CharField(max_length=255, blank=True)
+    recien_nacidos = models.PositiveSmallIntegerField(default=0)
+
+    @property
+    def id(self):
+        # Las plantillas y el tablero en vivo usan el id del parto
+        return self.parto_id
+
+    def __str__(self):
+        return f"{self.madre_nombres} {self.madre_apellidos} - {self.fecha_hora}"
+
+    class Meta:
+        verbose_name = "Fila del Listado de Partos"
+        verbose_name_plural = "Filas del Listado de Partos"
+        ordering = ['-fecha_hora', '-parto_id']
+        indexes = [
+            models.Index(fields=['-fecha_hora', '-parto'], name='listado_fecha_idx'),
+            models.Index(fields=['created_by_id', '-fecha_hora'], name='listado_usuario_idx'),
+            models.Index(fields=['madre_rut'], name='listado_rut_idx'),
+        ]
+
+
+class PosicionTermino(models.Model):
+    """Aparición de un término en un texto clínico (índice invertido).
+
+    Una fila por palabra indexada de ``complicaciones``/``observaciones`` del
+    parto y ``observaciones`` de sus recién nacidos, con su posición en el
+    texto para las búsquedas por frase (ver ``registros.busqueda``). Los ids
+    no son claves foráneas: un parto conserva su id al pasar al archivo, así
+    que sus entradas siguen sirviendo sin reescribirse.
+    """
+    CAMPO_COMPLICACIONES = 1
+    CAMPO_OBSERVACIONES = 2
+    CAMPO_OBSERVACIONES_RN = 3
+    CAMPO_CHOICES = [
+        (CAMPO_COMPLICACIONES, 'Complicaciones'),
+        (CAMPO_OBSERVACIONES, 'Observaciones del parto'),
+        (CAMPO_OBSERVACIONES_RN, 'Observaciones del recién nacido'),
+    ]
+
+    termino = models.CharField(max_length=40)
+    parto_id = models.BigIntegerField()
+    campo = models.PositiveSmallIntegerField(choices=CAMPO_CHOICES)
+    recien_nacido_id = models.BigIntegerField(null=True)
+    posicion = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.termino} @ parto {self.parto_id}"
+
+    class Meta:
+        verbose_name = "Posición de Término"
+        verbose_name_plural = "Índice de Búsqueda Clínica"
+        indexes = [
+            models.Index(fields=['termino', 'campo', 'parto_id'], name='busqueda_termino_idx'),
+            models.Index(fields=['parto_id', 'recien_nacido_id'], name='busqueda_parto_idx'),
+        ]
+
+
+class CandidatoDuplicado(models.Model):
+    """Par de madres que probablemente son la misma persona.
+
+    Lo llena ``detectar_duplicados`` (ver ``registros.duplicados``); un
+    administrador lo revisa y fusiona las dos fichas o lo descarta. Los pares
+    descartados se conservan para no volver a proponerlos.
+    """
+    MOTIVO_CHOICES = [
+        ('rut', 'Mismo RUT con distinto formato'),
+        ('nombre', 'Nombre casi idéntico y misma fecha de nacimiento'),
+    ]
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('descartado', 'Descartado'),
+    ]
+
+    madre_a = models.ForeignKey(Madre, on_delete=models.CASCADE, related_name='+')
+    madre_b = models.ForeignKey(Madre, on_delete=models.CASCADE, related_name='+')
+    motivo = models.CharField(max_length=10, choices=MOTIVO_CHOICES)
+    similitud = models.FloatField()
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pendiente')
+    detectado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.madre_a_id} ~ {self.madre_b_id} ({self.motivo})"
+
+    class Meta:
+        verbose_name = "Candidato a Duplicado"
+        verbose_name_plural = "Candidatos a Duplicado"
+        constraints = [
+            models.UniqueConstraint(fields=['madre_a', 'madre_b'], name='candidato_par_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['estado', '-similitud'], name='candidato_estado_idx'),
+        ]
+
+
+class CambioRegistro(models.Model):
+    """Diferencias de una edición de Madre/Parto/RecienNacido.
+
+    Tabla solo de inserción: cada fila guarda únicamente los campos que
+    cambiaron (``{campo: [antes, después]}``), no una copia del registro.
+    ``objeto_id`` y ``parto_id`` son enteros y no FKs, para que el historial
+    sobreviva al archivo y a los borrados. Ver ``registros.historial``.
+    """
+    MODELO_CHOICES = RegistroEliminado.MODELO_CHOICES
+
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    objeto_id = models.BigIntegerField()
+    parto_id = models.BigIntegerField()
+    cambios = models.JSONField(encoder=DjangoJSONEncoder)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} editado {self.fecha}"
+
+    class Meta:
+        verbose_name = "Cambio de Registro"
+        verbose_name_plural = "Cambios de Registro"
+        indexes = [
+            models.Index(fields=['parto_id', 'fecha'], name='cambio_parto_idx'),
+            models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='cambio_objeto_idx'),
+        ]
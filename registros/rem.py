@@ -0,0 +1,235 @@
+"""Motor de reportes REM en una sola pasada.
+
+Cada sección REM declara qué dimensiones necesita de cada fuente de datos
+(partos o recién nacidos). El motor une las dimensiones pedidas por todas las
+secciones y ejecuta, por fuente, UNA sola consulta agrupada sobre el rango:
+
+    SELECT dim_1, dim_2, ..., COUNT(*) FROM ... WHERE rango GROUP BY dim_1, dim_2, ...
+
+Luego cada sección calcula su reporte marginalizando esas filas en Python
+(son pocas: el producto de las cardinalidades, no el número de partos).
+
+Para agregar una sección nueva basta con subclasificar ``SeccionREM`` y
+registrarla con ``@registrar_seccion``; si usa dimensiones ya existentes no
+agrega consultas.
+"""
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.db.models.lookups import LessThan
+
+from . import archivo
+from .models import Parto
+from .utils import local_date_bounds
+
+# Subir cuando cambie el formato de los datos o del XLSX: invalida los
+# snapshots guardados de períodos cerrados (ver registros.snapshots).
+VERSION = '2'
+
+
+def edad_madre():
+    """Edad exacta (años cumplidos) de la madre a la fecha local del parto."""
+    anios = ExtractYear('fecha_hora') - ExtractYear('madre__fecha_nacimiento')
+    mes_dia_parto = ExtractMonth('fecha_hora') * 100 + ExtractDay('fecha_hora')
+    mes_dia_nac = ExtractMonth('madre__fecha_nacimiento') * 100 + ExtractDay('madre__fecha_nacimiento')
+    antes_del_cumple = Case(
+        When(LessThan(mes_dia_parto, mes_dia_nac), then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return anios - antes_del_cumple
+
+
+def _partos(fecha_inicio, fecha_fin, tablas):
+    return [
+        modelo.objects.in_local_dates(fecha_inicio, fecha_fin).order_by()
+        for modelo, _ in tablas
+    ]
+
+
+def _recien_nacidos(fecha_inicio, fecha_fin, tablas):
+    desde, hasta = local_date_bounds(fecha_inicio, fecha_fin)
+    querysets = []
+    for _, modelo in tablas:
+        qs = modelo.objects.order_by()
+        if desde is not None:
+            qs = qs.filter(parto__fecha_hora__gte=desde)
+        if hasta is not None:
+            qs = qs.filter(parto__fecha_hora__lt=hasta)
+        querysets.append(qs)
+    return querysets
+
+
+# fuente -> (querysets base por rango: tabla caliente y archivo si el rango
+# lo alcanza, {dimensión: expresión})
+FUENTES = {
+    'partos': (_partos, {
+        'tipo_parto': lambda: F('tipo_parto'),
+        'tipo_anestesia': lambda: F('tipo_anestesia'),
+        'edad_madre': edad_madre,
+    }),
+    'recien_nacidos': (_recien_nacidos, {
+        'estado': lambda: F('estado'),
+        'sexo': lambda: F('sexo'),
+    }),
+}
+
+
+class Grupos:
+    """Filas agrupadas de una fuente: lista de (dimensiones, total)."""
+
+    def __init__(self, filas=()):
+        self.filas = list(filas)
+
+    def total(self, **filtro):
+        return sum(
+            n for dims, n in self.filas
+            if all(dims.get(k) == v for k, v in filtro.items())
+        )
+
+    def por(self, dimension, **filtro):
+        conteo = Counter()
+        for dims, n in self.filas:
+            if all(dims.get(k) == v for k, v in filtro.items()):
+                conteo[dims.get(dimension)] += n
+        return conteo
+
+
+class SeccionREM:
+    """Sección de un REM. Subclases definen ``clave``, ``hoja``, ``titulo``,
+    ``dimensiones`` ({fuente: (dimensión, ...)}) y ``calcular(grupos)``."""
+    clave = None
+    hoja = None
+    titulo = None
+    dimensiones = {}
+
+    def calcular(self, grupos):
+        raise NotImplementedError
+
+
+SECCIONES = {}
+
+
+def registrar_seccion(cls):
+    SECCIONES[cls.clave] = cls()
+    return cls
+
+
+def agrupar(fuente, dimensiones, fecha_inicio, fecha_fin, tablas=None):
+    """Ejecuta la consulta agrupada de una fuente y devuelve ``Grupos``.
+    ``tablas`` son los pares de ``archivo.tablas`` (se calculan si faltan)."""
+    base, expresiones = FUENTES[fuente]
+    if tablas is None:
+        tablas = archivo.tablas(fecha_inicio, fecha_fin)
+    dims = sorted(dimensiones)
+    alias = {f'd_{d}': expresiones[d]() for d in dims}
+    # Con el archivo una misma combinación puede venir dos veces: Grupos las suma
+    return Grupos(
+        ({d: fila[f'd_{d}'] for d in dims}, fila['total'])
+        for qs in base(fecha_inicio, fecha_fin, tablas)
+        for fila in qs.annotate(**alias).values(*alias).annotate(total=Count('id'))
+    )
+
+
+def generar(fecha_inicio, fecha_fin, claves=None):
+    """Calcula las secciones pedidas (todas por defecto) con una consulta
+    agrupada por fuente. Devuelve {clave: datos}."""
+    secciones = [SECCIONES[c] for c in (claves or SECCIONES)]
+
+    por_fuente = {}
+    for seccion in secciones:
+        for fuente, dims in seccion.dimensiones.items():
+            por_fuente.setdefault(fuente, set()).update(dims)
+
+    # Una sola consulta a la frontera del archivo para todas las fuentes
+    tablas = archivo.tablas(fecha_inicio, fecha_fin) if por_fuente else None
+    grupos = {
+        fuente: agrupar(fuente, dims, fecha_inicio, fecha_fin, tablas)
+        for fuente, dims in por_fuente.items()
+    }
+    return {s.clave: s.calcular(grupos) for s in secciones}
+
+
+def _grupo_edad(edad):
+    if edad < 15:
+        return 'menor_15'
+    if edad <= 19:
+        return '15_19'
+    if edad <= 24:
+        return '20_24'
+    if edad <= 29:
+        return '25_29'
+    if edad <= 34:
+        return '30_34'
+    return '35_mas'
+
+
+@registrar_seccion
+class RemBS22(SeccionREM):
+    """REM-BS22 (Atenciones de Obstetricia y Ginecología)."""
+    clave = 'bs22'
+    hoja = 'REM-BS22'
+    titulo = 'REM-BS22: Atenciones de Obstetricia y Ginecología'
+    dimensiones = {'partos': ('tipo_parto', 'tipo_anestesia', 'edad_madre')}
+
+    def calcular(self, grupos):
+        partos = grupos['partos']
+        datos = {
+            'total_partos': partos.total(),
+            'partos_por_tipo': {c: 0 for c, _ in Parto.TIPO_PARTO_CHOICES},
+            'partos_por_edad': {
+                'menor_15': 0, '15_19': 0, '20_24': 0,
+                '25_29': 0, '30_34': 0, '35_mas': 0,
+            },
+            'anestesia': {c: 0 for c, _ in Parto.TIPO_ANESTESIA_CHOICES},
+        }
+        datos['partos_por_tipo'].update(partos.por('tipo_parto'))
+        datos['anestesia'].update(partos.por('tipo_anestesia'))
+        for edad, n in partos.por('edad_madre').items():
+            if edad is not None:
+                datos['partos_por_edad'][_grupo_edad(edad)] += n
+        return datos
+
+
+@registrar_seccion
+class RemA09(SeccionREM):
+    """REM-A09 (Egresos Hospitalarios). Aún no hay datos de egreso en el
+    modelo: la sección no declara dimensiones y no genera consultas."""
+    clave = 'a09'
+    hoja = 'REM-A09'
+    titulo = 'REM-A09: Egresos Hospitalarios'
+
+    def calcular(self, grupos):
+        return {
+            'egresos_total': 0,
+            'motivo_egreso': {
+                'alta': 0,
+                'traslado': 0,
+                'defuncion': 0
+            },
+            'estadia_promedio': 0
+        }
+
+
+@registrar_seccion
+class RemA04(SeccionREM):
+    """REM-A04 (Defunciones). RecienNacido no guarda la fecha/hora de
+    defunción, por lo que los tramos de edad quedan en 0 hasta que exista
+    ese dato (se agregaría como dimensión de ``recien_nacidos``)."""
+    clave = 'a04'
+    hoja = 'REM-A04'
+    titulo = 'REM-A04: Defunciones'
+    dimensiones = {'recien_nacidos': ('estado',)}
+
+    def calcular(self, grupos):
+        return {
+            'defunciones_total': grupos['recien_nacidos'].total(estado='fallecido'),
+            'defunciones_por_edad': {
+                'menor_1_hora': 0,
+                '1_23_horas': 0,
+                '1_7_dias': 0,
+                '8_27_dias': 0,
+                '28_dias_mas': 0
+            }
+        }
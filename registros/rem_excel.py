@@ -0,0 +1,80 @@
+"""Escritor XLSX liviano para los reportes REM.
+
+Usa openpyxl en modo write-only (sin pandas): los REM son unas pocas celdas
+y no justifican cargar pandas en cada proceso. Cada sección se escribe como
+tablas legibles: los valores escalares en una tabla "Indicador | Valor" y
+cada diccionario anidado como su propia tabla "Categoría | Total" (o con
+una columna por clave cuando las filas son a su vez diccionarios).
+"""
+from io import BytesIO
+
+
+def _etiqueta(clave):
+    return str(clave).replace('_', ' ').capitalize()
+
+
+def _escribir_seccion(hoja, titulo, datos, subtitulo=None, totales=True):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    negrita = Font(bold=True)
+
+    def fila_negrita(*valores):
+        celdas = []
+        for valor in valores:
+            celda = WriteOnlyCell(hoja, value=valor)
+            celda.font = negrita
+            celdas.append(celda)
+        hoja.append(celdas)
+
+    fila_negrita(titulo)
+    if subtitulo:
+        hoja.append([subtitulo])
+    hoja.append([])
+
+    escalares = [(k, v) for k, v in datos.items() if not isinstance(v, dict)]
+    tablas = [(k, v) for k, v in datos.items() if isinstance(v, dict)]
+
+    if escalares:
+        fila_negrita('Indicador', 'Valor')
+        for clave, valor in escalares:
+            hoja.append([_etiqueta(clave), valor])
+        hoja.append([])
+
+    for clave, tabla in tablas:
+        fila_negrita(_etiqueta(clave))
+        if tabla and all(isinstance(v, dict) for v in tabla.values()):
+            # Tabla de varias columnas: {fila: {columna: valor}}
+            columnas = list(dict.fromkeys(c for fila in tabla.values() for c in fila))
+            fila_negrita('Categoría', *[_etiqueta(c) for c in columnas])
+            for categoria, fila in tabla.items():
+                hoja.append([categoria] + [fila.get(c) for c in columnas])
+        else:
+            fila_negrita('Categoría', 'Total')
+            for categoria, valor in tabla.items():
+                hoja.append([categoria, valor])
+            if totales:
+                hoja.append(['Total', sum(v for v in tabla.values() if isinstance(v, (int, float)))])
+        hoja.append([])
+
+
+def escribir_rem(secciones, subtitulo=None, totales=True):
+    """Genera el XLSX de los REM y devuelve sus bytes.
+
+    ``secciones`` es una lista de (nombre_hoja, titulo, datos) donde ``datos``
+    es el diccionario de una sección: valores escalares, tablas
+    {categoría: valor} o tablas {categoría: {columna: valor}}. Con
+    ``totales=False`` no se agrega la fila "Total" (p. ej. para tasas).
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    for nombre_hoja, titulo, datos in secciones:
+        hoja = libro.create_sheet(nombre_hoja)
+        hoja.column_dimensions['A'].width = 30
+        hoja.column_dimensions['B'].width = 12
+        _escribir_seccion(hoja, titulo, datos, subtitulo, totales)
+
+    output = BytesIO()
+    libro.save(output)
+    return output.getvalue()
@@ -0,0 +1,300 @@
+"""Respaldo y restauración de los datos clínicos y de cuentas en JSON Lines.
+
+``dumpdata`` arma tablas completas en memoria y ``loaddata`` guarda fila por
+fila con señales; con un millón de filas ninguno de los dos sirve. Aquí:
+
+- ``respaldar`` escribe un archivo gzip con una línea JSON por fila (una
+  lista de valores en el orden de ``campos``), precedida por una cabecera
+  por sección y cerrada con una línea ``fin`` con los totales. Cada tabla se
+  lee en lotes por id (cursor ``id > último``) dentro de una única
+  transacción de solo lectura con instantánea consistente, así que el
+  archivo refleja un mismo instante aunque la aplicación siga escribiendo.
+- ``restaurar`` lee el archivo en streaming e inserta con ``bulk_create`` en
+  lotes, todo en una transacción. Los ids se reasignan sumando a cada uno el
+  mayor id existente en la tabla de destino (en una base vacía se conservan)
+  y las claves foráneas se traducen con ese desplazamiento. Las filas con
+  clave natural ya presente (rol por nombre, usuario por username, madre por
+  RUT, complicación por código, invitación por código) no se insertan: sus
+  referencias pasan a la fila existente.
+
+Los partos y recién nacidos archivados se respaldan junto a los calientes y
+se restauran en la tabla caliente; al terminar, ``archivo.archivar`` los
+devuelve al archivo según el horizonte. Así las dos tablas siguen
+compartiendo la secuencia de ids de ``Parto``. El listado, el índice de
+búsqueda y las cachés de reportes se reconstruyen después (``derivados``),
+porque ``bulk_create`` no emite señales.
+
+El archivo contiene datos clínicos y hashes de contraseñas: debe guardarse
+con el mismo cuidado que la base de datos.
+"""
+import gzip
+import json
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from cuentas.models import InviteCode, Rol
+
+from . import archivo
+from .models import (
+    CambioRegistro, Complicacion, Madre, Parto, PartoArchivado, PartoArchivadoComplicacion,
+    PartoComplicacion, RecienNacido, RecienNacidoArchivado,
+)
+
+FORMATO = 'respaldo_registros'
+VERSION = 1
+TAMANO_LOTE = 2000
+
+
+class ErrorRespaldo(Exception):
+    """Archivo de respaldo inválido, incompleto o incompatible con el esquema actual."""
+
+
+# nombre: sección del archivo; modelos: se leen en orden y se restauran en el
+# primero; clave: clave natural para no duplicar filas existentes;
+# referencias: {columna FK: sección a la que apunta}; con_id: si otras
+# secciones apuntan a esta (si no, el id lo asigna la base al restaurar)
+Seccion = namedtuple('Seccion', 'nombre modelos clave referencias con_id')
+
+
+def _campos(modelo):
+    return [f.attname for f in modelo._meta.concrete_fields]
+
+
+def secciones():
+    Usuario = get_user_model()
+    return [
+        Seccion('roles', [Rol], 'nombre', {}, True),
+        Seccion('usuarios', [Usuario], Usuario.USERNAME_FIELD, {'rol_id': 'roles'}, True),
+        Seccion('invitaciones', [InviteCode], 'code',
+                {'created_by_id': 'usuarios', 'used_by_id': 'usuarios'}, False),
+        Seccion('complicaciones', [Complicacion], 'codigo', {}, True),
+        Seccion('madres', [Madre], 'rut', {'created_by_id': 'usuarios'}, True),
+        Seccion('partos', [Parto, PartoArchivado], None,
+                {'madre_id': 'madres', 'created_by_id': 'usuarios'}, True),
+        Seccion('partos_complicaciones', [PartoComplicacion, PartoArchivadoComplicacion], None,
+                {'parto_id': 'partos', 'complicacion_id': 'complicaciones'}, False),
+        Seccion('recien_nacidos', [RecienNacido, RecienNacidoArchivado], None, {'parto_id': 'partos'}, True),
+        Seccion('historial', [CambioRegistro], None, {'parto_id': 'partos', 'usuario_id': 'usuarios'}, False),
+    ]
+
+
+def campos_seccion(seccion):
+    """Columnas comunes a todos los modelos de la sección, con el id primero."""
+    comunes = set.intersection(*(set(_campos(m)) for m in seccion.modelos))
+    campos = [c for c in _campos(seccion.modelos[0]) if c in comunes]
+    if not seccion.con_id:
+        campos.remove('id')
+    return campos
+
+
+def _a_json(valor):
+    # isoformat completo: DjangoJSONEncoder trunca los microsegundos
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f'No serializable: {type(valor).__name__}')
+
+
+def _linea(dato):
+    return json.dumps(dato, default=_a_json, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+@contextmanager
+def lectura_consistente():
+    """Transacción de solo lectura en la que todas las consultas ven el mismo
+    instante de la base. Dentro de una transacción ya abierta (por ejemplo,
+    una ``lectura_consistente`` externa) se usa esa misma."""
+    if connection.in_atomic_block:
+        yield
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                # Django usa READ COMMITTED en MySQL; la instantánea requiere REPEATABLE READ
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                cursor.execute('START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY')
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+            # SQLite: una transacción de lectura ya ve una instantánea fija
+        yield
+
+
+def respaldar(ruta, lote=TAMANO_LOTE):
+    """Escribe el respaldo en ``ruta`` (gzip). Devuelve filas por sección."""
+    totales = {}
+    with gzip.open(ruta, 'wt', encoding='utf-8', compresslevel=6) as salida, lectura_consistente():
+        salida.write(_linea({'formato': FORMATO, 'version': VERSION, 'creado': timezone.now()}))
+        for seccion in secciones():
+            campos = campos_seccion(seccion)
+            salida.write(_linea({'seccion': seccion.nombre, 'campos': campos}))
+            # El id va siempre primero en la consulta: es el cursor del lote
+            columnas = campos if seccion.con_id else ['id', *campos]
+            total = 0
+            for modelo in seccion.modelos:
+                ultimo = 0
+                while True:
+                    filas = list(
+                        modelo.objects.filter(id__gt=ultimo).order_by('id').values_list(*columnas)[:lote]
+                    )
+                    if not filas:
+                        break
+                    ultimo = filas[-1][0]
+                    if not seccion.con_id:
+                        filas = [fila[1:] for fila in filas]
+                    salida.write(''.join(_linea(fila) for fila in filas))
+                    total += len(filas)
+            totales[seccion.nombre] = total
+        salida.write(_linea({'fin': True, 'filas': totales}))
+    return totales
+
+
+class Remapeo:
+    """Id del respaldo -> id en la base restaurada: desplazamiento fijo, salvo
+    las filas que coincidieron con una existente por clave natural."""
+
+    def __init__(self, desplazamiento=0):
+        self.desplazamiento = desplazamiento
+        self.existentes = {}
+
+    def __call__(self, viejo):
+        if viejo is None:
+            return None
+        return self.existentes.get(viejo, viejo + self.desplazamiento)
+
+
+@contextmanager
+def _conservar_fechas(modelos):
+    """Desactiva auto_now/auto_now_add para insertar las fechas originales."""
+    campos = [
+        (f, f.auto_now, f.auto_now_add) for m in modelos for f in m._meta.concrete_fields
+        if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)
+    ]
+    for f, _, _ in campos:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in campos:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _insertar(seccion, campos, valores, mapas, habia_filas):
+    modelo = seccion.modelos[0]
+    filas = [dict(zip(campos, v)) for v in valores]
+    omitidas = 0
+    if seccion.clave and habia_filas:
+        existentes = dict(
+            modelo.objects.filter(**{f'{seccion.clave}__in': [f[seccion.clave] for f in filas]})
+            .values_list(seccion.clave, 'id')
+        )
+        if existentes:
+            nuevas = []
+            for fila in filas:
+                if fila[seccion.clave] in existentes:
+                    if seccion.con_id:
+                        mapas[seccion.nombre].existentes[fila['id']] = existentes[fila[seccion.clave]]
+                else:
+                    nuevas.append(fila)
+            omitidas = len(filas) - len(nuevas)
+            filas = nuevas
+    por_modelo = {'madres': mapas.get('madres'), 'partos': mapas.get('partos'),
+                  'recien_nacidos': mapas.get('recien_nacidos')}
+    for fila in filas:
+        for columna, destino in seccion.referencias.items():
+            fila[columna] = mapas[destino](fila[columna])
+        if seccion.con_id:
+            fila['id'] = mapas[seccion.nombre](fila['id'])
+        if seccion.nombre == 'historial':
+            fila['objeto_id'] = por_modelo[fila['modelo']](fila['objeto_id'])
+    modelo.objects.bulk_create([modelo(**fila) for fila in filas])
+    return len(filas), omitidas
+
+
+def restaurar(ruta, lote=TAMANO_LOTE):
+    """Carga el respaldo de ``ruta`` en una transacción. Devuelve
+    {sección: (insertadas, omitidas por existir)}."""
+    try:
+        return _restaurar(ruta, lote)
+    except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        raise ErrorRespaldo(f'Respaldo dañado o truncado: {e}')
+
+
+def _restaurar(ruta, lote):
+    por_nombre = {s.nombre: s for s in secciones()}
+    destinos = [s.modelos[0] for s in por_nombre.values()]
+    resultado, mapas = {}, {}
+    fin = None
+    with gzip.open(ruta, 'rt', encoding='utf-8') as entrada, _conservar_fechas(destinos), transaction.atomic():
+        cabecera = json.loads(next(entrada, 'null')) or {}
+        if not isinstance(cabecera, dict) or cabecera.get('formato') != FORMATO or cabecera.get('version') != VERSION:
+            raise ErrorRespaldo(f'Formato de respaldo no soportado: {cabecera}')
+
+        seccion, campos, pendientes, habia_filas = None, None, [], False
+
+        def volcar():
+            insertadas, omitidas = _insertar(seccion, campos, pendientes, mapas, habia_filas)
+            previas = resultado[seccion.nombre]
+            resultado[seccion.nombre] = (previas[0] + insertadas, previas[1] + omitidas)
+            pendientes.clear()
+
+        for linea in entrada:
+            dato = json.loads(linea)
+            if isinstance(dato, list):
+                pendientes.append(dato)
+                if len(pendientes) >= lote:
+                    volcar()
+                continue
+            if seccion is not None and pendientes:
+                volcar()
+            if dato.get('fin'):
+                fin = dato
+                break
+            seccion = por_nombre.get(dato.get('seccion'))
+            if seccion is None:
+                raise ErrorRespaldo(f'Sección desconocida: {dato.get("seccion")}')
+            campos = dato['campos']
+            desconocidos = set(campos) - set(_campos(seccion.modelos[0]))
+            if desconocidos:
+                raise ErrorRespaldo(f'{seccion.nombre}: columnas que ya no existen: {sorted(desconocidos)}')
+            modelo = seccion.modelos[0]
+            habia_filas = modelo.objects.exists()
+            if seccion.con_id:
+                # Partos: también el archivo, que comparte la secuencia de ids
+                maximos = [m.objects.aggregate(m=Max('id'))['m'] or 0 for m in seccion.modelos]
+                mapas[seccion.nombre] = Remapeo(max(maximos))
+            resultado[seccion.nombre] = (0, 0)
+
+        if fin is None:
+            raise ErrorRespaldo('Respaldo incompleto: falta la línea final.')
+        leidas = {nombre: sum(n) for nombre, n in resultado.items()}
+        if leidas != fin['filas']:
+            raise ErrorRespaldo(f'Respaldo incompleto: se esperaban {fin["filas"]} filas y se leyeron {leidas}.')
+
+        # PostgreSQL no avanza la secuencia con ids explícitos (MySQL y SQLite sí)
+        modelos_con_id = [s.modelos[0] for s in por_nombre.values() if s.con_id]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), modelos_con_id):
+                cursor.execute(sql)
+    return resultado
+
+
+def derivados():
+    """Devuelve al archivo los partos antiguos restaurados y reconstruye
+    listado, índice de búsqueda y cachés de reportes."""
+    from . import busqueda, estadisticas, listado
+    from .models import ReporteREMSnapshot
+    archivados, _ = archivo.archivar(timezone.now() - timedelta(days=archivo.horizonte()))
+    listado.reconstruir()
+    busqueda.reindexar()
+    ReporteREMSnapshot.objects.all().delete()
+    estadisticas.invalidar()
+    return archivados
@@ -0,0 +1,182 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Madre, Parto, PartoArchivado, RecienNacido, RecienNacidoArchivado, RegistroEliminado,
+)
+
+
+def _dia_local(fecha_hora):
+    return timezone.localdate(fecha_hora) if fecha_hora else None
+
+
+def _invalidar_snapshots(*dias):
+    from . import snapshots
+    transaction.on_commit(lambda: snapshots.invalidar(*dias))
+
+
+def _invalidar_estadisticas():
+    from . import estadisticas
+    transaction.on_commit(estadisticas.invalidar)
+
+
+@receiver(pre_save, sender=Parto)
+def recordar_valores_anteriores(sender, instance, raw=False, **kwargs):
+    # Si se mueve la fecha del parto hay que invalidar también el día original;
+    # los textos anteriores evitan reindexar la búsqueda si no cambiaron
+    instance._fecha_hora_anterior = instance._textos_anteriores = None
+    if instance.pk and not raw:
+        anterior = Parto.objects.filter(pk=instance.pk).values_list(
+            'fecha_hora', 'complicaciones', 'observaciones').first()
+        if anterior:
+            instance._fecha_hora_anterior, *textos = anterior
+            instance._textos_anteriores = tuple(textos)
+
+
+@receiver(post_save, sender=Parto)
+@receiver(post_delete, sender=Parto)
+def parto_modificado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidar_snapshots(
+        _dia_local(instance.fecha_hora),
+        _dia_local(getattr(instance, '_fecha_hora_anterior', None)),
+    )
+    _invalidar_estadisticas()
+
+
+@receiver(post_save, sender=Parto)
+@receiver(post_delete, sender=Parto)
+def publicar_en_tablero(sender, instance, raw=False, created=False, **kwargs):
+    # Tablero en vivo (registros.eventos): se publica tras el commit
+    if raw:
+        return
+    from . import eventos
+    accion = 'eliminado' if kwargs.get('signal') is post_delete else ('creado' if created else 'editado')
+    parto_id = instance.pk
+    transaction.on_commit(lambda: eventos.publicar_parto(parto_id, accion))
+
+
+@receiver(post_save, sender=Parto)
+def actualizar_listado(sender, instance, raw=False, **kwargs):
+    # Modelo de lectura de lista_partos (registros.listado), en la misma transacción
+    if raw:
+        return
+    from . import listado
+    listado.actualizar([instance.pk])
+
+
+@receiver(post_save, sender=RecienNacido)
+@receiver(post_delete, sender=RecienNacido)
+def contar_en_listado(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    from . import listado
+    if kwargs.get('signal') is post_delete:
+        listado.sumar_recien_nacidos(instance.parto_id, -1)
+    elif created:
+        listado.sumar_recien_nacidos(instance.parto_id, 1)
+
+
+@receiver(pre_save, sender=Madre)
+def recordar_fecha_nacimiento(sender, instance, raw=False, **kwargs):
+    instance._fecha_nacimiento_anterior = None
+    if instance.pk and not raw:
+        instance._fecha_nacimiento_anterior = Madre.objects.filter(pk=instance.pk).values_list(
+            'fecha_nacimiento', flat=True).first()
+
+
+@receiver(post_save, sender=Madre)
+def madre_modificada(sender, instance, raw=False, created=False, **kwargs):
+    # REM BS22 agrupa cada parto por la edad de la madre: otra fecha de
+    # nacimiento cambia el grupo de todos sus partos, también los archivados
+    anterior = getattr(instance, '_fecha_nacimiento_anterior', None)
+    if raw or created or anterior is None or anterior == instance.fecha_nacimiento:
+        return
+    fechas = [
+        *instance.partos.values_list('fecha_hora', flat=True),
+        *instance.partos_archivados.values_list('fecha_hora', flat=True),
+    ]
+    _invalidar_snapshots(*{_dia_local(fecha_hora) for fecha_hora in fechas})
+
+
+@receiver(post_save, sender=Madre)
+def madre_en_listado(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    from . import listado
+    listado.actualizar(instance.partos.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def usuario_en_listado(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    # El login guarda solo last_login: no cambia el nombre mostrado
+    if raw or created or (update_fields and not {'username', 'first_name', 'last_name'} & set(update_fields)):
+        return
+    from . import listado
+    listado.renombrar_usuario(instance)
+
+
+@receiver(post_save, sender=Parto)
+def indexar_parto(sender, instance, raw=False, created=False, **kwargs):
+    # Índice de búsqueda clínica (registros.busqueda), en la misma transacción
+    if raw:
+        return
+    textos = (instance.complicaciones, instance.observaciones)
+    if textos == getattr(instance, '_textos_anteriores', None) or (created and not any(textos)):
+        return
+    from . import busqueda
+    busqueda.indexar_parto(instance)
+
+
+@receiver(post_save, sender=RecienNacido)
+def indexar_recien_nacido(sender, instance, raw=False, created=False, **kwargs):
+    if raw or (created and not instance.observaciones):
+        return
+    from . import busqueda
+    busqueda.indexar_recien_nacido(instance)
+
+
+@receiver(post_delete, sender=Parto)
+@receiver(post_delete, sender=PartoArchivado)
+@receiver(post_delete, sender=RecienNacido)
+def desindexar(sender, instance, **kwargs):
+    from . import busqueda
+    if sender is RecienNacido:
+        busqueda.desindexar(instance.parto_id, instance.pk)
+    else:
+        busqueda.desindexar(instance.pk)
+
+
+@receiver(post_save, sender=RecienNacido)
+@receiver(post_delete, sender=RecienNacido)
+def recien_nacido_modificado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    fecha_hora = Parto.objects.filter(pk=instance.parto_id).values_list('fecha_hora', flat=True).first()
+    _invalidar_snapshots(_dia_local(fecha_hora))
+    _invalidar_estadisticas()
+
+
+ENTIDADES_ELIMINADAS = {
+    Madre: 'madres',
+    Parto: 'partos',
+    PartoArchivado: 'partos',
+    RecienNacido: 'recien_nacidos',
+    RecienNacidoArchivado: 'recien_nacidos',
+}
+
+
+@receiver(post_delete, sender=Madre)
+@receiver(post_delete, sender=Parto)
+@receiver(post_delete, sender=PartoArchivado)
+@receiver(post_delete, sender=RecienNacido)
+@receiver(post_delete, sender=RecienNacidoArchivado)
+def registrar_eliminacion(sender, instance, **kwargs):
+    # Lápida para la exportación incremental (registros.delta); archivar no
+    # dispara señales, solo un borrado real del archivo deja lápida
+    modelo = ENTIDADES_ELIMINADAS[sender]
+    RegistroEliminado.objects.create(modelo=modelo, objeto_id=instance.pk)
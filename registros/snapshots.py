@@ -0,0 +1,49 @@
+"""Snapshots inmutables de reportes REM para meses cerrados.
+
+Un período está cerrado cuando termina antes del mes en curso (hora local).
+Sus REM casi nunca cambian, así que se calculan una vez y se sirven desde
+``ReporteREMSnapshot``. Solo se guardan meses calendario completos: un rango
+arbitrario se calcula en cada consulta en vez de dejar una fila permanente. Las señales de ``registros.signals`` eliminan los
+snapshots que contienen el día de un Parto/RecienNacido editado.
+"""
+from django.utils import timezone
+
+from . import rem
+from .models import ReporteREMSnapshot
+from .utils import fin_de_mes
+
+
+def periodo_cerrado(fecha_fin):
+    """True si el rango termina antes del primer día del mes local actual."""
+    return fecha_fin < timezone.localdate().replace(day=1)
+
+
+def admite_snapshot(fecha_inicio, fecha_fin):
+    """True si el rango es un mes calendario completo y ya cerrado."""
+    return (fecha_inicio.day == 1 and fecha_fin == fin_de_mes(fecha_inicio)
+            and periodo_cerrado(fecha_fin))
+
+
+def obtener(fecha_inicio, fecha_fin):
+    """Devuelve el snapshot del rango, calculándolo si aún no existe."""
+    snap = ReporteREMSnapshot.objects.filter(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, version=rem.VERSION
+    ).first()
+    if snap is None:
+        datos = rem.generar(fecha_inicio, fecha_fin)
+        snap, _ = ReporteREMSnapshot.objects.get_or_create(
+            fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, version=rem.VERSION,
+            defaults={'datos': datos},
+        )
+    return snap
+
+
+def guardar_xlsx(snap, contenido):
+    ReporteREMSnapshot.objects.filter(pk=snap.pk).update(xlsx=contenido)
+    snap.xlsx = contenido
+
+
+def invalidar(*dias):
+    """Elimina los snapshots cuyo rango contiene alguno de los días dados."""
+    for dia in {d for d in dias if d is not None}:
+        ReporteREMSnapshot.objects.filter(fecha_inicio__lte=dia, fecha_fin__gte=dia).delete()
@@ -0,0 +1,173 @@
+"""Exportación en streaming (CSV / NDJSON) de partos, madres y recién nacidos.
+
+Pensado para consumidores automáticos (cargador BI, scripts de subida al
+ministerio) que no necesitan XLSX. Las filas se leen con ``values_list`` en
+lotes por clave primaria (keyset: ``id > último`` ordenado por id), de modo
+que la memoria se mantiene constante sin importar el tamaño del rango: el
+driver MySQL guarda en memoria el resultado completo de un cursor normal, así
+que un único ``.iterator()`` sobre toda la tabla no basta. Partos y recién
+nacidos se leen de la tabla caliente y, si el rango lo alcanza, del archivo
+(``archivo.modelos``), una tabla tras otra. La primera línea (encabezado) se
+envía antes de tocar la base de datos.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from . import archivo
+from .models import Madre, Parto, RecienNacido
+from .utils import local_date_bounds
+
+TAMANO_LOTE = 2000
+
+# dataset -> (modelo, filtro de rango, [(columna, campo ORM)])
+DATASETS = {
+    'partos': (Parto, 'fecha_hora', [
+        ('id', 'id'),
+        ('madre_id', 'madre_id'),
+        ('rut_madre', 'madre__rut'),
+        ('fecha_hora', 'fecha_hora'),
+        ('tipo_parto', 'tipo_parto'),
+        ('semanas_gestacion', 'semanas_gestacion'),
+        ('tipo_anestesia', 'tipo_anestesia'),
+        ('complicaciones', 'complicaciones'),
+        ('observaciones', 'observaciones'),
+        ('registrado_por', 'created_by__username'),
+        ('fecha_registro', 'created_at'),
+    ]),
+    'madres': (Madre, 'partos__fecha_hora', [
+        ('id', 'id'),
+        ('rut', 'rut'),
+        ('nombres', 'nombres'),
+        ('apellidos', 'apellidos'),
+        ('fecha_nacimiento', 'fecha_nacimiento'),
+        ('estado_civil', 'estado_civil'),
+        ('direccion', 'direccion'),
+        ('telefono', 'telefono'),
+        ('prevision', 'prevision'),
+    ]),
+    'recien_nacidos': (RecienNacido, 'parto__fecha_hora', [
+        ('id', 'id'),
+        ('parto_id', 'parto_id'),
+        ('rut_madre', 'parto__madre__rut'),
+        ('fecha_parto', 'parto__fecha_hora'),
+        ('hora_nacimiento', 'hora_nacimiento'),
+        ('sexo', 'sexo'),
+        ('peso', 'peso'),
+        ('talla', 'talla'),
+        ('apgar_1', 'apgar_1'),
+        ('apgar_5', 'apgar_5'),
+        ('estado', 'estado'),
+        ('observaciones', 'observaciones'),
+    ]),
+}
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def _valor(v):
+    if isinstance(v, datetime) and timezone.is_aware(v):
+        return timezone.localtime(v).isoformat()
+    return v
+
+
+def _rango(qs, campo, desde, hasta):
+    if desde is not None:
+        qs = qs.filter(**{f'{campo}__gte': desde})
+    if hasta is not None:
+        qs = qs.filter(**{f'{campo}__lt': hasta})
+    return qs
+
+
+def _consultas(dataset, fecha_inicio=None, fecha_fin=None):
+    """QuerySets (uno por tabla) con las filas del dataset en el rango."""
+    modelo, campo_fecha, _ = DATASETS[dataset]
+    desde, hasta = local_date_bounds(fecha_inicio, fecha_fin)
+    if modelo is not Madre:
+        return [_rango(m.objects.all(), campo_fecha, desde, hasta)
+                for m in archivo.modelos(modelo, fecha_inicio, fecha_fin)]
+    if desde is None and hasta is None:
+        return [Madre.objects.all()]
+    # Madres con algún parto en el rango, esté en la tabla caliente o archivado
+    con_partos = [
+        Exists(_rango(m.objects.filter(madre=OuterRef('pk')), 'fecha_hora', desde, hasta))
+        for m in archivo.modelos(Parto, fecha_inicio, fecha_fin)
+    ]
+    return [Madre.objects.filter(reduce(or_, con_partos))]
+
+
+def filas(dataset, fecha_inicio=None, fecha_fin=None, tamano_lote=None):
+    """Genera tuplas de valores del dataset en lotes por id (memoria constante)."""
+    campos = [c for _, c in DATASETS[dataset][2]]
+    tamano_lote = tamano_lote or TAMANO_LOTE
+
+    for qs in _consultas(dataset, fecha_inicio, fecha_fin):
+        qs = qs.order_by('id')
+        ultimo = 0
+        while True:
+            lote = list(qs.filter(id__gt=ultimo).values_list(*campos)[:tamano_lote])
+            for fila in lote:
+                yield tuple(_valor(v) for v in fila)
+            if len(lote) < tamano_lote:
+                break
+            ultimo = lote[-1][0]
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve lo escrito en vez de guardarlo."""
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(dataset, registros):
+    writer = csv.writer(_Eco())
+    yield writer.writerow([nombre for nombre, _ in DATASETS[dataset][2]])
+    for fila in registros:
+        yield writer.writerow(fila)
+
+
+def lineas_ndjson(dataset, registros):
+    nombres = [nombre for nombre, _ in DATASETS[dataset][2]]
+    for fila in registros:
+        yield json.dumps(dict(zip(nombres, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def comprimir(lineas, nivel=6):
+    """gzip incremental: emite bloques comprimidos a medida que llegan líneas."""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for i, linea in enumerate(lineas):
+        bloque = compresor.compress(linea.encode('utf-8'))
+        if i == 0:
+            # Vaciar tras la primera línea para no retrasar el primer byte
+            bloque += compresor.flush(zlib.Z_SYNC_FLUSH)
+        if bloque:
+            yield bloque
+    yield compresor.flush()
+
+
+def respuesta_streaming(dataset, formato, fecha_inicio=None, fecha_fin=None, gzip=False):
+    content_type, extension = FORMATOS[formato]
+    generador = lineas_csv if formato == 'csv' else lineas_ndjson
+    contenido = generador(dataset, filas(dataset, fecha_inicio, fecha_fin))
+
+    rango = f'{fecha_inicio}_{fecha_fin}' if fecha_inicio and fecha_fin else 'completo'
+    nombre = f'{dataset}_{rango}.{extension}'
+    if gzip:
+        contenido = comprimir(contenido)
+        content_type = 'application/gzip'
+        nombre += '.gz'
+
+    response = StreamingHttpResponse(contenido, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={nombre}'
+    return response
@@ -7,6 +7,18 @@ from datetime import date, datetime, timedelta
 from .forms import PartoCompletoForm
 
 
+def crear_madre(numero=12345678, **campos):
+    """Madre válida para las pruebas; ``numero`` es el RUT sin dígito
+    verificador y ``campos`` reemplaza cualquier otro valor."""
+    datos = dict(
+        rut=format_rut(str(numero) + Madre.calcular_dv(numero)),
+        nombres='Madre', apellidos='Prueba', fecha_nacimiento=date(1990, 1, 1),
+        estado_civil='soltera', direccion='X', telefono='+56 9 9123 4567', prevision='fonasa_a',
+    )
+    datos.update(campos)
+    return Madre.objects.create(**datos)
+
+
 class MadreApiTests(TestCase):
 	def setUp(self):
 		self.client = Client()
@@ -235,3 +247,1446 @@ class MadreCreateAPITests(TestCase):
         json = response.json()
         self.assertFalse(json.get('created'))
         self.assertIn('rut', json.get('errors', {}))
+
+
+class PartoDateRangeTests(TestCase):
+    """`Parto.objects.in_local_dates` must match local calendar days and stay sargable."""
+    def setUp(self):
+        from .models import Parto
+        from django.utils import timezone
+        self.madre = crear_madre(nombres='Rango', apellidos='Fechas')
+        tz = timezone.get_current_timezone()
+
+        def crear(dt):
+            return Parto.objects.create(
+                madre=self.madre, fecha_hora=timezone.make_aware(dt, tz),
+                tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='ninguna',
+            )
+        self.antes = crear(datetime(2025, 3, 9, 23, 59))
+        self.inicio = crear(datetime(2025, 3, 10, 0, 0))
+        self.fin = crear(datetime(2025, 3, 12, 23, 59))
+        self.despues = crear(datetime(2025, 3, 13, 0, 0))
+
+    def test_half_open_local_bounds(self):
+        from .models import Parto
+        ids = set(Parto.objects.in_local_dates(date(2025, 3, 10), date(2025, 3, 12)).values_list('id', flat=True))
+        self.assertEqual(ids, {self.inicio.id, self.fin.id})
+
+    def test_open_ended_range(self):
+        from .models import Parto
+        ids = set(Parto.objects.in_local_dates(date(2025, 3, 12), None).values_list('id', flat=True))
+        self.assertEqual(ids, {self.fin.id, self.despues.id})
+
+    def test_query_uses_fecha_hora_index(self):
+        from django.db import connection
+        from .models import Parto
+        qs = Parto.objects.in_local_dates(date(2025, 3, 10), date(2025, 3, 12)).order_by()
+        sql = str(qs.query).upper()
+        self.assertNotIn('DATE(', sql)
+        self.assertNotIn('CAST_DATE', sql)
+        plan = qs.explain().upper()
+        if connection.vendor == 'sqlite':
+            self.assertIn('USING INDEX', plan)
+            self.assertIn('FECHA_HORA>', plan.replace(' ', ''))
+        elif connection.vendor == 'mysql':
+            self.assertIn('RANGE', plan)
+
+
+class PartoProjectionTests(TestCase):
+    """Pin the number of queries issued by each PartoQuerySet projection."""
+    def setUp(self):
+        from .models import Parto, RecienNacido
+        from django.utils import timezone
+        User = get_user_model()
+        self.user = User.objects.create_user('proj', 'p@example.test', 'pw', first_name='Ana', last_name='Matrona')
+        for i, numero in enumerate((11111111, 22222222, 33333333)):
+            madre = crear_madre(numero=numero, nombres=f'Madre{i}', apellidos='Proy')
+            parto = Parto.objects.create(
+                madre=madre, fecha_hora=timezone.now() - timedelta(days=i),
+                tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='ninguna',
+                complicaciones='ninguna', created_by=self.user,
+            )
+            RecienNacido.objects.create(
+                parto=parto, hora_nacimiento='10:00', sexo='F', peso='3.200', talla='50.0',
+                apgar_1=8, apgar_5=9,
+            )
+
+    def test_for_detail_prefetches_newborns(self):
+        from .models import Parto
+        with self.assertNumQueries(2):
+            parto = Parto.objects.for_detail().get(madre__nombres='Madre0')
+            parto.madre.direccion, parto.created_by.username
+            self.assertEqual(len(parto.recien_nacidos.all()), 1)
+            self.assertIsNotNone(parto.recien_nacidos.first())
+
+    def test_for_export_returns_flat_rows(self):
+        from .models import Parto
+        from .excel_export import registrado_por
+        with self.assertNumQueries(1):
+            rows = list(Parto.objects.for_export())
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(registrado_por(rows[0]), 'Ana Matrona')
+        self.assertEqual(rows[0]['madre__nombres'], 'Madre0')
+
+
+class RemEngineTests(TestCase):
+    """The REM engine computes every section from one grouped query per source."""
+    def setUp(self):
+        from .models import Parto, RecienNacido
+        from django.utils import timezone
+        tz = timezone.get_current_timezone()
+        self.dia = date(2025, 3, 10)
+        fecha_hora = timezone.make_aware(datetime(2025, 3, 10, 12, 0), tz)
+        # (fecha_nacimiento, tipo_parto, tipo_anestesia, estado RN)
+        casos = [
+            (date(2010, 3, 11), 'vaginal', 'ninguna', 'vivo'),      # 14 años (cumple mañana)
+            (date(2010, 3, 10), 'vaginal', 'epidural', 'vivo'),     # 15 años (cumple hoy)
+            (date(1995, 1, 1), 'cesarea', 'raquidea', 'fallecido'),  # 30 años
+            (date(1980, 6, 1), 'forceps', 'epidural', 'vivo'),      # 44 años
+        ]
+        for i, (nacimiento, tipo, anestesia, estado) in enumerate(casos):
+            numero = 20000000 + i
+            madre = crear_madre(numero=numero, nombres=f'M{i}', apellidos='REM', fecha_nacimiento=nacimiento)
+            parto = Parto.objects.create(
+                madre=madre, fecha_hora=fecha_hora, tipo_parto=tipo,
+                semanas_gestacion=39, tipo_anestesia=anestesia,
+            )
+            RecienNacido.objects.create(
+                parto=parto, hora_nacimiento='12:10', sexo='M', peso='3.100', talla='49.0',
+                apgar_1=8, apgar_5=9, estado=estado,
+            )
+
+    def test_bs22_counts(self):
+        from .utils import GeneradorREM
+        datos = GeneradorREM(self.dia, self.dia, usar_snapshot=False).rem_bs22()
+        self.assertEqual(datos['total_partos'], 4)
+        self.assertEqual(datos['partos_por_tipo'], {'vaginal': 2, 'cesarea': 1, 'forceps': 1})
+        self.assertEqual(datos['partos_por_edad']['menor_15'], 1)
+        self.assertEqual(datos['partos_por_edad']['15_19'], 1)
+        self.assertEqual(datos['partos_por_edad']['30_34'], 1)
+        self.assertEqual(datos['partos_por_edad']['35_mas'], 1)
+        self.assertEqual(datos['anestesia']['epidural'], 2)
+
+    def test_all_sections_one_query_per_source(self):
+        from .utils import GeneradorREM
+        generador = GeneradorREM(self.dia, self.dia, usar_snapshot=False)
+        # Frontera del archivo + una consulta agrupada por fuente
+        with self.assertNumQueries(3):
+            datos = generador.calcular()
+            generador.rem_bs22(), generador.rem_a09(), generador.rem_a04()
+        self.assertEqual(set(datos), {'bs22', 'a09', 'a04'})
+        self.assertEqual(datos['a04']['defunciones_total'], 1)
+
+    def test_exportar_excel_renders_tables(self):
+        from io import BytesIO
+        from openpyxl import load_workbook
+        from .utils import GeneradorREM
+        contenido = GeneradorREM(self.dia, self.dia, usar_snapshot=False).exportar_excel()
+        libro = load_workbook(BytesIO(contenido))
+        self.assertEqual(libro.sheetnames, ['REM-BS22', 'REM-A09', 'REM-A04'])
+        filas = [f for f in libro['REM-BS22'].values if f and f[0] is not None]
+        self.assertIn(('Total partos', 4), [f[:2] for f in filas])
+        self.assertIn(('cesarea', 1), [f[:2] for f in filas])
+
+    def test_placeholder_section_runs_no_query(self):
+        from .utils import GeneradorREM
+        with self.assertNumQueries(0):
+            GeneradorREM(self.dia, self.dia, usar_snapshot=False).rem_a09()
+
+
+class RemSnapshotTests(TestCase):
+    """Closed-month REM reports are served from ReporteREMSnapshot until edited."""
+    def setUp(self):
+        from .models import Parto
+        from django.utils import timezone
+        tz = timezone.get_current_timezone()
+        self.madre = crear_madre(nombres='Snap', apellidos='Shot')
+        self.inicio, self.fin = date(2025, 1, 1), date(2025, 1, 31)
+        self.parto = Parto.objects.create(
+            madre=self.madre, fecha_hora=timezone.make_aware(datetime(2025, 1, 15, 8, 0), tz),
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='ninguna',
+        )
+
+    def test_closed_period_served_from_snapshot(self):
+        from .models import ReporteREMSnapshot
+        from .utils import GeneradorREM
+        with self.assertNumQueries(0):
+            generador = GeneradorREM(self.inicio, self.fin)
+        generador.calcular()
+        self.assertEqual(ReporteREMSnapshot.objects.count(), 1)
+        with self.assertNumQueries(1):
+            datos = GeneradorREM(self.inicio, self.fin).rem_bs22()
+        self.assertEqual(datos['total_partos'], 1)
+
+    def test_edit_in_range_invalidates_snapshot(self):
+        from .models import ReporteREMSnapshot
+        from .utils import GeneradorREM
+        GeneradorREM(self.inicio, self.fin).calcular()
+        GeneradorREM(date(2025, 2, 1), date(2025, 2, 28)).calcular()
+        self.parto.tipo_parto = 'cesarea'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parto.save()
+        self.assertEqual(
+            list(ReporteREMSnapshot.objects.values_list('fecha_inicio', flat=True)),
+            [date(2025, 2, 1)],
+        )
+        datos = GeneradorREM(self.inicio, self.fin).rem_bs22()
+        self.assertEqual(datos['partos_por_tipo']['cesarea'], 1)
+
+    def test_birth_date_change_invalidates_her_partos_days(self):
+        from django.utils import timezone
+        from . import snapshots
+        from .models import PartoArchivado, ReporteREMSnapshot
+        from .utils import fin_de_mes
+        tz = timezone.get_current_timezone()
+        archivado = timezone.make_aware(datetime(2025, 3, 5, 8, 0), tz)
+        PartoArchivado.objects.create(
+            id=self.parto.id + 100, madre=self.madre, fecha_hora=archivado,
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='ninguna',
+            created_at=archivado, updated_at=archivado,
+        )
+        for mes in (1, 2, 3):
+            snapshots.obtener(date(2025, mes, 1), fin_de_mes(date(2025, mes, 1)))
+        self.madre.direccion = 'Otra'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.madre.save()
+        self.assertEqual(ReporteREMSnapshot.objects.count(), 3)
+        self.madre.fecha_nacimiento = date(2008, 1, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.madre.save()
+        self.assertEqual(list(ReporteREMSnapshot.objects.values_list('fecha_inicio', flat=True)), [date(2025, 2, 1)])
+        datos = snapshots.obtener(self.inicio, self.fin).datos
+        self.assertEqual(datos['bs22']['partos_por_edad']['15_19'], 1)
+
+    def test_only_whole_months_stored_and_invalid_type_computes_nothing(self):
+        from unittest import mock
+        from .models import ReporteREMSnapshot
+        from .utils import GeneradorREM
+        datos = GeneradorREM(date(2025, 1, 5), date(2025, 1, 20)).rem_bs22()
+        self.assertEqual(datos['total_partos'], 1)
+        self.assertFalse(ReporteREMSnapshot.objects.exists())
+
+        get_user_model().objects.create_user('rem', 'r@example.test', 'pw')
+        self.client.login(username='rem', password='pw')
+        with mock.patch('registros.rem.generar') as generar:
+            response = self.client.post(reverse('registros:reporte_rem'), {
+                'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-01-31', 'tipo_reporte': 'otro'})
+            generar.assert_not_called()
+        self.assertContains(response, 'Tipo de reporte no válido')
+        self.assertFalse(ReporteREMSnapshot.objects.exists())
+
+    def test_open_period_not_cached(self):
+        from django.utils import timezone
+        from .models import ReporteREMSnapshot
+        from .utils import GeneradorREM
+        hoy = timezone.localdate()
+        GeneradorREM(hoy.replace(day=1), hoy).rem_bs22()
+        self.assertFalse(ReporteREMSnapshot.objects.exists())
+
+
+class GenerarRemCommandTests(TestCase):
+    def test_serial_run_writes_one_row_per_month(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from django.utils import timezone
+        from openpyxl import load_workbook
+        from .models import Parto
+        madre = crear_madre(nombres='Batch', apellidos='REM')
+        Parto.objects.create(
+            madre=madre, fecha_hora=timezone.make_aware(datetime(2025, 2, 14, 9, 0)),
+            tipo_parto='cesarea', semanas_gestacion=39, tipo_anestesia='raquidea',
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            salida = os.path.join(tmp, 'rem.xlsx')
+            call_command('generar_rem', desde='2025-01', hasta='2025-03', workers=1, salida=salida, stdout=open(os.devnull, 'w'))
+            libro = load_workbook(salida)
+            self.assertEqual(libro.sheetnames, ['REM-BS22', 'REM-A09', 'REM-A04'])
+            filas = list(libro['REM-BS22'].values)
+        self.assertEqual([f[0] for f in filas[1:]], ['2025-01', '2025-02', '2025-03'])
+        total = filas[0].index('total_partos')
+        self.assertEqual([f[total] for f in filas[1:]], [0, 1, 0])
+
+    def test_comparar_times_both_runs_without_snapshots(self):
+        import os
+        import tempfile
+        from unittest import mock
+        from django.core.management import call_command
+        from .management.commands import generar_rem
+        from .models import ReporteREMSnapshot
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(generar_rem, '_generar_mes', wraps=generar_rem._generar_mes) as generar:
+            call_command('generar_rem', desde='2024-01', hasta='2024-02', workers=1, comparar=True,
+                         salida=os.path.join(tmp, 'rem.xlsx'), stdout=open(os.devnull, 'w'))
+        self.assertEqual(generar.call_count, 4)
+        self.assertEqual({llamada.args[0][2] for llamada in generar.call_args_list}, {False})
+        self.assertFalse(ReporteREMSnapshot.objects.exists())
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        from .models import Parto, RecienNacido
+        from django.utils import timezone
+        User = get_user_model()
+        self.user = User.objects.create_user('stream', 's@example.test', 'pw')
+        self.client.login(username='stream', password='pw')
+        for i, numero in enumerate((11111111, 22222222, 33333333)):
+            madre = crear_madre(numero=numero, nombres=f'Madre{i}', apellidos='Stream')
+            parto = Parto.objects.create(
+                madre=madre, fecha_hora=timezone.make_aware(datetime(2025, 3, 10 + i, 12, 0)),
+                tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='ninguna',
+                observaciones='línea, con "comillas"', created_by=self.user,
+            )
+            RecienNacido.objects.create(
+                parto=parto, hora_nacimiento='12:10', sexo='F', peso='3.200', talla='50.0',
+                apgar_1=8, apgar_5=9,
+            )
+        self.url = reverse('registros:exportar_partos')
+
+    def _contenido(self, resp):
+        return b''.join(resp.streaming_content)
+
+    def test_csv_partos_in_range(self):
+        import csv
+        import io
+        resp = self.client.get(self.url, {'format': 'csv', 'start': '2025-03-11', 'end': '2025-03-12'})
+        self.assertEqual(resp.status_code, 200)
+        filas = list(csv.reader(io.StringIO(self._contenido(resp).decode('utf-8'))))
+        self.assertEqual(filas[0][:4], ['id', 'madre_id', 'rut_madre', 'fecha_hora'])
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[1][8], 'línea, con "comillas"')
+
+    def test_ndjson_newborns_across_batches(self):
+        import json
+        from unittest import mock
+        with mock.patch('registros.stream_export.TAMANO_LOTE', 2):
+            resp = self.client.get(self.url, {'format': 'ndjson', 'dataset': 'recien_nacidos'})
+            lineas = self._contenido(resp).decode('utf-8').splitlines()
+        self.assertEqual(len(lineas), 3)
+        self.assertEqual(json.loads(lineas[0])['apgar_5'], 9)
+
+    def test_gzip_stream(self):
+        import gzip
+        resp = self.client.get(self.url, {'format': 'csv', 'dataset': 'madres', 'gzip': '1'})
+        self.assertEqual(resp['Content-Type'], 'application/gzip')
+        texto = gzip.decompress(self._contenido(resp)).decode('utf-8')
+        self.assertEqual(len(texto.splitlines()), 4)
+
+    def test_header_sent_before_querying(self):
+        from .stream_export import respuesta_streaming
+        resp = respuesta_streaming('partos', 'csv')
+        with self.assertNumQueries(0):
+            primera = next(iter(resp.streaming_content))
+        self.assertTrue(primera.startswith(b'id,madre_id,rut_madre'))
+
+
+class DeltaExportTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        patcher = mock.patch('registros.delta.MARGEN', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        User = get_user_model()
+        User.objects.create_user('delta', 'd@example.test', 'pw')
+        self.client.login(username='delta', password='pw')
+        self.madre = crear_madre(nombres='Delta', apellidos='Sync')
+        self.parto = Parto.objects.create(
+            madre=self.madre, fecha_hora=timezone.now() - timedelta(hours=1),
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='ninguna',
+        )
+        self.rn = RecienNacido.objects.create(
+            parto=self.parto, hora_nacimiento='10:00', sexo='F', peso='3.200', talla='50.0',
+            apgar_1=8, apgar_5=9,
+        )
+        self.url = reverse('registros:exportar_delta')
+
+    def test_full_then_incremental_pull(self):
+        datos = self.client.get(self.url).json()
+        self.assertEqual(len(datos['madres']), 1)
+        self.assertEqual(len(datos['partos']), 1)
+        self.assertEqual(len(datos['recien_nacidos']), 1)
+
+        vacio = self.client.get(self.url, {'desde': datos['watermark']}).json()
+        self.assertEqual(vacio['partos'], [])
+        self.assertEqual(vacio['madres'], [])
+
+        self.parto.observaciones = 'editado'
+        self.parto.save()
+        cambio = self.client.get(self.url, {'desde': vacio['watermark']}).json()
+        self.assertEqual([p['observaciones'] for p in cambio['partos']], ['editado'])
+        self.assertEqual(cambio['recien_nacidos'], [])
+
+    def test_deletions_reported_as_tombstones(self):
+        watermark = self.client.get(self.url).json()['watermark']
+        esperados = {('madres', self.madre.id), ('partos', self.parto.id), ('recien_nacidos', self.rn.id)}
+        self.madre.delete()
+        datos = self.client.get(self.url, {'desde': watermark}).json()
+        self.assertEqual({(e['modelo'], e['id']) for e in datos['eliminados']}, esperados)
+
+    def test_deleting_archived_rows_reports_tombstones(self):
+        from django.utils import timezone
+        from . import archivo
+        from .models import PartoArchivado
+        archivo.archivar(timezone.now())
+        watermark = self.client.get(self.url).json()['watermark']
+        PartoArchivado.objects.get(id=self.parto.id).delete()
+        datos = self.client.get(self.url, {'desde': watermark}).json()
+        self.assertEqual({(e['modelo'], e['id']) for e in datos['eliminados']},
+                         {('partos', self.parto.id), ('recien_nacidos', self.rn.id)})
+
+        # Al borrar la madre, la cascada sobre el archivo también deja lápidas
+        archivado = PartoArchivado.objects.create(
+            id=self.parto.id + 100, madre=self.madre, fecha_hora=self.parto.fecha_hora,
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='ninguna',
+            created_at=self.parto.created_at, updated_at=self.parto.updated_at,
+        )
+        watermark, madre_id = datos['watermark'], self.madre.id
+        self.madre.delete()
+        datos = self.client.get(self.url, {'desde': watermark}).json()
+        self.assertEqual({(e['modelo'], e['id']) for e in datos['eliminados']},
+                         {('madres', madre_id), ('partos', archivado.id)})
+
+    def test_paging_with_limit(self):
+        datos = self.client.get(self.url, {'limite': 1}).json()
+        self.assertTrue(datos['hay_mas'])
+        siguiente = self.client.get(self.url, {'desde': datos['watermark'], 'limite': 1}).json()
+        self.assertEqual(siguiente['partos'], [])
+
+    def test_invalid_watermark(self):
+        resp = self.client.get(self.url, {'desde': 'no-es-valido'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_watermark_that_is_not_an_object(self):
+        import base64
+        for contenido in (b'[1]', b'1', b'"x"', b'null'):
+            watermark = base64.urlsafe_b64encode(contenido).decode()
+            resp = self.client.get(self.url, {'desde': watermark})
+            self.assertEqual(resp.status_code, 400, contenido)
+
+
+class AnalyticsSnapshotTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        madre = crear_madre(
+            nombres='Col', apellidos='Umnar', fecha_nacimiento=date(1990, 5, 4), estado_civil='casada',
+            prevision='isapre',
+        )
+        for tipo, peso in (('vaginal', '3.250'), ('cesarea', '2.400')):
+            parto = Parto.objects.create(
+                madre=madre, fecha_hora=timezone.make_aware(datetime(2025, 3, 10, 12, 0)),
+                tipo_parto=tipo, semanas_gestacion=38, tipo_anestesia='epidural',
+            )
+            RecienNacido.objects.create(
+                parto=parto, hora_nacimiento='12:10', sexo='M', peso=peso, talla='49.5',
+                apgar_1=8, apgar_5=9,
+            )
+
+    def test_npy_roundtrip_is_memory_mapped(self):
+        import os
+        import tempfile
+        import numpy as np
+        from django.core.management import call_command
+        from .analytics import cargar_snapshot
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command('snapshot_analytics', salida=tmp, formato='npy', stdout=open(os.devnull, 'w'))
+            snap = cargar_snapshot(tmp)
+            partos = snap.columnas['partos']
+            self.assertIsInstance(partos['tipo_parto'], np.memmap)
+            cats = snap.categorias['partos']['tipo_parto']
+            self.assertEqual(sorted(cats[c] for c in partos['tipo_parto']), ['cesarea', 'vaginal'])
+            self.assertEqual(partos['fecha_hora'][0], np.datetime64('2025-03-10T15:00:00'))
+            self.assertAlmostEqual(float(snap.columnas['recien_nacidos']['peso'].sum()), 5.65)
+            self.assertEqual(int(snap.columnas['recien_nacidos']['hora_nacimiento'][0]), 12 * 3600 + 600)
+            self.assertEqual(snap.categorias['madres']['prevision'][snap.columnas['madres']['prevision'][0]], 'isapre')
+            del snap, partos
+
+
+class IndicadoresCalidadTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        self.dia = date(2025, 3, 10)
+        fecha_hora = timezone.make_aware(datetime(2025, 3, 10, 12, 0))
+        # (fecha_nacimiento, tipo_parto, anestesia, semanas, [(peso, apgar_5)])
+        casos = [
+            (date(2008, 1, 1), 'vaginal', 'ninguna', 39, [('3.200', 9)]),             # 17 años
+            (date(1995, 1, 1), 'cesarea', 'raquidea', 39, [('2.300', 6)]),            # 30 años
+            (date(1994, 1, 1), 'cesarea', 'general', 34, [('2.100', 8), ('1.900', 6)]),  # 31 años, gemelar
+            (date(1988, 1, 1), 'vaginal', 'epidural', 39, [('3.600', 9)]),            # 37 años
+        ]
+        for i, (nacimiento, tipo, anestesia, semanas, rns) in enumerate(casos):
+            numero = 21000000 + i
+            madre = crear_madre(numero=numero, nombres=f'M{i}', apellidos='Ind', fecha_nacimiento=nacimiento)
+            parto = Parto.objects.create(
+                madre=madre, fecha_hora=fecha_hora, tipo_parto=tipo,
+                semanas_gestacion=semanas, tipo_anestesia=anestesia,
+            )
+            for peso, apgar_5 in rns:
+                RecienNacido.objects.create(
+                    parto=parto, hora_nacimiento='12:10', sexo='F', peso=peso, talla='47.0',
+                    apgar_1=7, apgar_5=apgar_5,
+                )
+
+    def test_indicadores(self):
+        from .indicadores import generar
+        datos = generar(self.dia, self.dia)
+        resumen = datos['resumen']
+        self.assertEqual((resumen['partos'], resumen['recien_nacidos']), (4, 5))
+        self.assertEqual(resumen['tasa_bajo_peso'], 60.0)
+        self.assertEqual(resumen['tasa_apgar5_menor_7'], 40.0)
+        self.assertEqual(resumen['tasa_cesarea'], 50.0)
+        self.assertEqual(datos['bajo_peso_por_semana'][34], {'nacidos': 2, 'bajo_peso': 2, 'tasa': 100.0})
+        self.assertEqual(datos['bajo_peso_por_semana'][39]['tasa'], 33.3)
+        self.assertEqual(datos['percentiles_peso_por_semana'][39]['p50'], 3.2)
+        self.assertEqual(datos['percentiles_peso_por_semana'][34]['p50'], 2.0)
+        self.assertEqual(datos['cesarea_por_edad']['30_34'], {'partos': 2, 'cesareas': 2, 'tasa': 100.0})
+        self.assertEqual(datos['cesarea_por_edad']['15_19']['tasa'], 0.0)
+        self.assertIsNone(datos['cesarea_por_edad']['menor_15']['tasa'])
+        self.assertEqual(datos['anestesia_por_tipo_parto']['cesarea']['general'], 1)
+        self.assertEqual(datos['anestesia_por_tipo_parto']['vaginal']['epidural'], 1)
+
+    def test_percentiles_match_numpy(self):
+        import numpy as np
+        from .indicadores import calcular
+        rng = np.random.default_rng(0)
+        n = 500
+        columnas = {
+            'peso': rng.normal(3.2, 0.5, n), 'apgar_5': rng.integers(0, 11, n).astype(np.int16),
+            'semanas_rn': rng.integers(30, 42, n).astype(np.int16),
+            'tipo_parto': np.zeros(0, dtype=np.int8), 'tipo_anestesia': np.zeros(0, dtype=np.int8),
+            'edad_madre': np.zeros(0, dtype=np.int16),
+        }
+        datos = calcular(columnas)
+        for semana, pct in datos['percentiles_peso_por_semana'].items():
+            pesos = columnas['peso'][columnas['semanas_rn'] == semana]
+            self.assertAlmostEqual(pct['p90'], round(float(np.percentile(pesos, 90)), 3))
+        self.assertIsNone(datos['resumen']['tasa_cesarea'])
+
+    def test_view_and_excel(self):
+        User = get_user_model()
+        User.objects.create_user(username='ind', password='pass')
+        client = Client()
+        client.login(username='ind', password='pass')
+        url = reverse('registros:indicadores_calidad')
+        response = client.post(url, {'fecha_inicio': '2025-03-10', 'fecha_fin': '2025-03-10', 'formato': 'web'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Cesárea por Edad Materna')
+        response = client.post(url, {'fecha_inicio': '2025-03-10', 'fecha_fin': '2025-03-10', 'formato': 'excel'})
+        self.assertIn('spreadsheetml', response['Content-Type'])
+
+
+class EstadisticasSeriesTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        cache.clear()
+        User = get_user_model()
+        User.objects.create_user(username='est', password='pass')
+        self.client = Client()
+        self.client.login(username='est', password='pass')
+        self.url = reverse('registros:estadisticas_series')
+        self.madre = crear_madre(nombres='Serie', apellidos='Temporal', estado_civil='casada', prevision='isapre')
+        # 23:30 local del 31/01 sigue siendo enero aunque en UTC ya sea febrero
+        casos = [
+            (datetime(2025, 1, 6, 10, 0), 'vaginal', '3.300', 9),
+            (datetime(2025, 1, 8, 10, 0), 'cesarea', '2.400', 6),
+            (datetime(2025, 1, 31, 23, 30), 'vaginal', '3.550', 9),
+            (datetime(2025, 2, 3, 9, 0), 'forceps', '3.000', 8),
+        ]
+        for fecha_hora, tipo, peso, apgar_5 in casos:
+            parto = Parto.objects.create(
+                madre=self.madre, fecha_hora=timezone.make_aware(fecha_hora),
+                tipo_parto=tipo, semanas_gestacion=39, tipo_anestesia='ninguna',
+            )
+            RecienNacido.objects.create(
+                parto=parto, hora_nacimiento='10:00', sexo='F', peso=peso, talla='49.0',
+                apgar_1=8, apgar_5=apgar_5,
+            )
+
+    def test_monthly_series_in_local_time(self):
+        response = self.client.get(self.url, {'granularidad': 'mes', 'desde': '2025-01-01', 'hasta': '2025-02-28'})
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual(datos['periodos'], ['2025-01-01', '2025-02-01'])
+        self.assertEqual(datos['partos'], {'vaginal': [2, 0], 'cesarea': [1, 0], 'forceps': [0, 1]})
+        self.assertEqual(sum(datos['peso']['conteos']), 4)
+        self.assertEqual(datos['peso']['conteos'][9], 1)   # 2,25-2,50 kg
+        self.assertEqual(datos['peso']['conteos'][13], 1)  # 3,25-3,50 kg
+        self.assertEqual(datos['peso']['conteos'][14], 1)  # 3,50-3,75 kg
+        self.assertEqual(datos['apgar_5'][9], 2)
+        self.assertEqual(datos['apgar_1'][8], 4)
+
+    def test_weekly_series_are_dense(self):
+        datos = self.client.get(self.url, {'granularidad': 'semana', 'desde': '2025-01-06', 'hasta': '2025-02-09'}).json()
+        self.assertEqual(datos['periodos'][0], '2025-01-06')
+        self.assertEqual(len(datos['periodos']), 5)
+        self.assertEqual(datos['partos']['vaginal'], [1, 0, 0, 1, 0])
+        self.assertEqual(datos['partos']['forceps'], [0, 0, 0, 0, 1])
+
+    def test_cached_and_invalidated_on_new_parto(self):
+        from unittest import mock
+        from django.utils import timezone
+        from . import estadisticas
+        from .models import Parto
+        params = {'granularidad': 'mes', 'desde': '2025-01-01', 'hasta': '2025-02-28'}
+        self.client.get(self.url, params)
+        with mock.patch.object(estadisticas, 'calcular', wraps=estadisticas.calcular) as calcular:
+            self.client.get(self.url, params)
+            calcular.assert_not_called()
+        with self.captureOnCommitCallbacks(execute=True):
+            Parto.objects.create(
+                madre=self.madre, fecha_hora=timezone.make_aware(datetime(2025, 2, 10, 8, 0)),
+                tipo_parto='cesarea', semanas_gestacion=39, tipo_anestesia='raquidea',
+            )
+        datos = self.client.get(self.url, params).json()
+        self.assertEqual(datos['partos']['cesarea'], [1, 1])
+
+    def test_evicted_version_is_not_reused(self):
+        from django.core.cache import cache
+        from django.utils import timezone
+        from . import estadisticas
+        from .models import Parto
+        desde, hasta = date(2025, 1, 1), date(2025, 2, 28)
+        estadisticas.invalidar()
+        estadisticas.obtener('mes', desde, hasta)
+        # La clave de versión se expulsa mientras las series siguen en caché
+        cache.delete(f'{estadisticas.CACHE_PREFIJO}:version')
+        Parto.objects.create(
+            madre=self.madre, fecha_hora=timezone.make_aware(datetime(2025, 2, 10, 8, 0)),
+            tipo_parto='cesarea', semanas_gestacion=39, tipo_anestesia='raquidea',
+        )
+        estadisticas.invalidar()
+        self.assertEqual(estadisticas.obtener('mes', desde, hasta)['partos']['cesarea'], [1, 1])
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get(self.url, {'granularidad': 'hora'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'desde': '2025-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'desde': '2025-02-01', 'hasta': '2025-01-01'}).status_code, 400)
+
+
+class TableroEnVivoTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username='tablero', password='pass', first_name='Ana', last_name='Matrona')
+        self.madre = crear_madre(nombres='Viva', apellidos='Tablero', estado_civil='casada', prevision='isapre')
+
+    def test_signals_publish_after_commit(self):
+        from unittest import mock
+        from django.utils import timezone
+        from . import eventos
+        from .models import Parto
+        canal = eventos.Canal()
+        # Una pantalla conectada
+        with mock.patch.object(eventos, 'tablero', canal), mock.patch.object(eventos.Canal, 'suscriptores', 1):
+            with self.captureOnCommitCallbacks(execute=True):
+                parto = Parto.objects.create(
+                    madre=self.madre, fecha_hora=timezone.now(), tipo_parto='vaginal',
+                    semanas_gestacion=39, tipo_anestesia='ninguna', created_by=self.user,
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                parto.tipo_parto = 'cesarea'
+                parto.save()
+            parto_id = parto.id
+            with self.captureOnCommitCallbacks(execute=True):
+                parto.delete()
+        eventos_publicados = canal.pendientes()
+        self.assertEqual([e[2]['accion'] for e in eventos_publicados], ['creado', 'editado', 'eliminado'])
+        creado = eventos_publicados[0][2]
+        self.assertEqual(creado['id'], parto_id)
+        self.assertEqual(creado['madre'], 'Viva Tablero')
+        self.assertEqual(creado['registrado_por'], 'Ana Matrona')
+        self.assertEqual(creado['detalle_url'], reverse('registros:detalle_parto', args=[parto_id]))
+
+    def test_publish_reads_listing_row_only_with_subscribers(self):
+        from unittest import mock
+        from django.utils import timezone
+        from . import eventos
+        from .models import Parto
+        parto = Parto.objects.create(
+            madre=self.madre, fecha_hora=timezone.now(), tipo_parto='vaginal',
+            semanas_gestacion=39, tipo_anestesia='ninguna', created_by=self.user,
+        )
+        canal = eventos.Canal()
+        with mock.patch.object(eventos, 'tablero', canal):
+            # Nadie escuchando: ni consulta ni evento
+            with self.assertNumQueries(0):
+                self.assertIsNone(eventos.publicar_parto(parto.id, 'editado'))
+            self.assertEqual(canal.pendientes(), [])
+            with mock.patch.object(eventos.Canal, 'suscriptores', 1), self.assertNumQueries(1) as consultas:
+                eventos.publicar_parto(parto.id, 'editado')
+        self.assertNotIn('JOIN', consultas.captured_queries[0]['sql'])
+        self.assertEqual(canal.pendientes()[0][2]['rut'], self.madre.rut)
+
+    async def test_stream_delivers_events_from_other_threads(self):
+        import asyncio
+        import threading
+        from . import eventos
+        canal = eventos.Canal()
+        flujo = eventos.flujo_sse(canal=canal)
+        self.assertEqual(await anext(flujo), f'retry: {eventos.REINTENTO_MS}\n\n')
+        siguiente = asyncio.ensure_future(anext(flujo))
+        await asyncio.sleep(0)
+        self.assertEqual(canal.suscriptores, 1)
+        threading.Thread(target=canal.publicar, args=('parto', {'accion': 'creado', 'id': 7})).start()
+        texto = await asyncio.wait_for(siguiente, 1)
+        self.assertTrue(texto.startswith('id: 1\nevent: parto\ndata: '))
+        self.assertIn('"id": 7', texto)
+        await flujo.aclose()
+        self.assertEqual(canal.suscriptores, 0)
+
+    async def test_reconnect_replays_missed_events(self):
+        from . import eventos
+        canal = eventos.Canal()
+        for i in range(3):
+            canal.publicar('parto', {'accion': 'creado', 'id': i})
+        flujo = eventos.flujo_sse(ultimo_id=2, canal=canal)
+        await anext(flujo)
+        self.assertTrue((await anext(flujo)).startswith('id: 3\n'))
+        await flujo.aclose()
+
+    async def test_endpoint_streams_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('registros:eventos_partos'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        contenido = response.streaming_content
+        self.assertTrue((await anext(contenido)).startswith(b'retry:'))
+        await contenido.aclose()
+
+    def test_endpoint_not_available_under_wsgi(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('registros:eventos_partos')).status_code, 204)
+
+
+class ArchivoPartosTests(TestCase):
+    """Old partos move to the archive tables and stay readable."""
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        self.user = get_user_model().objects.create_user('archivo', 'a@example.test', 'pw')
+        self.client.login(username='archivo', password='pw')
+        self.madre = crear_madre(numero=23000000, nombres='Ana', apellidos='Archivo')
+        tz = timezone.get_current_timezone()
+        self.dia_viejo = date(2020, 5, 4)
+        self.viejo = Parto.objects.create(
+            madre=self.madre, fecha_hora=timezone.make_aware(datetime(2020, 5, 4, 10, 0), tz),
+            tipo_parto='cesarea', semanas_gestacion=38, tipo_anestesia='raquidea', created_by=self.user,
+        )
+        RecienNacido.objects.create(
+            parto=self.viejo, hora_nacimiento='10:05', sexo='F', peso='2.400', talla='46.0',
+            apgar_1=8, apgar_5=9,
+        )
+        self.reciente = Parto.objects.create(
+            madre=self.madre, fecha_hora=timezone.now() - timedelta(days=3),
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural', created_by=self.user,
+        )
+
+    def _archivar(self):
+        from django.utils import timezone
+        from . import archivo
+        return archivo.archivar(timezone.now() - timedelta(days=365), lote=1)
+
+    def test_archivar_moves_old_rows_without_tombstones(self):
+        from decimal import Decimal
+        from .models import Parto, PartoArchivado, RecienNacido, RegistroEliminado
+        self.assertEqual(self._archivar(), (1, 1))
+        self.assertEqual(list(Parto.objects.values_list('id', flat=True)), [self.reciente.id])
+        self.assertFalse(RecienNacido.objects.exists())
+        archivado = PartoArchivado.objects.get(id=self.viejo.id)
+        self.assertEqual(archivado.created_at, self.viejo.created_at)
+        self.assertEqual(archivado.recien_nacidos.get().peso, Decimal('2.400'))
+        self.assertFalse(RegistroEliminado.objects.exists())
+        self.assertEqual(self._archivar(), (0, 0))
+
+    def test_detalle_reads_archive_read_only(self):
+        self._archivar()
+        response = self.client.get(reverse('registros:detalle_parto', args=[self.viejo.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Archivado')
+        self.assertNotContains(response, reverse('registros:editar_parto', args=[self.viejo.id]))
+        self.assertEqual(self.client.get(reverse('registros:editar_parto', args=[self.viejo.id])).status_code, 404)
+
+    def test_reports_union_archive_only_when_range_reaches_it(self):
+        from django.utils import timezone
+        from . import archivo, rem
+        self._archivar()
+        self.assertEqual(len(archivo.tablas(self.dia_viejo, self.dia_viejo)), 2)
+        self.assertEqual(len(archivo.tablas(timezone.localdate() - timedelta(days=30), timezone.localdate())), 1)
+
+        datos = rem.generar(self.dia_viejo, self.dia_viejo)
+        self.assertEqual(datos['bs22']['total_partos'], 1)
+        self.assertEqual(datos['bs22']['partos_por_tipo']['cesarea'], 1)
+        datos = rem.generar(date(2020, 1, 1), timezone.localdate())
+        self.assertEqual(datos['bs22']['total_partos'], 2)
+
+    def test_streaming_export_analytics_and_delta_read_archive(self):
+        import csv
+        import io
+        from unittest import mock
+        from . import analytics
+        self._archivar()
+        url = reverse('registros:exportar_partos')
+
+        resp = self.client.get(url, {'format': 'csv'})
+        ids = [int(f[0]) for f in list(csv.reader(io.StringIO(b''.join(resp.streaming_content).decode())))[1:]]
+        self.assertEqual(sorted(ids), sorted([self.viejo.id, self.reciente.id]))
+        resp = self.client.get(url, {'format': 'csv', 'dataset': 'madres',
+                                     'start': self.dia_viejo.isoformat(), 'end': self.dia_viejo.isoformat()})
+        self.assertEqual(len(b''.join(resp.streaming_content).decode().splitlines()), 2)
+
+        columnas, _ = analytics.leer_columnas('partos')
+        self.assertEqual(sorted(columnas['id']), sorted([self.viejo.id, self.reciente.id]))
+        self.assertEqual(len(analytics.leer_columnas('recien_nacidos')[0]['peso']), 1)
+
+        with mock.patch('registros.delta.MARGEN', timedelta(0)):
+            datos = self.client.get(reverse('registros:exportar_delta'), {'limite': 1}).json()
+            vistos = [p['id'] for p in datos['partos']]
+            while datos['hay_mas']:
+                datos = self.client.get(reverse('registros:exportar_delta'),
+                                        {'desde': datos['watermark'], 'limite': 1}).json()
+                vistos += [p['id'] for p in datos['partos']]
+        self.assertEqual(sorted(vistos), sorted([self.viejo.id, self.reciente.id]))
+
+    def test_analytics_counts_each_table_on_its_own(self):
+        from unittest import mock
+        from django.utils import timezone
+        from . import analytics
+        from .models import Parto, PartoArchivado
+        self._archivar()
+
+        def modelos(modelo):
+            yield Parto
+            # Un parto nuevo llega después de leer la tabla caliente
+            Parto.objects.create(
+                madre=self.madre, fecha_hora=timezone.now(), tipo_parto='vaginal',
+                semanas_gestacion=39, tipo_anestesia='epidural', created_by=self.user,
+            )
+            yield PartoArchivado
+
+        with mock.patch('registros.archivo.modelos', modelos):
+            columnas, _ = analytics.leer_columnas('partos')
+        self.assertEqual(list(columnas['id']), [self.reciente.id, self.viejo.id])
+
+    def test_archivar_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import PartoArchivado
+        salida = StringIO()
+        call_command('archivar_partos', '--dias', '365', '--dry-run', stdout=salida)
+        self.assertIn('1 partos', salida.getvalue())
+        self.assertFalse(PartoArchivado.objects.exists())
+        call_command('archivar_partos', '--dias', '365', stdout=StringIO())
+        self.assertTrue(PartoArchivado.objects.filter(id=self.viejo.id).exists())
+
+
+class ListadoPartosTests(TestCase):
+    """lista_partos reads the flat FilaListadoParto table kept in sync by signals."""
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        self.user = get_user_model().objects.create_user(
+            'listado', 'l@example.test', 'pw', first_name='Eva', last_name='Matrona')
+        self.client.login(username='listado', password='pw')
+        self.madre = crear_madre(
+            numero=24000000, nombres='Rosa', apellidos='Listado', fecha_nacimiento=date(1990, 6, 15),
+        )
+        self.parto = Parto.objects.create(
+            madre=self.madre, fecha_hora=timezone.make_aware(datetime(2025, 6, 14, 10, 0)),
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural', created_by=self.user,
+        )
+        for hora in ('10:05', '10:07'):
+            RecienNacido.objects.create(
+                parto=self.parto, hora_nacimiento=hora, sexo='F', peso='3.100', talla='49.0',
+                apgar_1=8, apgar_5=9,
+            )
+
+    def _fila(self):
+        from .models import FilaListadoParto
+        return FilaListadoParto.objects.get(parto=self.parto)
+
+    def test_row_follows_signals(self):
+        fila = self._fila()
+        self.assertEqual((fila.madre_nombres, fila.madre_edad, fila.registrado_por, fila.recien_nacidos),
+                         ('Rosa', 34, 'Eva Matrona', 2))
+        self.parto.recien_nacidos.first().delete()
+        self.madre.apellidos = 'Cambiado'
+        self.madre.save()
+        self.user.first_name = 'Eve'
+        self.user.save()
+        fila = self._fila()
+        self.assertEqual((fila.madre_apellidos, fila.registrado_por, fila.recien_nacidos),
+                         ('Cambiado', 'Eve Matrona', 1))
+        self.parto.delete()
+        from .models import FilaListadoParto
+        self.assertFalse(FilaListadoParto.objects.exists())
+
+    def test_listing_and_search_never_join(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('registros:lista_partos'), {'q': 'listado'})
+        self.assertContains(response, 'Rosa Listado')
+        self.assertContains(response, 'Eva Matrona')
+        listado = [q['sql'] for q in consultas.captured_queries if 'registros_filalistadoparto' in q['sql']]
+        self.assertTrue(listado)
+        self.assertFalse([sql for sql in listado if 'JOIN' in sql])
+
+    def test_reconstruir_restores_rows(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import FilaListadoParto
+        FilaListadoParto.objects.all().delete()
+        call_command('reconstruir_listado', stdout=StringIO())
+        self.assertEqual(self._fila().recien_nacidos, 2)
+
+
+class BusquedaClinicaTests(TestCase):
+    """Free-text search over clinical notes through the DB inverted index."""
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        self.user = get_user_model().objects.create_user('busqueda', 'b@example.test', 'pw')
+        self.client.login(username='busqueda', password='pw')
+        self.madre = crear_madre(numero=25000000, nombres='Inés', apellidos='Búsqueda')
+        datos = dict(madre=self.madre, tipo_parto='cesarea', semanas_gestacion=37,
+                     tipo_anestesia='raquidea', created_by=self.user)
+        self.severa = Parto.objects.create(
+            fecha_hora=timezone.make_aware(datetime(2025, 3, 10, 8, 0)),
+            complicaciones='Preeclámpsia SEVERA con rotura prematura de membranas', **datos)
+        self.distocia = Parto.objects.create(
+            fecha_hora=timezone.make_aware(datetime(2025, 4, 2, 9, 0)),
+            complicaciones='Rotura de membranas.', observaciones='Distocias de hombro', **datos)
+        self.rn = RecienNacido.objects.create(
+            parto=self.distocia, hora_nacimiento='09:05', sexo='M', peso='3.900', talla='51.0',
+            apgar_1=6, apgar_5=8, observaciones='Fractura de clavícula',
+        )
+
+    def _buscar(self, texto, campos=None):
+        from . import busqueda
+        return {parto_id for _, parto_id, _ in busqueda.buscar_partos(texto, campos)}
+
+    def test_analysis_folds_accents_stems_and_drops_stopwords(self):
+        from . import busqueda
+        self.assertEqual(busqueda.terminos('Distocias de HOMBRO'), [(0, 'distoci'), (2, 'hombr')])
+        self.assertEqual(busqueda.raiz('complicaciones'), busqueda.raiz(busqueda.plegar('Complicación')))
+        self.assertEqual(busqueda.plegar('Clavícula Ñ'), 'clavicula n')
+        self.assertEqual(busqueda.analizar_consulta('"rotura de membranas" severo'),
+                         [[(0, 'rotur'), (2, 'membran')], [(0, 'sever')]])
+
+    def test_terms_and_phrases(self):
+        self.assertEqual(self._buscar('preeclampsia'), {self.severa.id})
+        self.assertEqual(self._buscar('membrana'), {self.severa.id, self.distocia.id})
+        self.assertEqual(self._buscar('"rotura de membranas"'), {self.distocia.id})
+        self.assertEqual(self._buscar('severo preeclampsias'), {self.severa.id})
+        self.assertEqual(self._buscar('distocia clavicula'), {self.distocia.id})
+        self.assertEqual(self._buscar('de la'), set())
+        from .models import PosicionTermino
+        self.assertEqual(self._buscar('clavicula', [PosicionTermino.CAMPO_COMPLICACIONES]), set())
+
+    def test_index_follows_saves_and_deletes(self):
+        from .models import PosicionTermino
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.severa.tipo_anestesia = 'general'
+        with CaptureQueriesContext(connection) as consultas:
+            self.severa.save()
+        # Sin cambios en los textos no se reescribe el índice
+        self.assertFalse([q for q in consultas.captured_queries if 'registros_posiciontermino' in q['sql']])
+        self.severa.complicaciones = 'Hemorragia postparto'
+        self.severa.save()
+        self.assertEqual(self._buscar('preeclampsia'), set())
+        self.assertEqual(self._buscar('hemorragias'), {self.severa.id})
+        self.rn.observaciones = 'Sin hallazgos'
+        self.rn.save()
+        self.assertEqual(self._buscar('clavicula'), set())
+        self.distocia.delete()
+        self.assertFalse(PosicionTermino.objects.filter(parto_id=self.distocia.id).exists())
+
+    def test_archived_partos_stay_searchable(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from . import archivo, busqueda
+        from .models import PosicionTermino
+        archivo.archivar(timezone.now(), lote=10)
+        PosicionTermino.objects.all().delete()
+        call_command('reindexar_busqueda', stdout=StringIO())
+        partos = busqueda.cargar(busqueda.buscar_partos('clavicula'))
+        self.assertEqual([p.id for p in partos], [self.distocia.id])
+        self.assertTrue(partos[0].archivado)
+        self.assertEqual(busqueda.buscar_partos('clavicula', fecha_inicio=date(2025, 4, 3)).count(), 0)
+
+    def test_view_filters_and_highlights(self):
+        url = reverse('registros:busqueda_clinica')
+        response = self.client.get(url, {'q': 'membranas'})
+        self.assertContains(response, '2 partos encontrados')
+        self.assertContains(response, 'de <mark>membranas</mark>', html=False)
+        response = self.client.get(url, {'q': 'membranas', 'fecha_inicio': '2025-04-01', 'fecha_fin': '2025-04-30'})
+        self.assertContains(response, '1 parto encontrado')
+        self.assertContains(response, 'Inés Búsqueda')
+        response = self.client.get(url, {'q': 'clavícula', 'campo': '3'})
+        self.assertContains(response, '<mark>clavícula</mark>', html=False)
+        response = self.client.get(url, {'q': 'x', 'fecha_inicio': 'mal'})
+        self.assertContains(response, 'Error en el formato de las fechas')
+
+    def test_pages_in_sql_across_hot_and_archive(self):
+        from django.core.paginator import Paginator
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from . import archivo, busqueda
+        from .models import Parto
+        partos = [
+            Parto.objects.create(
+                madre=self.madre, fecha_hora=timezone.make_aware(datetime(2025, 1, 1, 8, 0)) + timedelta(days=i),
+                tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural',
+                complicaciones='Hemorragia postparto leve', created_by=self.user,
+            )
+            for i in range(23)
+        ]
+        archivo.archivar(partos[10].fecha_hora)
+        esperados = [p.id for p in reversed(partos)]
+
+        claves = busqueda.buscar_partos('"hemorragia postparto"')
+        with CaptureQueriesContext(connection) as consultas:
+            pagina = Paginator(claves, 20).page(2)
+            segunda = busqueda.cargar(pagina.object_list)
+        self.assertEqual(pagina.paginator.count, 23)
+        self.assertEqual([p.id for p in segunda], esperados[20:])
+        self.assertEqual([p.archivado for p in segunda], [True] * 3)
+        sql = [q['sql'] for q in consultas.captured_queries]
+        self.assertTrue(any('OFFSET 20' in s and 'UNION ALL' in s for s in sql))
+        self.assertEqual([p.id for p in busqueda.cargar(claves[:20])], esperados[:20])
+        self.assertEqual(busqueda.buscar_partos('"postparto hemorragia"').count(), 0)
+
+        response = self.client.get(reverse('registros:busqueda_clinica'), {'q': 'hemorragia', 'page': '2'})
+        self.assertContains(response, '23 partos encontrados')
+        self.assertContains(response, 'Página 2 de 2')
+
+
+class ComplicacionesCodificadasTests(TestCase):
+    """CIE-10 catalog: dictionary backfill, picker and GROUP BY counts."""
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Parto
+        self.madre = crear_madre(
+            numero=26000000, nombres='Olga', apellidos='Codigo', fecha_nacimiento=date(1992, 1, 1),
+        )
+        datos = dict(madre=self.madre, tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural')
+        self.dia = date(2025, 5, 20)
+        fecha_hora = timezone.make_aware(datetime(2025, 5, 20, 10, 0))
+        self.severa = Parto.objects.create(
+            fecha_hora=fecha_hora, complicaciones='Preeclámpsia severa con RPM de 20 horas', **datos)
+        self.hombros = Parto.objects.create(
+            fecha_hora=fecha_hora, complicaciones='Sin preeclampsia. Distocia de hombros resuelta', **datos)
+        self.viejo = Parto.objects.create(
+            fecha_hora=timezone.make_aware(datetime(2019, 1, 5, 10, 0)),
+            complicaciones='Hemorragia post parto', **datos)
+
+    def _codigos(self, parto):
+        return set(parto.complicaciones_codificadas.values_list('codigo', flat=True))
+
+    def test_catalog_seeded_and_dictionary_matching(self):
+        from .complicaciones import Diccionario
+        from .models import Complicacion
+        self.assertTrue(Complicacion.objects.filter(codigo='O14.1').exists())
+        diccionario = Diccionario(Complicacion.objects.all())
+        codigos = dict(Complicacion.objects.values_list('id', 'codigo'))
+        encontrar = lambda texto: {codigos[c] for c in diccionario.codigos(texto)}
+        # La expresión más larga gana y las negaciones se descartan
+        self.assertEqual(encontrar('Preeclampsia SEVERA, rotura de membranas'), {'O14.1', 'O42.9'})
+        self.assertEqual(encontrar('sin preeclampsia; distocias de hombro'), {'O66.0'})
+        self.assertEqual(encontrar('se descarta DPPNI'), set())
+
+    def test_backfill_is_additive_and_covers_archive(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from . import archivo
+        from .models import Complicacion, PartoArchivado
+        manual = Complicacion.objects.get(codigo='O75.2')
+        self.severa.complicaciones_codificadas.add(manual)
+        archivo.archivar(timezone.make_aware(datetime(2020, 1, 1)))
+        salida = StringIO()
+        call_command('codificar_complicaciones', '--dry-run', stdout=salida)
+        self.assertIn('3 partos revisados, 3 con coincidencias (4 asociaciones)', salida.getvalue())
+        self.assertEqual(self._codigos(self.severa), {'O75.2'})
+        call_command('codificar_complicaciones', '--lote', '1', stdout=StringIO())
+        call_command('codificar_complicaciones', stdout=StringIO())
+        self.assertEqual(self._codigos(self.severa), {'O14.1', 'O42.9', 'O75.2'})
+        self.assertEqual(self._codigos(self.hombros), {'O66.0'})
+        self.assertEqual(self._codigos(PartoArchivado.objects.get(id=self.viejo.id)), {'O72.1'})
+
+    def test_counts_group_by_in_range(self):
+        from . import complicaciones
+        from .indicadores import generar
+        complicaciones.codificar()
+        with self.assertNumQueries(3):
+            filas = complicaciones.conteos(self.dia, self.dia)
+        self.assertEqual([f['codigo'] for f in filas], ['O14.1', 'O42.9', 'O66.0'])
+        self.assertEqual(filas[0]['partos'], 1)
+        datos = generar(self.dia, self.dia)
+        self.assertEqual(datos['complicaciones'][0]['tasa'], 50.0)
+        self.assertEqual(sum(f['partos'] for f in complicaciones.conteos(date(2019, 1, 1), self.dia)), 4)
+
+    def test_picker_hides_inactive_unless_linked(self):
+        from .forms import PartoForm
+        from .models import Complicacion
+        retirada = Complicacion.objects.get(codigo='O48')
+        retirada.activa = False
+        retirada.save()
+        self.assertNotIn(retirada, PartoForm().fields['complicaciones_codificadas'].queryset)
+        self.severa.complicaciones_codificadas.add(retirada)
+        opciones = PartoForm(instance=self.severa).fields['complicaciones_codificadas'].queryset
+        self.assertIn(retirada, opciones)
+        self.assertNotIn(retirada, PartoForm(instance=self.hombros).fields['complicaciones_codificadas'].queryset)
+
+
+class DuplicadosMadresTests(TestCase):
+    """Blocking-based duplicate detection and bulk merge of madres."""
+    def setUp(self):
+        from django.utils import timezone
+        from .models import Parto
+
+        def madre(numero, nombres, apellidos, nacimiento, formato=True):
+            rut = str(numero) + Madre.calcular_dv(numero)
+            return crear_madre(
+                rut=format_rut(rut) if formato else f'{rut[:-1]}-{rut[-1]}', nombres=nombres,
+                apellidos=apellidos, fecha_nacimiento=nacimiento,
+            )
+        nacimiento = date(1991, 7, 3)
+        self.con_formato = madre(27000000, 'Camila Andrea', 'Soto Pérez', nacimiento)
+        self.sin_formato = madre(27000000, 'Camila Andrea', 'Soto Perez', nacimiento, formato=False)
+        self.typo = madre(27000011, 'Camila Andrae', 'Soto Pérez', nacimiento)
+        self.otra = madre(27000022, 'Javiera', 'Muñoz Rojas', nacimiento)
+        self.parto = Parto.objects.create(
+            madre=self.con_formato, fecha_hora=timezone.make_aware(datetime(2025, 2, 1, 8, 0)),
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural',
+        )
+
+    def _pares(self):
+        from .models import CandidatoDuplicado
+        return {(c.madre_a_id, c.madre_b_id): c.motivo for c in CandidatoDuplicado.objects.filter(estado='pendiente')}
+
+    def test_detects_rut_formats_and_name_typos_only_within_blocks(self):
+        from .duplicados import detectar, pares_por_nombre
+        a, b, c = self.con_formato.id, self.sin_formato.id, self.typo.id
+        self.assertEqual(detectar(), {'rut': 1, 'nombre': 3})
+        self.assertEqual(self._pares(), {(a, b): 'rut', (a, c): 'nombre', (b, c): 'nombre'})
+        # El cursor por (fecha_nacimiento, id) no depende del tamaño de lote
+        self.assertEqual(set(pares_por_nombre(lote=1)), set(pares_por_nombre()))
+
+    def test_fusionar_moves_partos_and_leaves_tombstone(self):
+        from .duplicados import fusionar
+        from .models import FilaListadoParto, RegistroEliminado
+        antes = self.parto.updated_at
+        self.assertEqual(fusionar(self.sin_formato.id, [self.con_formato.id]), 1)
+        self.parto.refresh_from_db()
+        self.assertEqual(self.parto.madre_id, self.sin_formato.id)
+        self.assertGreater(self.parto.updated_at, antes)
+        self.assertFalse(Madre.objects.filter(id=self.con_formato.id).exists())
+        self.assertTrue(RegistroEliminado.objects.filter(modelo='madres', objeto_id=self.con_formato.id).exists())
+        # Sin la otra ficha, la conservada toma el RUT con formato
+        self.sin_formato.refresh_from_db()
+        self.assertEqual(self.sin_formato.rut, format_rut('27000000' + Madre.calcular_dv(27000000)))
+        self.assertEqual(FilaListadoParto.objects.get(parto=self.parto).madre_rut, self.sin_formato.rut)
+
+    def test_fusionar_invalidates_days_of_archived_partos(self):
+        from django.utils import timezone
+        from . import snapshots
+        from .duplicados import fusionar
+        from .models import PartoArchivado, ReporteREMSnapshot
+        archivado = timezone.make_aware(datetime(2025, 3, 5, 8, 0))
+        PartoArchivado.objects.create(
+            id=self.parto.id + 100, madre=self.con_formato, fecha_hora=archivado,
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural',
+            created_at=archivado, updated_at=archivado,
+        )
+        for inicio, fin in ((date(2025, 2, 1), date(2025, 2, 28)), (date(2025, 3, 1), date(2025, 3, 31)),
+                            (date(2025, 4, 1), date(2025, 4, 30))):
+            snapshots.obtener(inicio, fin)
+        with self.captureOnCommitCallbacks(execute=True):
+            fusionar(self.sin_formato.id, [self.con_formato.id])
+        self.assertEqual(list(ReporteREMSnapshot.objects.values_list('fecha_inicio', flat=True)), [date(2025, 4, 1)])
+        self.assertEqual(PartoArchivado.objects.get().madre_id, self.sin_formato.id)
+
+    def test_review_view_requires_superusuario_and_remembers_discards(self):
+        from cuentas.models import Rol
+        from .duplicados import detectar
+        detectar()
+        User = get_user_model()
+        User.objects.create_user(username='matrona', password='pw')
+        self.client.login(username='matrona', password='pw')
+        url = reverse('registros:duplicados_madres')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertNotContains(self.client.get(reverse('cuentas:dashboard')), url)
+        User.objects.create_user(username='jefa', password='pw', rol=Rol.objects.create(nombre='superusuario'))
+        self.client.login(username='jefa', password='pw')
+        self.assertContains(self.client.get(reverse('cuentas:dashboard')), url)
+        self.assertContains(self.client.get(url), 'Camila Andrae')
+
+        from .models import CandidatoDuplicado
+        por_rut = CandidatoDuplicado.objects.get(motivo='rut')
+        self.client.post(url, {'candidato': por_rut.id, 'accion': 'conservar_a'})
+        self.assertFalse(Madre.objects.filter(id=self.sin_formato.id).exists())
+        restante = CandidatoDuplicado.objects.get()
+        self.client.post(url, {'candidato': restante.id, 'accion': 'descartar'})
+        detectar()
+        self.assertEqual(self._pares(), {})
+
+
+def datos_edicion(parto, **cambios):
+    """POST completo de editar_parto con los valores actuales del parto."""
+    from django.utils import timezone
+    rn = parto.recien_nacidos.first()
+    datos = {
+        'rut': parto.madre.rut, 'nombres': parto.madre.nombres, 'apellidos': parto.madre.apellidos,
+        'fecha_nacimiento': parto.madre.fecha_nacimiento.isoformat(), 'estado_civil': parto.madre.estado_civil,
+        'direccion': parto.madre.direccion, 'telefono': parto.madre.telefono, 'prevision': parto.madre.prevision,
+        'fecha_hora': timezone.localtime(parto.fecha_hora).strftime('%Y-%m-%dT%H:%M'),
+        'tipo_parto': parto.tipo_parto, 'semanas_gestacion': parto.semanas_gestacion,
+        'tipo_anestesia': parto.tipo_anestesia, 'complicaciones': parto.complicaciones,
+        'complicaciones_codificadas': list(parto.complicaciones_codificadas.values_list('id', flat=True)),
+        'observaciones': parto.observaciones,
+        'hora_nacimiento': rn.hora_nacimiento.strftime('%H:%M'), 'sexo': rn.sexo, 'peso': rn.peso,
+        'talla': rn.talla, 'apgar_1': rn.apgar_1, 'apgar_5': rn.apgar_5, 'estado': rn.estado,
+        'version_madre': parto.madre.updated_at.isoformat(), 'version_parto': parto.updated_at.isoformat(),
+    }
+    datos.update(cambios)
+    return datos
+
+
+class HistorialCambiosTests(TestCase):
+    """Field-level diffs written on edit and shown on the history page."""
+    def setUp(self):
+        from datetime import timezone as dt_timezone
+        from django.utils import timezone
+        from .models import Parto, RecienNacido
+        self.madre = crear_madre(
+            numero=28000001, nombres='Rosa', apellidos='Historia', fecha_nacimiento=date(1990, 3, 3),
+            direccion='Calle 1',
+        )
+        User = get_user_model()
+        self.user = User.objects.create_user(username='matrona', password='pw', first_name='Ana', last_name='Pino')
+        # editar_parto solo acepta partos de las últimas 48 horas
+        fecha_hora = timezone.localtime().replace(second=0, microsecond=0) - timedelta(hours=2)
+        self.parto = Parto.objects.create(
+            madre=self.madre, fecha_hora=fecha_hora,
+            tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural', created_by=self.user,
+        )
+        RecienNacido.objects.create(
+            # RecienNacido.clean compara la hora con fecha_hora en UTC
+            parto=self.parto, hora_nacimiento=fecha_hora.astimezone(dt_timezone.utc).time(), sexo='F',
+            peso='3.200', talla='49.0', apgar_1=8, apgar_5=9,
+        )
+        self.client.login(username='matrona', password='pw')
+
+    def test_edit_records_only_changed_fields_in_one_insert(self):
+        from unittest import mock
+        from .models import CambioRegistro, Complicacion
+        hellp = Complicacion.objects.get(codigo='O14.2')
+        url = reverse('registros:editar_parto', args=[self.parto.id])
+        bulk_create = mock.patch.object(
+            CambioRegistro.objects, 'bulk_create', wraps=CambioRegistro.objects.bulk_create)
+        with bulk_create as escritura:
+            respuesta = self.client.post(url, datos_edicion(
+                self.parto, direccion='Calle 2', tipo_parto='cesarea', complicaciones_codificadas=[hellp.id]))
+        self.assertRedirects(respuesta, reverse('registros:detalle_parto', args=[self.parto.id]))
+        # Una sola inserción para madre y parto
+        escritura.assert_called_once()
+        cambios = {c.modelo: c.cambios for c in CambioRegistro.objects.all()}
+        self.assertEqual(cambios['madres'], {'direccion': ['Calle 1', 'Calle 2']})
+        self.assertEqual(cambios['partos'], {
+            'tipo_parto': ['vaginal', 'cesarea'],
+            'complicaciones_codificadas': [[], [str(hellp)]],
+        })
+        self.assertNotIn('recien_nacidos', cambios)
+        self.assertEqual(CambioRegistro.objects.get(modelo='madres').usuario, self.user)
+
+        # Guardar sin cambios no escribe historial
+        self.parto.refresh_from_db()
+        self.client.post(url, datos_edicion(self.parto))
+        self.assertEqual(CambioRegistro.objects.count(), 2)
+
+    def test_history_page_and_no_writes_on_reads(self):
+        from .models import CambioRegistro
+        historial_url = reverse('registros:historial_parto', args=[self.parto.id])
+        self.assertContains(self.client.get(historial_url), 'no ha sido editado')
+        self.client.get(reverse('registros:detalle_parto', args=[self.parto.id]))
+        self.client.get(reverse('registros:editar_parto', args=[self.parto.id]))
+        self.assertFalse(CambioRegistro.objects.exists())
+
+        self.client.post(reverse('registros:editar_parto', args=[self.parto.id]),
+                         datos_edicion(self.parto, apgar_5=10, tipo_parto='cesarea'))
+        respuesta = self.client.get(historial_url)
+        self.assertContains(respuesta, 'Ana Pino')
+        self.assertContains(respuesta, 'Apgar 5')
+        # Se muestran las etiquetas de las opciones, no los códigos
+        self.assertContains(respuesta, 'Vaginal')
+
+    def test_dates_shown_in_local_time(self):
+        from .historial import filas
+        from .models import Parto, RecienNacido
+        self.client.post(reverse('registros:editar_parto', args=[self.parto.id]),
+                         datos_edicion(self.parto, fecha_nacimiento='1990-03-04'))
+        respuesta = self.client.get(reverse('registros:historial_parto', args=[self.parto.id]))
+        self.assertContains(respuesta, '03/03/1990')
+        self.assertContains(respuesta, '04/03/1990')
+        self.assertNotContains(respuesta, '1990-03-04')
+        # Las fechas-hora se guardan en UTC y se muestran en hora de Santiago
+        self.assertEqual(
+            filas(Parto, {'fecha_hora': ['2025-01-10T15:00:00Z', '2025-01-10T16:30:00Z']}),
+            [('Fecha hora', '10/01/2025 12:00', '10/01/2025 13:30')],
+        )
+        self.assertEqual(
+            filas(RecienNacido, {'hora_nacimiento': ['10:05:00', '11:00:00']}),
+            [('Hora nacimiento', '10:05', '11:00')],
+        )
+
+
+class EdicionConcurrenteTests(TestCase):
+    """Optimistic locking on editar_parto: stale versions get a 409 conflict page."""
+    setUp = HistorialCambiosTests.setUp
+
+    def _abierto(self):
+        from .models import Parto
+        return Parto.objects.select_related('madre').get(id=self.parto.id)
+
+    def test_stale_save_is_rejected_and_can_be_resent(self):
+        from .models import CambioRegistro, Parto
+        url = reverse('registros:editar_parto', args=[self.parto.id])
+        # Dos matronas abren el mismo registro; la primera guarda
+        primera, segunda = self._abierto(), self._abierto()
+        self.assertRedirects(self.client.post(url, datos_edicion(primera, direccion='Calle Nueva')),
+                             reverse('registros:detalle_parto', args=[self.parto.id]))
+
+        respuesta = self.client.post(url, datos_edicion(segunda, apgar_5=10, tipo_parto='cesarea'))
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertContains(respuesta, 'Calle Nueva', status_code=409)
+        self.assertContains(respuesta, 'Cesárea', status_code=409)
+        parto = Parto.objects.select_related('madre').get(id=self.parto.id)
+        self.assertEqual((parto.madre.direccion, parto.tipo_parto), ('Calle Nueva', 'vaginal'))
+        self.assertEqual(CambioRegistro.objects.count(), 1)
+
+        # "Guardar mi versión" reenvía lo suyo con la versión actual
+        reenvio = dict(respuesta.context['reenviar'])
+        reenvio.update(version_madre=respuesta.context['version_madre'],
+                       version_parto=respuesta.context['version_parto'])
+        self.client.post(url, reenvio)
+        parto.refresh_from_db()
+        self.assertEqual(parto.tipo_parto, 'cesarea')
+
+    def test_invalid_resubmission_keeps_original_version(self):
+        url = reverse('registros:editar_parto', args=[self.parto.id])
+        abierto = self._abierto()
+        respuesta = self.client.post(url, datos_edicion(abierto, apgar_5=11))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['version_parto'], abierto.updated_at.isoformat())
+        self.assertEqual(self.client.post(url, datos_edicion(abierto, version_parto='')).status_code, 409)
+
+
+class RespaldoRegistrosTests(TestCase):
+    """backup_registros / restore_registros round trip with id remapping."""
+    def setUp(self):
+        import os
+        import tempfile
+        from django.utils import timezone
+        from cuentas.models import InviteCode, Rol
+        from . import archivo
+        from .models import CambioRegistro, Complicacion, Parto, RecienNacido
+        User = get_user_model()
+        self.user = User.objects.create_user(username='respaldo', password='pw', rol=Rol.objects.create(nombre='matrona'))
+        InviteCode.objects.create(code='RESP-0001', created_by=self.user)
+        self.madre = crear_madre(
+            numero=29000001, nombres='Lucía', apellidos='Respaldo', fecha_nacimiento=date(1993, 4, 4),
+        )
+        datos = dict(madre=self.madre, tipo_parto='vaginal', semanas_gestacion=39, tipo_anestesia='epidural',
+                     created_by=self.user)
+        self.viejo = Parto.objects.create(fecha_hora=timezone.make_aware(datetime(2019, 3, 1, 8, 0)),
+                                          complicaciones='Distocia de hombros', **datos)
+        RecienNacido.objects.create(parto=self.viejo, hora_nacimiento='11:00', sexo='M', peso='3.100',
+                                    talla='50.0', apgar_1=7, apgar_5=9)
+        archivo.archivar(timezone.make_aware(datetime(2020, 1, 1)))
+        self.reciente = Parto.objects.create(fecha_hora=timezone.now() - timedelta(days=10),
+                                             complicaciones='Preeclampsia severa', **datos)
+        self.reciente.complicaciones_codificadas.add(Complicacion.objects.get(codigo='O14.1'))
+        self.rn = RecienNacido.objects.create(parto=self.reciente, hora_nacimiento='11:05', sexo='F',
+                                              peso='3.250', talla='49.5', apgar_1=8, apgar_5=9)
+        CambioRegistro.objects.create(modelo='recien_nacidos', objeto_id=self.rn.id, parto_id=self.reciente.id,
+                                      cambios={'apgar_5': [8, 9]}, usuario=self.user)
+        self.reciente.refresh_from_db()
+        descriptor, self.ruta = tempfile.mkstemp(suffix='.jsonl.gz')
+        os.close(descriptor)
+        self.addCleanup(os.remove, self.ruta)
+
+    def _respaldar(self):
+        from io import StringIO
+        from django.core.management import call_command
+        salida = StringIO()
+        call_command('backup_registros', self.ruta, '--lote', '1', stdout=salida)
+        return salida.getvalue()
+
+    def _restaurar(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        salida = StringIO()
+        call_command('restore_registros', self.ruta, *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_round_trip_into_empty_database_keeps_ids_and_timestamps(self):
+        from cuentas.models import InviteCode, Rol
+        from . import busqueda
+        from .models import CambioRegistro, FilaListadoParto, Parto, PartoArchivado, RecienNacido
+        self.assertIn('partos: 2 filas', self._respaldar())
+        password = self.user.password
+        Madre.objects.all().delete()
+        CambioRegistro.objects.all().delete()
+        InviteCode.objects.all().delete()
+        get_user_model().objects.all().delete()
+        Rol.objects.all().delete()
+
+        self.assertIn('complicaciones: 0 filas (25 ya existían)', self._restaurar())
+        usuario = get_user_model().objects.get(username='respaldo')
+        self.assertEqual((usuario.id, usuario.password, usuario.rol.nombre), (self.user.id, password, 'matrona'))
+        self.assertEqual(InviteCode.objects.get().created_by, usuario)
+        parto = Parto.objects.get(id=self.reciente.id)
+        self.assertEqual(parto.updated_at, self.reciente.updated_at)
+        self.assertEqual(list(parto.complicaciones_codificadas.values_list('codigo', flat=True)), ['O14.1'])
+        self.assertEqual(RecienNacido.objects.get(parto=parto).id, self.rn.id)
+        # El parto de 2019 vuelve al archivo; listado e índice se reconstruyen
+        self.assertEqual(PartoArchivado.objects.get().id, self.viejo.id)
+        self.assertEqual(list(FilaListadoParto.objects.values_list('parto_id', flat=True)), [parto.id])
+        self.assertEqual({p.id for p in busqueda.cargar(busqueda.buscar_partos('distocia'))}, {self.viejo.id})
+        self.assertEqual(CambioRegistro.objects.get().objeto_id, self.rn.id)
+
+    def test_restore_over_existing_data_remaps_ids(self):
+        from django.core.management.base import CommandError
+        from .models import CambioRegistro, Parto, RecienNacido
+        self._respaldar()
+        with self.assertRaises(CommandError):
+            self._restaurar()
+        salida = self._restaurar('--anexar', '--sin-derivados')
+        self.assertIn('madres: 0 filas (1 ya existían)', salida)
+        self.assertEqual(Madre.objects.count(), 1)
+        copia = Parto.objects.exclude(id=self.reciente.id).get(fecha_hora=self.reciente.fecha_hora)
+        self.assertGreater(copia.id, self.viejo.id)
+        self.assertEqual(copia.madre_id, self.madre.id)
+        rn = RecienNacido.objects.get(parto=copia)
+        self.assertEqual(CambioRegistro.objects.get(parto_id=copia.id).objeto_id, rn.id)
+
+    def test_truncated_backup_is_rejected(self):
+        import gzip
+        from django.core.management.base import CommandError
+        from .models import Parto
+        self._respaldar()
+        with gzip.open(self.ruta, 'rt', encoding='utf-8') as f:
+            lineas = f.readlines()
+        with gzip.open(self.ruta, 'wt', encoding='utf-8') as f:
+            f.writelines(lineas[:-1])
+        Madre.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, 'incompleto'):
+            self._restaurar()
+        self.assertFalse(Parto.objects.exists())
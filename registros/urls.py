@@ -8,11 +8,18 @@ urlpatterns = [
     path('registro/', views.registro_parto, name='registro_parto'),
     path('lista/', views.lista_partos, name='lista_partos'),
     path('export/', views.exportar_partos, name='exportar_partos'),
+    path('api/delta/', views.exportar_delta, name='exportar_delta'),
+    path('api/estadisticas/', views.estadisticas_series, name='estadisticas_series'),
+    path('api/eventos/', views.eventos_partos, name='eventos_partos'),
     path('api/madre/', views.madre_lookup, name='madre_lookup'),
     path('api/madre_create/', views.madre_create, name='madre_create'),
     path('madre/create/', views.madre_create_page, name='madre_create_page'),
+    path('madre/duplicados/', views.duplicados_madres, name='duplicados_madres'),
     path('api/madre_typeahead/', views.madre_typeahead, name='madre_typeahead'),
     path('detalle/<int:parto_id>/', views.detalle_parto, name='detalle_parto'),
     path('editar/<int:parto_id>/', views.editar_parto, name='editar_parto'),
+    path('historial/<int:parto_id>/', views.historial_parto, name='historial_parto'),
     path('reportes/', views_reportes.reporte_rem, name='reporte_rem'),
+    path('reportes/indicadores/', views_reportes.indicadores_calidad, name='indicadores_calidad'),
+    path('reportes/busqueda/', views_reportes.busqueda_clinica, name='busqueda_clinica'),
 ]
\ No newline at end of file
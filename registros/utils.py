@@ -1,4 +1,7 @@
 import re
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
 
 
 def calculate_dv(rut_number: str) -> str:
@@ -62,144 +65,111 @@ def format_rut(clean: str) -> str:
     if num:
         parts.insert(0, num)
     return '.'.join(parts) + '-' + dv
-from datetime import datetime
-from django.db.models import Count, Q
-from .models import Parto, RecienNacido
+
+
+def local_date_bounds(fecha_inicio=None, fecha_fin=None):
+    """Convert local calendar days into aware datetime bounds.
+
+    Returns ``(desde, hasta)`` describing the half-open interval
+    ``[fecha_inicio 00:00, fecha_fin + 1 día 00:00)`` in the current time zone
+    (America/Santiago). Filtering with ``fecha_hora__gte=desde`` and
+    ``fecha_hora__lt=hasta`` keeps the column bare so the DB can use the
+    ``fecha_hora`` index, unlike ``fecha_hora__date`` which wraps it in
+    ``DATE(CONVERT_TZ(...))``. Either bound may be None (open range).
+    """
+    tz = timezone.get_current_timezone()
+    desde = hasta = None
+    if fecha_inicio:
+        desde = timezone.make_aware(datetime.combine(fecha_inicio, time.min), tz)
+    if fecha_fin:
+        hasta = timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min), tz)
+    return desde, hasta
+
+
+def fin_de_mes(fecha):
+    """Último día del mes de ``fecha``."""
+    return (fecha.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def meses_entre(desde, hasta):
+    """Lista de (primer_dia, ultimo_dia) para cada mes entre desde y hasta (inclusive)."""
+    meses = []
+    inicio = desde.replace(day=1)
+    while inicio <= hasta:
+        fin = fin_de_mes(inicio)
+        meses.append((inicio, fin))
+        inicio = fin + timedelta(days=1)
+    return meses
+
 
 class GeneradorREM:
-    def __init__(self, fecha_inicio, fecha_fin):
+    """Fachada sobre ``registros.rem``: calcula las secciones REM pedidas en
+    una sola pasada y guarda el resultado para no repetir consultas. Crear el
+    generador no consulta nada: el snapshot se lee (o crea) al calcular."""
+
+    def __init__(self, fecha_inicio, fecha_fin, usar_snapshot=True):
         self.fecha_inicio = fecha_inicio
         self.fecha_fin = fecha_fin
-        self.partos = Parto.objects.filter(
-            fecha_hora__date__range=[fecha_inicio, fecha_fin]
-        ).select_related('madre').prefetch_related('recien_nacidos')
+        self._datos = {}
+        self._snapshot = None
+        self._usar_snapshot = usar_snapshot
+
+    def _cargar_snapshot(self):
+        if not self._usar_snapshot:
+            return
+        self._usar_snapshot = False
+        from . import snapshots
+        if snapshots.admite_snapshot(self.fecha_inicio, self.fecha_fin):
+            # Mes cerrado: servir (o crear) el snapshot inmutable
+            self._snapshot = snapshots.obtener(self.fecha_inicio, self.fecha_fin)
+            self._datos.update(self._snapshot.datos)
+
+    def calcular(self, claves=None):
+        """Devuelve {clave: datos}; solo consulta las secciones aún no calculadas."""
+        from . import rem
+        self._cargar_snapshot()
+        claves = list(claves or rem.SECCIONES)
+        faltantes = [c for c in claves if c not in self._datos]
+        if faltantes:
+            self._datos.update(rem.generar(self.fecha_inicio, self.fecha_fin, faltantes))
+        return {c: self._datos[c] for c in claves}
 
     def rem_bs22(self):
         """
         Genera datos para el REM-BS22 (Atenciones de Obstetricia y Ginecología)
         """
-    
-        datos = {
-            'total_partos': 0,
-            'partos_por_tipo': {
-                'vaginal': 0,
-                'cesarea': 0,
-                'forceps': 0
-            },
-            'partos_por_edad': {
-                'menor_15': 0,
-                '15_19': 0,
-                '20_24': 0,
-                '25_29': 0,
-                '30_34': 0,
-                '35_mas': 0
-            },
-            'anestesia': {
-                'ninguna': 0,
-                'local': 0,
-                'epidural': 0,
-                'raquidea': 0,
-                'general': 0
-            }
-        }
-
-       
-        tipos_parto = self.partos.values('tipo_parto').annotate(
-            total=Count('id')
-        )
-        for tipo in tipos_parto:
-            datos['partos_por_tipo'][tipo['tipo_parto']] = tipo['total']
-            datos['total_partos'] += tipo['total']
-
-       
-        for parto in self.partos:
-            edad = (parto.fecha_hora.date() - parto.madre.fecha_nacimiento).days // 365
-            if edad < 15:
-                datos['partos_por_edad']['menor_15'] += 1
-            elif edad <= 19:
-                datos['partos_por_edad']['15_19'] += 1
-            elif edad <= 24:
-                datos['partos_por_edad']['20_24'] += 1
-            elif edad <= 29:
-                datos['partos_por_edad']['25_29'] += 1
-            elif edad <= 34:
-                datos['partos_por_edad']['30_34'] += 1
-            else:
-                datos['partos_por_edad']['35_mas'] += 1
-
-       
-        tipos_anestesia = self.partos.values('tipo_anestesia').annotate(
-            total=Count('id')
-        )
-        for tipo in tipos_anestesia:
-            datos['anestesia'][tipo['tipo_anestesia']] = tipo['total']
-
-        return datos
+        return self.calcular(['bs22'])['bs22']
 
     def rem_a09(self):
         """
         Genera datos para el REM-A09 (Egresos Hospitalarios)
         """
-        datos = {
-            'egresos_total': 0,
-            'motivo_egreso': {
-                'alta': 0,
-                'traslado': 0,
-                'defuncion': 0
-            },
-            'estadia_promedio': 0  
-        }
-
-   
-        return datos
+        return self.calcular(['a09'])['a09']
 
     def rem_a04(self):
         """
         Genera datos para el REM-A04 (Defunciones)
         """
-        datos = {
-            'defunciones_total': 0,
-            'defunciones_por_edad': {
-                'menor_1_hora': 0,
-                '1_23_horas': 0,
-                '1_7_dias': 0,
-                '8_27_dias': 0,
-                '28_dias_mas': 0
-            }
-        }
-
-
-        recien_nacidos = RecienNacido.objects.filter(
-            parto__fecha_hora__date__range=[self.fecha_inicio, self.fecha_fin],
-            estado='fallecido'
-        )
-        datos['defunciones_total'] = recien_nacidos.count()
-
-        return datos
+        return self.calcular(['a04'])['a04']
 
     def exportar_excel(self):
         """
         Exporta los datos a Excel incluyendo todos los REM
         """
-        import pandas as pd
-        from io import BytesIO
-
- 
-        output = BytesIO()
-        writer = pd.ExcelWriter(output, engine='openpyxl')
-
-
-        datos_bs22 = self.rem_bs22()
-        df_bs22 = pd.DataFrame([datos_bs22])
-        df_bs22.to_excel(writer, sheet_name='REM-BS22', index=False)
-
-        datos_a09 = self.rem_a09()
-        df_a09 = pd.DataFrame([datos_a09])
-        df_a09.to_excel(writer, sheet_name='REM-A09', index=False)
-
-        datos_a04 = self.rem_a04()
-        df_a04 = pd.DataFrame([datos_a04])
-        df_a04.to_excel(writer, sheet_name='REM-A04', index=False)
-
-        writer.save()
-        return output.getvalue()
\ No newline at end of file
+        self._cargar_snapshot()
+        if self._snapshot is not None and self._snapshot.xlsx:
+            return bytes(self._snapshot.xlsx)
+
+        from . import rem
+        from .rem_excel import escribir_rem
+
+        # Todas las secciones salen de la misma pasada sobre el rango
+        datos = self.calcular()
+        contenido = escribir_rem(
+            [(s.hoja, s.titulo, datos[clave]) for clave, s in rem.SECCIONES.items()],
+            subtitulo=f'Período: {self.fecha_inicio} al {self.fecha_fin}',
+        )
+        if self._snapshot is not None:
+            from . import snapshots
+            snapshots.guardar_xlsx(self._snapshot, contenido)
+        return contenido
\ No newline at end of file
@@ -4,13 +4,16 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse
 from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Madre, Parto, RecienNacido
+from django.db import transaction
+from django.db.models import Count, Q
+from .models import CambioRegistro, FilaListadoParto, Madre, Parto, RecienNacido
 from .forms import MadreForm, PartoForm, RecienNacidoForm, PartoCompletoForm
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from datetime import datetime, timedelta
 from .excel_export import exportar_datos_excel
+from . import archivo, concurrencia, delta, historial, stream_export
 from .utils import normalize_rut
+from cuentas.views import requiere_rol
 from django.views.decorators.http import require_POST
 from django.forms.models import model_to_dict
 
@@ -58,13 +61,14 @@ def registro_parto(request):
 @login_required
 def lista_partos(request):
     query = request.GET.get('q', '')
-    partos = Parto.objects.select_related('madre', 'created_by').order_by('-fecha_hora')
+    # Modelo de lectura plano (registros.listado): sin JOIN por página ni búsqueda
+    partos = FilaListadoParto.objects.order_by('-fecha_hora', '-parto_id')
     
     if query:
         partos = partos.filter(
-            Q(madre__rut__icontains=query) |
-            Q(madre__nombres__icontains=query) |
-            Q(madre__apellidos__icontains=query)
+            Q(madre_rut__icontains=query) |
+            Q(madre_nombres__icontains=query) |
+            Q(madre_apellidos__icontains=query)
         )
     
     paginator = Paginator(partos, 10)
@@ -74,25 +78,45 @@ def lista_partos(request):
     return render(request, 'registros/lista_partos.html', {
         'partos': partos_paginados,
         'query': query,
+        # Solo la primera página sin filtro recibe partos nuevos en vivo
+        'en_vivo': not query and partos_paginados.number == 1,
         'titulo': 'Lista de Partos'
     })
 
 @login_required
 def detalle_parto(request, parto_id):
-    parto = get_object_or_404(Parto.objects.select_related(
-        'madre', 'created_by'
-    ).prefetch_related('recien_nacidos'), id=parto_id)
+    # Tabla caliente o, si ya pasó el horizonte, el archivo (solo lectura)
+    parto = archivo.obtener_parto(parto_id)
+    if parto is None:
+        raise Http404('Parto no encontrado')
     
     return render(request, 'registros/detalle_parto.html', {
         'parto': parto,
         'titulo': f'Parto de {parto.madre}'
     })
 
+@login_required
+def historial_parto(request, parto_id):
+    parto = archivo.obtener_parto(parto_id)
+    if parto is None:
+        raise Http404('Parto no encontrado')
+
+    return render(request, 'registros/historial_parto.html', {
+        'parto': parto,
+        'ediciones': historial.leer(parto.id, parto.madre_id),
+        'titulo': f'Historial de cambios · Parto de {parto.madre}'
+    })
+
 @login_required
 def editar_parto(request, parto_id):
-    parto = get_object_or_404(Parto, id=parto_id)
+    parto = get_object_or_404(Parto.objects.for_detail(), id=parto_id)
     if request.method == 'POST':
-        
+        # Valores cargados antes de que los formularios modifiquen las instancias
+        antes = {
+            'madre': historial.captura(parto.madre),
+            'parto': historial.captura(parto),
+            'recien_nacido': historial.captura(parto.recien_nacidos.first()),
+        }
         madre_form = MadreForm(request.POST, instance=parto.madre)
         parto_form = PartoForm(request.POST, instance=parto)
         recien_nacido_form = RecienNacidoForm(
@@ -117,17 +141,31 @@ def editar_parto(request, parto_id):
 
         if madre_ok and parto_ok and recien_ok:
             try:
-                madre = madre_form.save()
-                parto = parto_form.save(commit=False)
-                parto.madre = madre
-                parto.save()
+                with transaction.atomic():
+                    # Falla si alguien guardó después de abrir este formulario
+                    concurrencia.reclamar(parto.madre, request.POST.get('version_madre'))
+                    concurrencia.reclamar(parto, request.POST.get('version_parto'))
+                    madre = madre_form.save()
+                    parto = parto_form.save(commit=False)
+                    parto.madre = madre
+                    parto.save()
+                    parto_form.save_m2m()
+
+                    recien_nacido = recien_nacido_form.save(commit=False)
+                    recien_nacido.parto = parto
+                    recien_nacido.save()
 
-                recien_nacido = recien_nacido_form.save(commit=False)
-                recien_nacido.parto = parto
-                recien_nacido.save()
+                    historial.registrar(request.user, parto.id, [
+                        (madre, antes['madre']),
+                        (parto, antes['parto']),
+                        (recien_nacido, antes['recien_nacido']),
+                    ])
 
                 messages.success(request, 'Registro actualizado exitosamente.')
                 return redirect('registros:detalle_parto', parto_id=parto.id)
+            except concurrencia.ConflictoEdicion:
+                logger.info('editar_parto conflicto de versión en parto id=%s', parto_id)
+                return _conflicto_edicion(request, parto_id, madre_form, parto_form, recien_nacido_form)
             except Exception as e:
                 logger.exception('Error guardando edición de parto %s', parto_id)
                 messages.error(request, f'Error al actualizar el registro: {str(e)}')
@@ -166,16 +204,59 @@ def editar_parto(request, parto_id):
         recien_nacido_form = RecienNacidoForm(
             instance=parto.recien_nacidos.first()
         )
+    # Al volver a mostrar un POST con errores se conserva la versión con que
+    # se abrió el formulario, para no aceptar en silencio cambios ajenos
+    versiones = request.POST if request.method == 'POST' else {
+        'version_madre': concurrencia.version(parto.madre),
+        'version_parto': concurrencia.version(parto),
+    }
     
     return render(request, 'registros/editar_parto.html', {
         'madre_form': madre_form,
         'parto_form': parto_form,
         'recien_nacido_form': recien_nacido_form,
         'parto': parto,
+        'version_madre': versiones.get('version_madre', ''),
+        'version_parto': versiones.get('version_parto', ''),
         'titulo': f'Editar Parto de {parto.madre}'
     })
 
 
+def _conflicto_edicion(request, parto_id, madre_form, parto_form, recien_nacido_form):
+    """Pantalla 409: versión guardada frente a la enviada, campo a campo,
+    con la opción de reenviar la propia sobre la versión actual."""
+    actual = get_object_or_404(Parto.objects.for_detail(), id=parto_id)
+    # Las instancias de los formularios ya tienen los valores enviados
+    mia_parto = historial.captura(parto_form.instance)
+    mia_parto['complicaciones_codificadas'] = sorted(
+        str(c) for c in parto_form.cleaned_data['complicaciones_codificadas'])
+    comparacion = [
+        (etiqueta, historial.filas(modelo, historial.diferencias(historial.captura(guardada), mia)))
+        for etiqueta, modelo, guardada, mia in (
+            ('Madre', Madre, actual.madre, historial.captura(madre_form.instance)),
+            ('Parto', Parto, actual, mia_parto),
+            ('Recién Nacido', RecienNacido, actual.recien_nacidos.first(),
+             historial.captura(recien_nacido_form.instance)),
+        )
+    ]
+    reenviar = [
+        (nombre, valor)
+        for nombre, valores in request.POST.lists()
+        if nombre not in ('csrfmiddlewaretoken', 'version_madre', 'version_parto')
+        for valor in valores
+    ]
+    ultima = CambioRegistro.objects.filter(parto_id=parto_id).select_related('usuario').order_by('-fecha', '-id').first()
+    return render(request, 'registros/conflicto_parto.html', {
+        'parto': actual,
+        'comparacion': [(etiqueta, filas) for etiqueta, filas in comparacion if filas],
+        'reenviar': reenviar,
+        'ultima_edicion': ultima,
+        'version_madre': concurrencia.version(actual.madre),
+        'version_parto': concurrencia.version(actual),
+        'titulo': f'Conflicto al editar Parto de {actual.madre}'
+    }, status=409)
+
+
 @login_required
 def madre_lookup(request):
     """API simple que devuelve datos de la madre por RUT (formateado o no).
@@ -341,6 +422,10 @@ def madre_create(request):
 def exportar_partos(request):
     """Exportar partos a Excel dentro de un rango de fechas (GET start/end en formato YYYY-MM-DD).
     Si no se proveen fechas, exporta TODOS los partos disponibles.
+
+    Con ``format=csv`` o ``format=ndjson`` la respuesta se transmite en
+    streaming (ver ``stream_export``); ``dataset`` elige partos (por defecto),
+    madres o recien_nacidos y ``gzip=1`` comprime al vuelo.
     """
     start = request.GET.get('start')
     end = request.GET.get('end')
@@ -356,4 +441,110 @@ def exportar_partos(request):
         except ValueError:
             return HttpResponse('Formato de fecha inválido. Use YYYY-MM-DD', status=400)
 
+    formato = request.GET.get('format', 'xlsx')
+    if formato in stream_export.FORMATOS:
+        dataset = request.GET.get('dataset', 'partos')
+        if dataset not in stream_export.DATASETS:
+            return HttpResponse('Dataset inválido. Use partos, madres o recien_nacidos', status=400)
+        return stream_export.respuesta_streaming(
+            dataset, formato, fecha_inicio, fecha_fin,
+            gzip=request.GET.get('gzip') in ('1', 'true'),
+        )
+    if formato != 'xlsx':
+        return HttpResponse('Formato inválido. Use xlsx, csv o ndjson', status=400)
+
     return exportar_datos_excel(fecha_inicio, fecha_fin)
+
+
+@login_required
+def exportar_delta(request):
+    """API de exportación incremental: GET ``desde`` (watermark devuelto por la
+    llamada anterior; vacío = todo) y ``limite`` opcional por entidad."""
+    try:
+        limite = int(request.GET.get('limite') or delta.LIMITE)
+        datos = delta.cambios(request.GET.get('desde'), limite=max(1, min(limite, 10000)))
+    except (ValueError, delta.WatermarkInvalido):
+        return JsonResponse({'error': 'Parámetros inválidos (desde/limite)'}, status=400)
+    return JsonResponse(datos)
+
+
+@login_required
+def estadisticas_series(request):
+    """Series para los gráficos del dashboard: GET ``granularidad`` (dia,
+    semana o mes), ``desde`` y ``hasta`` (YYYY-MM-DD; por defecto el último año)."""
+    from django.utils import timezone
+    from . import estadisticas
+
+    granularidad = request.GET.get('granularidad', 'dia')
+    if granularidad not in estadisticas.GRANULARIDADES:
+        return JsonResponse({'error': 'Granularidad inválida. Use dia, semana o mes'}, status=400)
+    try:
+        hasta = datetime.fromisoformat(request.GET['hasta']).date() if request.GET.get('hasta') else timezone.localdate()
+        desde = datetime.fromisoformat(request.GET['desde']).date() if request.GET.get('desde') else hasta - timedelta(days=364)
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}, status=400)
+    if desde > hasta:
+        return JsonResponse({'error': 'desde debe ser anterior o igual a hasta'}, status=400)
+    if (hasta - desde).days > estadisticas.RANGO_MAXIMO_DIAS:
+        return JsonResponse({'error': 'Rango demasiado amplio'}, status=400)
+    return JsonResponse(estadisticas.obtener(granularidad, desde, hasta))
+
+
+@login_required
+async def eventos_partos(request):
+    """Tablero en vivo: flujo server-sent events con los partos creados,
+    editados o eliminados (ver ``eventos``). Requiere servir la aplicación con
+    ASGI; bajo WSGI responde 204, que indica al navegador no reintentar."""
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from . import eventos
+
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    ultimo = request.headers.get('Last-Event-ID') or request.GET.get('ultimo')
+    ultimo_id = int(ultimo) if ultimo and ultimo.isdigit() else None
+
+    response = StreamingHttpResponse(eventos.flujo_sse(ultimo_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@requiere_rol('superusuario')
+def duplicados_madres(request):
+    """Revisión de madres probablemente duplicadas (``registros.duplicados``):
+    fusionar el par conservando una de las fichas, o descartarlo."""
+    from .models import CandidatoDuplicado
+    from . import duplicados
+
+    if request.method == 'POST':
+        candidato = get_object_or_404(
+            CandidatoDuplicado.objects.select_related('madre_a', 'madre_b'),
+            pk=request.POST.get('candidato'), estado='pendiente',
+        )
+        accion = request.POST.get('accion')
+        if accion == 'descartar':
+            candidato.estado = 'descartado'
+            candidato.save(update_fields=['estado'])
+            messages.info(request, 'Par descartado: no se volverá a proponer.')
+        elif accion in ('conservar_a', 'conservar_b'):
+            conservada, otra = candidato.madre_a, candidato.madre_b
+            if accion == 'conservar_b':
+                conservada, otra = otra, conservada
+            movidos = duplicados.fusionar(conservada.id, [otra.id])
+            messages.success(request, f'Fichas fusionadas en {conservada}: {movidos} parto(s) reasignado(s).')
+        else:
+            messages.error(request, 'Acción no válida.')
+        return redirect(f"{reverse('registros:duplicados_madres')}?page={request.POST.get('page', 1)}")
+
+    candidatos = CandidatoDuplicado.objects.filter(estado='pendiente').select_related(
+        'madre_a', 'madre_b').order_by('-similitud', 'id')
+    pagina = Paginator(candidatos, 25).get_page(request.GET.get('page'))
+    ids = {c.madre_a_id for c in pagina} | {c.madre_b_id for c in pagina}
+    partos = dict(
+        Parto.objects.filter(madre_id__in=ids).order_by().values('madre_id')
+        .annotate(n=Count('id')).values_list('madre_id', 'n')
+    )
+    for c in pagina:
+        c.partos_a, c.partos_b = partos.get(c.madre_a_id, 0), partos.get(c.madre_b_id, 0)
+    return render(request, 'registros/duplicados_madres.html', {'candidatos': pagina})
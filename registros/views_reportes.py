@@ -16,19 +16,14 @@ def reporte_rem(request):
                 messages.error(request, 'La fecha de inicio debe ser anterior a la fecha final.')
                 return render(request, 'registros/reporte_rem.html')
             
-            generador = GeneradorREM(fecha_inicio, fecha_fin)
-            
-            
+            # Validar antes de crear el generador: nada se calcula ni se guarda
             tipo_reporte = request.POST.get('tipo_reporte')
-            if tipo_reporte == 'bs22':
-                datos = generador.rem_bs22()
-            elif tipo_reporte == 'a09':
-                datos = generador.rem_a09()
-            elif tipo_reporte == 'a04':
-                datos = generador.rem_a04()
-            else:
+            if tipo_reporte not in ('bs22', 'a09', 'a04'):
                 messages.error(request, 'Tipo de reporte no válido.')
                 return render(request, 'registros/reporte_rem.html')
+
+            generador = GeneradorREM(fecha_inicio, fecha_fin)
+            datos = generador.calcular([tipo_reporte])[tipo_reporte]
          
             if request.POST.get('formato') == 'excel':
                 if tipo_reporte == 'datos_completos':
@@ -55,4 +50,92 @@ def reporte_rem(request):
         except Exception as e:
             messages.error(request, f'Error al generar el reporte: {str(e)}')
     
-    return render(request, 'registros/reporte_rem.html')
\ No newline at end of file
+    return render(request, 'registros/reporte_rem.html')
+
+@login_required
+def indicadores_calidad(request):
+    """Indicadores de calidad perinatal (bajo peso, APGAR, cesárea, anestesia)."""
+    from . import indicadores
+
+    if request.method == 'POST':
+        try:
+            fecha_inicio = datetime.strptime(request.POST['fecha_inicio'], '%Y-%m-%d').date()
+            fecha_fin = datetime.strptime(request.POST['fecha_fin'], '%Y-%m-%d').date()
+
+            if fecha_inicio > fecha_fin:
+                messages.error(request, 'La fecha de inicio debe ser anterior a la fecha final.')
+                return render(request, 'registros/indicadores.html')
+
+            datos = indicadores.generar(fecha_inicio, fecha_fin)
+
+            if request.POST.get('formato') == 'excel':
+                response = HttpResponse(
+                    indicadores.exportar_excel(datos, fecha_inicio, fecha_fin),
+                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                )
+                response['Content-Disposition'] = f'attachment; filename=Indicadores_{fecha_inicio}_{fecha_fin}.xlsx'
+                return response
+
+            percentiles = datos['percentiles_peso_por_semana']
+            por_semana = [
+                (semana, {**fila, **percentiles.get(semana, {})})
+                for semana, fila in datos['bajo_peso_por_semana'].items()
+            ]
+            return render(request, 'registros/indicadores.html', {
+                'datos': datos,
+                'por_semana': por_semana,
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin,
+            })
+
+        except ValueError as e:
+            messages.error(request, f'Error en el formato de las fechas: {str(e)}')
+        except Exception as e:
+            messages.error(request, f'Error al generar los indicadores: {str(e)}')
+
+    return render(request, 'registros/indicadores.html')
+
+@login_required
+def busqueda_clinica(request):
+    """Búsqueda de texto libre en complicaciones y observaciones (``registros.busqueda``)."""
+    from django.core.paginator import Paginator
+    from . import busqueda
+    from .models import PosicionTermino
+
+    consulta = request.GET.get('q', '').strip()
+    campo = request.GET.get('campo', '')
+    contexto = {
+        'consulta': consulta,
+        'campo': campo,
+        'campos': PosicionTermino.CAMPO_CHOICES,
+        'fecha_inicio': request.GET.get('fecha_inicio', ''),
+        'fecha_fin': request.GET.get('fecha_fin', ''),
+    }
+    if not consulta:
+        return render(request, 'registros/busqueda_clinica.html', contexto)
+
+    try:
+        fecha_inicio = datetime.strptime(contexto['fecha_inicio'], '%Y-%m-%d').date() if contexto['fecha_inicio'] else None
+        fecha_fin = datetime.strptime(contexto['fecha_fin'], '%Y-%m-%d').date() if contexto['fecha_fin'] else None
+    except ValueError as e:
+        messages.error(request, f'Error en el formato de las fechas: {str(e)}')
+        return render(request, 'registros/busqueda_clinica.html', contexto)
+    if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
+        messages.error(request, 'La fecha de inicio debe ser anterior a la fecha final.')
+        return render(request, 'registros/busqueda_clinica.html', contexto)
+
+    campos = [int(campo)] if campo in {str(c) for c, _ in PosicionTermino.CAMPO_CHOICES} else None
+    # Conteo y página en la base de datos; solo se cargan los 20 partos de la página
+    claves = busqueda.buscar_partos(consulta, campos, fecha_inicio, fecha_fin)
+    pagina = Paginator(claves, 20).get_page(request.GET.get('page'))
+    pagina.object_list = busqueda.cargar(pagina.object_list)
+    busqueda.resaltar(pagina.object_list, consulta, campos)
+
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    contexto.update({
+        'partos': pagina,
+        'total': pagina.paginator.count,
+        'parametros': parametros.urlencode(),
+    })
+    return render(request, 'registros/busqueda_clinica.html', contexto)
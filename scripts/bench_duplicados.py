@@ -0,0 +1,69 @@
+"""Mide la etapa de comparación de ``registros.duplicados`` con madres
+sintéticas (por defecto 1.000.000) y un 1 % de duplicados con errores de
+digitación en el nombre. No toca la base de datos: recibe las filas ya
+ordenadas por fecha de nacimiento, como las entrega el recorrido por cursor,
+y compara contra la cantidad de pares que exigiría comparar todos con todos.
+
+Uso:
+    python scripts/bench_duplicados.py [madres]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'obstetricia.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from registros.duplicados import comparar_dia  # noqa: E402
+
+NOMBRES = ['María', 'José', 'Camila', 'Javiera', 'Fernanda', 'Valentina', 'Constanza', 'Daniela',
+           'Catalina', 'Francisca', 'Antonia', 'Isidora', 'Carolina', 'Paula', 'Andrea', 'Karen']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez',
+             'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres', 'Araya']
+
+
+def con_error(texto, rng):
+    i = rng.randrange(len(texto))
+    return texto[:i] + rng.choice('aeioun') + texto[i + 1:]
+
+
+def madres_sinteticas(n):
+    rng = random.Random(42)
+    inicio = date(1975, 1, 1)
+    filas = []
+    for i in range(n):
+        nombres = f'{rng.choice(NOMBRES)} {rng.choice(NOMBRES)}'
+        apellidos = f'{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+        nacimiento = inicio + timedelta(days=rng.randrange(365 * 35))
+        filas.append((i, nacimiento, nombres, apellidos))
+    originales = rng.sample(range(n), n // 100)
+    for j, i in enumerate(originales):
+        _, nacimiento, nombres, apellidos = filas[i]
+        filas.append((n + j, nacimiento, con_error(nombres, rng), apellidos))
+    filas.sort(key=itemgetter(1, 0))
+    return filas, len(originales)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    filas, sembrados = madres_sinteticas(n)
+    total = len(filas)
+    inicio = time.perf_counter()
+    pares = 0
+    for _, dia in groupby(filas, key=itemgetter(1)):
+        pares += sum(1 for _ in comparar_dia([(i, nom, ape) for i, _, nom, ape in dia]))
+    segundos = time.perf_counter() - inicio
+    print(f'{total} madres ({sembrados} duplicados sembrados): {pares} pares propuestos en {segundos:.1f} s')
+    print(f'  todos contra todos serían {total * (total - 1) // 2:.3e} comparaciones')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Compara el cálculo vectorizado de indicadores de calidad contra un bucle
+por fila en Python, con datos sintéticos (por defecto 1.000.000 de recién
+nacidos). No toca la base de datos: mide solo la etapa de cálculo.
+
+Uso:
+    python scripts/bench_indicadores.py [recien_nacidos]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'obstetricia.settings')
+
+import django  # noqa: E402
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from registros.indicadores import APGAR_BAJO, BAJO_PESO_KG, LIMITES_EDAD, calcular  # noqa: E402
+
+
+def columnas_sinteticas(n):
+    rng = np.random.default_rng(42)
+    partos = int(n * 0.98)  # ~2 % gemelares
+    return {
+        'peso': rng.normal(3.3, 0.55, n).clip(0.4, 5.5),
+        'apgar_5': rng.choice(np.arange(11, dtype=np.int16), n, p=[0.002] * 7 + [0.03, 0.1, 0.5, 0.356]),
+        'semanas_rn': rng.integers(24, 43, n).astype(np.int16),
+        'tipo_parto': rng.choice(np.array([0, 1, 2], dtype=np.int8), partos, p=[0.6, 0.37, 0.03]),
+        'tipo_anestesia': rng.integers(0, 5, partos).astype(np.int8),
+        'edad_madre': rng.integers(13, 48, partos).astype(np.int16),
+    }
+
+
+def por_fila(columnas):
+    """Referencia ingenua: acumuladores en dicts recorriendo fila a fila."""
+    nacidos, bajo, pesos, apgar_bajo = {}, {}, {}, 0
+    for peso, apgar, semana in zip(columnas['peso'].tolist(), columnas['apgar_5'].tolist(),
+                                   columnas['semanas_rn'].tolist()):
+        nacidos[semana] = nacidos.get(semana, 0) + 1
+        if peso < BAJO_PESO_KG:
+            bajo[semana] = bajo.get(semana, 0) + 1
+        pesos.setdefault(semana, []).append(peso)
+        if apgar < APGAR_BAJO:
+            apgar_bajo += 1
+    percentiles = {}
+    for semana, lista in pesos.items():
+        lista.sort()
+        percentiles[semana] = [lista[int((len(lista) - 1) * p / 100)] for p in (10, 50, 90)]
+    grupos, cesareas, anestesia = {}, {}, {}
+    for tipo, anest, edad in zip(columnas['tipo_parto'].tolist(), columnas['tipo_anestesia'].tolist(),
+                                 columnas['edad_madre'].tolist()):
+        grupo = sum(edad >= limite for limite in LIMITES_EDAD)
+        grupos[grupo] = grupos.get(grupo, 0) + 1
+        if tipo == 1:
+            cesareas[grupo] = cesareas.get(grupo, 0) + 1
+        anestesia[(tipo, anest)] = anestesia.get((tipo, anest), 0) + 1
+    return nacidos, bajo, percentiles, apgar_bajo, grupos, cesareas, anestesia
+
+
+def medir(funcion, columnas, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion(columnas)
+        tiempos.append(time.perf_counter() - t0)
+    return sorted(tiempos)[len(tiempos) // 2]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    columnas = columnas_sinteticas(n)
+    t_np = medir(calcular, columnas, 5)
+    t_py = medir(por_fila, columnas, 1)
+    print(f'{n} recién nacidos')
+    print(f'{"NumPy vectorizado":20s} {t_np * 1000:8.1f} ms')
+    print(f'{"bucle por fila":20s} {t_py * 1000:8.1f} ms  (x{t_py / t_np:.1f})')
+
+
+if __name__ == '__main__':
+    main()
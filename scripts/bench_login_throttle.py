@@ -0,0 +1,89 @@
+"""Simula una inundación de intentos de login y mide la CPU del worker.
+
+Envía POST al login a ``tasa`` peticiones por segundo (por defecto 1000)
+durante ``segundos`` segundos de reloj simulado, con usuarios y contraseñas
+al azar desde unas pocas IPs (credential stuffing), y compara la CPU
+consumida con y sin el límite de intentos de ``cuentas.throttle``. El reloj
+del limitador avanza 1/tasa por petición, así que el resultado no depende de
+cuánto tarde en procesarse cada una. Sin límite cada intento calcula un hash
+PBKDF2, así que se mide una muestra y se extrapola.
+
+Crea una base de datos de prueba desechable (como ``manage.py test``) con la
+configuración de ``DJANGO_SETTINGS_MODULE``.
+
+Uso:
+    python scripts/bench_login_throttle.py [segundos] [tasa]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'obstetricia.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from cuentas import throttle  # noqa: E402
+
+SIN_LIMITE = {'usuario': (10 ** 9, 60), 'ip': (10 ** 9, 60)}
+MUESTRA_SIN_LIMITE = 20
+
+
+def inundar(peticiones, tasa, ips=20, usuarios=200):
+    rng = random.Random(0)
+    client = Client()
+    url = reverse('cuentas:login')
+    codigos = {}
+    inicio = time.time()
+    cpu0 = time.process_time()
+    for i in range(peticiones):
+        throttle.reloj = lambda: inicio + i / tasa
+        response = client.post(url, {
+            'username': f'usuario{rng.randrange(usuarios)}',
+            'password': f'clave{rng.randrange(10 ** 6)}',
+        }, REMOTE_ADDR=f'198.51.100.{rng.randrange(ips)}')
+        codigos[response.status_code] = codigos.get(response.status_code, 0) + 1
+    return time.process_time() - cpu0, codigos
+
+
+def main():
+    segundos = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tasa = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    peticiones = segundos * tasa
+    # Cada 429 genera un warning de django.request
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    setup_test_environment()
+    nombre_original = connection.creation.create_test_db(verbosity=0)
+    try:
+        get_user_model().objects.create_user(username='matrona', password='correcta')
+
+        cache.clear()
+        cpu, codigos = inundar(peticiones, tasa)
+        print(f'{peticiones} intentos en {segundos} s simulados ({tasa} req/s) con límite:')
+        print(f'  respuestas {codigos}, CPU {cpu:.2f} s -> {cpu / segundos:.2f} s de CPU por segundo de inundación')
+
+        cache.clear()
+        with override_settings(LOGIN_THROTTLE=SIN_LIMITE):
+            cpu_muestra, _ = inundar(MUESTRA_SIN_LIMITE, tasa)
+        por_intento = cpu_muestra / MUESTRA_SIN_LIMITE
+        print(f'Sin límite (muestra de {MUESTRA_SIN_LIMITE}): {por_intento * 1000:.1f} ms de CPU por intento')
+        print(f'  -> {por_intento * tasa:.1f} s de CPU por segundo de inundación '
+              f'(x{por_intento * peticiones / cpu:.0f} respecto al límite)')
+    finally:
+        throttle.reloj = time.time
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
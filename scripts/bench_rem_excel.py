@@ -0,0 +1,76 @@
+"""Compara el escritor XLSX liviano de REM contra el camino anterior con pandas.
+
+Cada variante corre en un proceso nuevo para medir el costo real de arranque
+(importaciones incluidas) y la memoria máxima (RSS) del proceso.
+
+Uso:
+    python scripts/bench_rem_excel.py [repeticiones]
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DATOS = {
+    'REM-BS22': {
+        'total_partos': 120,
+        'partos_por_tipo': {'vaginal': 80, 'cesarea': 35, 'forceps': 5},
+        'partos_por_edad': {'menor_15': 1, '15_19': 10, '20_24': 30, '25_29': 40, '30_34': 25, '35_mas': 14},
+        'anestesia': {'ninguna': 20, 'local': 10, 'epidural': 60, 'raquidea': 25, 'general': 5},
+    },
+    'REM-A09': {'egresos_total': 0, 'motivo_egreso': {'alta': 0, 'traslado': 0, 'defuncion': 0}, 'estadia_promedio': 0},
+    'REM-A04': {'defunciones_total': 1, 'defunciones_por_edad': {'menor_1_hora': 0, '1_23_horas': 0, '1_7_dias': 0, '8_27_dias': 0, '28_dias_mas': 0}},
+}
+
+LIVIANO = '''
+from registros.rem_excel import escribir_rem
+contenido = escribir_rem([(hoja, hoja, d) for hoja, d in DATOS.items()])
+'''
+
+PANDAS = '''
+import pandas as pd
+from io import BytesIO
+output = BytesIO()
+with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    for hoja, d in DATOS.items():
+        pd.DataFrame([d]).to_excel(writer, sheet_name=hoja, index=False)
+contenido = output.getvalue()
+'''
+
+MEDIR = '''
+import json, resource, sys, time
+t0 = time.perf_counter()
+DATOS = json.loads(sys.argv[1])
+exec(compile(sys.argv[2], 'bench', 'exec'))
+t = time.perf_counter() - t0
+print(json.dumps({'segundos': t, 'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'bytes': len(contenido)}))
+'''
+
+
+def medir(codigo, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        out = subprocess.run(
+            [sys.executable, '-c', MEDIR, json.dumps(DATOS), codigo],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        muestras.append(json.loads(out.stdout))
+    muestras.sort(key=lambda m: m['segundos'])
+    return muestras[len(muestras) // 2]
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for nombre, codigo in (('openpyxl write-only', LIVIANO), ('pandas', PANDAS)):
+        try:
+            m = medir(codigo, repeticiones)
+        except subprocess.CalledProcessError as e:
+            print(f'{nombre:20s} no disponible: {e.stderr.strip().splitlines()[-1]}')
+            continue
+        print(f"{nombre:20s} {m['segundos'] * 1000:8.1f} ms  RSS {m['rss_kb'] / 1024:6.1f} MB  ({m['bytes']} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Mide backup_registros y restore_registros con datos sintéticos en bases
+SQLite temporales (no toca la base configurada). Por defecto genera 350.000
+partos, que con sus madres, recién nacidos y complicaciones codificadas dan
+~1.000.000 de filas; respalda, migra una base vacía y restaura en ella.
+
+Uso:
+    python scripts/bench_respaldo.py [partos]
+"""
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'obstetricia.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+DIRECTORIO = tempfile.mkdtemp(prefix='bench_respaldo_')
+settings.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3',
+                                  'NAME': os.path.join(DIRECTORIO, 'origen.db')}}
+settings.DEBUG = False  # sin registro de consultas, como en producción
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from registros import respaldo  # noqa: E402
+from registros.models import Complicacion, Madre, Parto, PartoComplicacion, RecienNacido  # noqa: E402
+
+LOTE = 5000
+
+
+def poblar(n_partos):
+    rng = random.Random(42)
+    n_madres = n_partos * 5 // 7
+    ahora = timezone.now()
+    complicaciones = list(Complicacion.objects.values_list('id', flat=True))
+    with transaction.atomic():
+        for inicio in range(0, n_madres, LOTE):
+            Madre.objects.bulk_create([
+                Madre(id=i + 1, rut=f'{10_000_000 + i}-{i % 10}', nombres='Nombre Sintético',
+                      apellidos='Apellido Sintético', fecha_nacimiento=date(1980, 1, 1) + timedelta(days=i % 9000),
+                      estado_civil='soltera', direccion='Calle 123', telefono='+56 9 9123 4567',
+                      prevision='fonasa_a')
+                for i in range(inicio, min(inicio + LOTE, n_madres))
+            ])
+        for inicio in range(0, n_partos, LOTE):
+            ids = range(inicio + 1, min(inicio + LOTE, n_partos) + 1)
+            partos = [
+                Parto(id=i, madre_id=rng.randrange(n_madres) + 1,
+                      fecha_hora=ahora - timedelta(minutes=rng.randrange(700 * 24 * 60)),
+                      tipo_parto='vaginal', semanas_gestacion=rng.randrange(30, 42), tipo_anestesia='epidural',
+                      complicaciones='Sin complicaciones' if i % 7 else 'Preeclampsia severa')
+                for i in ids
+            ]
+            Parto.objects.bulk_create(partos)
+            RecienNacido.objects.bulk_create([
+                RecienNacido(parto_id=p.id, hora_nacimiento=p.fecha_hora.time(), sexo='F' if p.id % 2 else 'M',
+                             peso='3.250', talla='49.5', apgar_1=8, apgar_5=9)
+                for p in partos for _ in range(2 if p.id % 50 == 0 else 1)
+            ])
+            PartoComplicacion.objects.bulk_create([
+                PartoComplicacion(parto_id=i, complicacion_id=rng.choice(complicaciones))
+                for i in ids if i % 7 == 0
+            ])
+
+
+def main():
+    n_partos = int(sys.argv[1]) if len(sys.argv) > 1 else 350_000
+    ruta = os.path.join(DIRECTORIO, 'respaldo.jsonl.gz')
+    try:
+        call_command('migrate', verbosity=0)
+        inicio = time.perf_counter()
+        poblar(n_partos)
+        print(f'datos sintéticos generados en {time.perf_counter() - inicio:.1f} s')
+
+        inicio = time.perf_counter()
+        totales = respaldo.respaldar(ruta)
+        segundos = time.perf_counter() - inicio
+        filas = sum(totales.values())
+        print(f'respaldo: {filas} filas en {segundos:.1f} s ({filas / segundos:,.0f} filas/s), '
+              f'{os.path.getsize(ruta) / 1e6:.1f} MB comprimido')
+
+        connection.close()
+        connection.settings_dict['NAME'] = os.path.join(DIRECTORIO, 'destino.db')
+        call_command('migrate', verbosity=0)
+        inicio = time.perf_counter()
+        resultado = respaldo.restaurar(ruta)
+        segundos = time.perf_counter() - inicio
+        insertadas = sum(n for n, _ in resultado.values())
+        print(f'restauración: {insertadas} filas en {segundos:.1f} s ({insertadas / segundos:,.0f} filas/s)')
+
+        inicio = time.perf_counter()
+        respaldo.derivados()
+        print(f'derivados (archivo, listado, índice de búsqueda): {time.perf_counter() - inicio:.1f} s')
+        print(f'memoria máxima del proceso: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+    finally:
+        shutil.rmtree(DIRECTORIO, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()